@@ -1,13 +1,12 @@
 import os
 import logging
-import threading
-import time
 from dotenv import load_dotenv
-from bot import bot
+from utils.log_config import configure_logging
+from bot import bot, CLUSTER_ID
+from utils.leader_election import start_bot_with_leader_election
 
-# Set up logging
-logging.basicConfig(level=logging.INFO,
-                  format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Set up queue-based logging so log I/O never blocks the event loop
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -16,22 +15,30 @@ load_dotenv()
 # Get Discord token
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 
-def start_bot():
-    if not DISCORD_TOKEN:
-        logger.error("Missing DISCORD_TOKEN environment variable")
-        return
-    
-    logger.info("Starting Discord bot from web server context")
-    try:
-        bot.run(DISCORD_TOKEN)
-    except Exception as e:
-        logger.error(f"Error running Discord bot: {e}")
-
-# Start the bot in a background thread when this module is imported
-bot_thread = threading.Thread(target=start_bot)
-bot_thread.daemon = True
-bot_thread.start()
+# Set to 0 when the bot runs in its own processes (supervisor.py does this for the web server)
+RUN_BOT = os.getenv("RUN_BOT", "1").lower() not in ("0", "false", "no")
+
+# Sharded bots are started per cluster with their shard environment, never from the web server
+SHARDED = bool(os.getenv("SHARD_CLUSTERS") or os.getenv("SHARD_COUNT"))
+
+# Every gunicorn worker and replica imports this module, but only the elected
+# leader connects to the gateway; the others wait as hot standbys
+election = None
+runner = None
+if not RUN_BOT or SHARDED:
+    logger.info("Not running the Discord bot from the web server, it runs in separate bot processes")
+elif not DISCORD_TOKEN:
+    logger.error("Missing DISCORD_TOKEN environment variable")
+else:
+    logger.info("Joining bot leader election from web server context")
+    election, runner = start_bot_with_leader_election(bot, DISCORD_TOKEN, name=f"discord-bot-cluster-{CLUSTER_ID}")
 
 # Export a function that we can call to check if the bot is running
 def is_bot_running():
-    return bot_thread.is_alive()
+    return runner is not None and runner.is_running()
+
+def get_bot_role():
+    """Return "leader" if this process runs the gateway connection, "external" if bot processes run it, "follower" otherwise"""
+    if not RUN_BOT or SHARDED:
+        return "external"
+    return election.role if election else "follower"
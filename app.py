@@ -1,63 +1,43 @@
 import os
 from flask import Flask, render_template, session, request, redirect, url_for
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-from flask_login import LoginManager
+from flask_login import LoginManager, UserMixin
 import logging
 
-class Base(DeclarativeBase):
-    pass
-
-db = SQLAlchemy(model_class=Base)
+# The database layer lives in database.py so the bot can use it without loading Flask
+from database import db, init_db
 
 # Create the Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", os.urandom(24).hex())
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Configure the database
-database_url = os.environ.get("DATABASE_URL")
-
-# Fix Neon/Render PostgreSQL connection URL if needed
-# Some providers like Heroku/Render can add 'postgres://' instead of 'postgresql://'
-if database_url and database_url.startswith("postgres://"):
-    database_url = database_url.replace("postgres://", "postgresql://", 1)
-
-app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-    "connect_args": {
-        # Add SSL mode required by some PostgreSQL providers
-        "sslmode": "require" if "RENDER" in os.environ else "prefer"
-    }
-}
+@app.teardown_appcontext
+def remove_db_session(exception=None):
+    """Return the request's database session to the pool"""
+    db.session.remove()
 
-# Initialize the app with the extension
-db.init_app(app)
-
-# Helper functions for database sessions and app context
+# Helper functions for database sessions
 def get_db_session():
     return db.session
 
-def with_app_context(func):
-    """Decorator to ensure function runs with application context"""
-    def wrapper(*args, **kwargs):
-        # Always use a fresh app context to be safe
-        with app.app_context():
-            return func(*args, **kwargs)
-    return wrapper
-
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+class WebUser(UserMixin):
+    """Flask-Login wrapper around a database user, keeps models.py free of Flask"""
+
+    def __init__(self, user):
+        self.user = user
+        self.id = user.id
+
 @login_manager.user_loader
 def load_user(user_id):
     from models import User
-    return User.query.get(int(user_id))
+    user = db.session.get(User, int(user_id))
+    return WebUser(user) if user else None
 
 # Create a simple route to keep the bot alive on hosting platforms
 @app.route('/')
@@ -68,10 +48,97 @@ def index():
 def health():
     return {"status": "healthy"}, 200
 
+@app.route('/metrics')
+def metrics():
+    from utils.metrics import render_metrics
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route('/debug/loop')
+def debug_loop():
+    """Event loop lag and recent blocking callbacks, requires the ADMIN_TOKEN"""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    provided = request.headers.get("X-Admin-Token") or request.args.get("token")
+    if not admin_token or provided != admin_token:
+        return {"error": "forbidden"}, 403
+    
+    from utils.loop_monitor import loop_report, read_snapshot
+    from utils.metrics import registry
+    if registry.is_bot_process:
+        return {"loops": {"bot": loop_report()}}, 200
+    # A web worker has its own monitored loops, the bot's come from the snapshot it writes
+    return {"loops": {"web": loop_report(), "bot": read_snapshot()}}, 200
+
+@app.route('/transcripts/search')
+def transcript_search():
+    """Paginated full-text search over a guild's ticket transcripts, requires the ADMIN_TOKEN"""
+    admin_token = os.environ.get("ADMIN_TOKEN")
+    provided = request.headers.get("X-Admin-Token") or request.args.get("token")
+    if not admin_token or provided != admin_token:
+        return {"error": "forbidden"}, 403
+    
+    from datetime import datetime
+    from utils.transcript_search import search_transcripts
+    from utils.transcripts import transcript_url
+    
+    guild_id = request.args.get("guild_id", "")
+    query = request.args.get("q", "")
+    if not guild_id.isdigit() or not query.strip():
+        return {"error": "guild_id and q are required"}, 400
+    try:
+        after = datetime.strptime(request.args["after"], "%Y-%m-%d") if request.args.get("after") else None
+        before = datetime.strptime(request.args["before"], "%Y-%m-%d") if request.args.get("before") else None
+        page = max(1, int(request.args.get("page", "1")))
+    except ValueError:
+        return {"error": "after and before must be YYYY-MM-DD and page a number"}, 400
+    
+    results, has_more = search_transcripts(
+        guild_id, query, user_id=request.args.get("user_id"), after=after, before=before, page=page
+    )
+    return {
+        "page": page,
+        "has_more": has_more,
+        "results": [
+            {
+                "ticket_id": result["ticket_id"],
+                "author_id": result["author_id"],
+                "created_at": result["created_at"].isoformat() + "Z",
+                "snippet": result["snippet"],
+                "transcript": transcript_url(result["access_token"]) if result["access_token"] else None
+            }
+            for result in results
+        ]
+    }, 200
+
+@app.route('/transcripts/<access_token>')
+def transcript_archive(access_token):
+    """A ticket transcript as gzipped JSON lines, with range request support for large archives"""
+    from flask import send_file
+    from utils.transcripts import get_transcript
+    
+    transcript = get_transcript(access_token)
+    if transcript is None or not os.path.exists(transcript.path):
+        return {"error": "not found"}, 404
+    return send_file(
+        os.path.abspath(transcript.path),
+        mimetype="application/gzip",
+        as_attachment=True,
+        download_name=f"ticket-{transcript.ticket_id}.jsonl.gz",
+        conditional=True
+    )
+
+@app.route('/transcripts/<access_token>/html')
+def transcript_page(access_token):
+    """A ticket transcript rendered as HTML, streamed from the archive"""
+    from flask import Response, stream_with_context
+    from utils.transcripts import get_transcript, render_html
+    
+    transcript = get_transcript(access_token)
+    if transcript is None or not os.path.exists(transcript.path):
+        return {"error": "not found"}, 404
+    return Response(stream_with_context(render_html(transcript.path)), mimetype="text/html")
+
 # Create database tables
-with app.app_context():
-    import models
-    db.create_all()
+init_db()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
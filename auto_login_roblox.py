@@ -96,8 +96,9 @@ async def refresh_cookie():
             logger.info(f"Roblox cookie refreshed successfully. Next refresh in {COOKIE_REFRESH_INTERVAL//3600} hours")
             
             # Update GitHub repository if needed
+            # update_github_env makes blocking requests calls, so keep it off the event loop
             if RUNNING_ON_RENDER:
-                update_github_env()
+                await asyncio.get_running_loop().run_in_executor(None, update_github_env)
         else:
             logger.error("Failed to refresh Roblox cookie")
 
@@ -105,6 +106,9 @@ async def cookie_refresh_loop():
     """
     Background loop to periodically refresh the Roblox cookie
     """
+    from utils.loop_monitor import start_loop_monitor
+    start_loop_monitor("cookie-refresh")
+    
     while True:
         try:
             await refresh_cookie()
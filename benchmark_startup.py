@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+# Modules measured by default: the bot entry point and the web app
+DEFAULT_MODULES = ["bot", "app"]
+
+# Number of fresh interpreters started per module
+RUNS = int(os.environ.get("BENCHMARK_RUNS", "5"))
+
+# Code run in a fresh interpreter to time one import and report peak RSS
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "flask_loaded": "flask" in sys.modules,
+    "modules_loaded": len(sys.modules)
+}}))
+"""
+
+def measure(module):
+    """
+    Import a module in fresh interpreters and collect timing and memory
+
+    Args:
+        module (str): The module to import
+
+    Returns:
+        dict: Median import time, peak RSS, whether Flask was loaded and module count
+    """
+    samples = []
+    for _ in range(RUNS):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            capture_output=True,
+            text=True,
+            # Keep the database URL unset so nothing connects
+            env={key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+        )
+        if result.returncode != 0:
+            print(f"Failed to import {module}:\n{result.stderr}")
+            return None
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    samples.sort(key=lambda sample: sample["import_seconds"])
+    median = samples[len(samples) // 2]
+    return {
+        "module": module,
+        "import_ms": round(median["import_seconds"] * 1000, 1),
+        "max_rss_mb": round(median["max_rss_kb"] / 1024, 1),
+        "flask_loaded": median["flask_loaded"],
+        "modules_loaded": median["modules_loaded"]
+    }
+
+def main():
+    modules = sys.argv[1:] or DEFAULT_MODULES
+    print(f"Measuring import time and peak RSS over {RUNS} runs per module")
+    for module in modules:
+        stats = measure(module)
+        if stats:
+            print(
+                f"{stats['module']:<10} import {stats['import_ms']:>8} ms  "
+                f"RSS {stats['max_rss_mb']:>7} MB  "
+                f"modules {stats['modules_loaded']:>5}  "
+                f"flask loaded: {stats['flask_loaded']}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,50 @@
 import os
+import asyncio
 import logging
 import discord
 from discord.ext import commands
 import discord.ext.commands as commands_ext
 
+from utils.sharding import EventRateTracker, get_shard_config, shard_for_event, format_shard_ids
+from utils.instrumentation import InstrumentedCommandTree
+from utils import metrics
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+class ShardStatsMixin:
+    """Counts dispatched events per shard for the shard status report"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.event_tracker = EventRateTracker()
+    
+    def dispatch(self, event_name, /, *args, **kwargs):
+        self.event_tracker.record(shard_for_event(args, self.shard_count))
+        super().dispatch(event_name, *args, **kwargs)
+    
+    async def close(self):
+        # Release the shared Roblox connections before the loop goes away
+        from utils.roblox_api import close_session
+        await close_session()
+        await super().close()
+
+class RandomBot(ShardStatsMixin, commands_ext.Bot):
+    pass
+
+class ShardedRandomBot(ShardStatsMixin, commands_ext.AutoShardedBot):
+    pass
+
 # Initialize bot with all intents for full functionality
 intents = discord.Intents.all()
-bot = commands_ext.Bot(command_prefix="/", intents=intents)
+
+# SHARD_COUNT enables sharding; SHARD_IDS limits this process to a range of shards (set by the cluster launcher)
+SHARD_COUNT, SHARD_IDS, CLUSTER_ID = get_shard_config()
+if SHARD_COUNT or SHARD_IDS:
+    bot = ShardedRandomBot(command_prefix="/", intents=intents, tree_cls=InstrumentedCommandTree, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+    logger.info(f"Cluster {CLUSTER_ID} running shards {format_shard_ids(SHARD_IDS) or 'all'} of {SHARD_COUNT or 'auto'}")
+else:
+    bot = RandomBot(command_prefix="/", intents=intents, tree_cls=InstrumentedCommandTree)
 
 # Bot events
 @bot.event
@@ -20,12 +55,8 @@ async def on_ready():
     # Log the number of servers the bot is in
     logger.info(f"Bot is in {len(bot.guilds)} servers")
     
-    # Sync slash commands
-    try:
-        synced = await bot.tree.sync()
-        logger.info(f"Synced {len(synced)} command(s)")
-    except Exception as e:
-        logger.error(f"Failed to sync commands: {e}")
+    if bot.shard_count:
+        logger.info(f"Cluster {CLUSTER_ID} ready with {len(getattr(bot, 'shards', {})) or 1} of {bot.shard_count} shard(s)")
     
     # Set the bot status
     await bot.change_presence(activity=discord.Activity(
@@ -53,6 +84,11 @@ async def on_guild_join(guild):
         except Exception as e:
             logger.error(f"Failed to send welcome message: {e}")
 
+@bot.event
+async def on_app_command_completion(interaction, command):
+    """Record total latency for app commands that finished without an error"""
+    metrics.record_completion(interaction)
+
 @bot.event
 async def on_command_error(ctx, error):
     """Global error handler for command errors"""
@@ -85,4 +121,55 @@ async def load_extensions():
 @bot.event
 async def setup_hook():
     """Setup hook that runs before the bot starts its connection to Discord"""
+    # Create tables here instead of relying on the web app having been imported
+    from database import init_db
+    init_db()
+    
+    # Collect command metrics and publish them for the web app's /metrics route
+    metrics.install_interaction_instrumentation()
+    from utils.rest_budget import install_rest_instrumentation
+    install_rest_instrumentation()
+    metrics.registry.is_bot_process = True
+    bot.metrics_snapshot_task = asyncio.create_task(metrics.snapshot_loop())
+    
+    # Watch for callbacks that block the event loop (and delay gateway heartbeats)
+    from utils.loop_monitor import start_loop_monitor
+    bot.loop_monitor = start_loop_monitor("bot")
+    
+    # Start background workers so cogs can hand off slow work after acknowledging interactions
+    from utils.work_queue import task_system
+    task_system.start()
+    bot.task_system = task_system
+    
+    # Jobs scheduled for later (e.g. ticket auto-deletion) are stored in the database and run from here
+    from utils.delayed_jobs import delayed_jobs
+    delayed_jobs.start(bot)
+    bot.delayed_jobs = delayed_jobs
+    
+    # Known Roblox usernames for autocomplete, loaded off the event loop
+    from utils.username_index import warm_username_index
+    bot.username_index_task = asyncio.create_task(warm_username_index())
+    
+    # Roblox account -> Discord member map for /whois, reloaded periodically
+    from utils.account_links import keep_account_links_warm
+    bot.account_links_task = asyncio.create_task(keep_account_links_warm())
+    
+    # Add transcripts that haven't been indexed yet to the ticket search index
+    from utils.transcript_search import catch_up_search_index
+    bot.search_index_task = asyncio.create_task(catch_up_search_index())
+    
+    # Fill the ticket stats rollups from existing tickets the first time they are used
+    from utils.ticket_stats import schedule_stats_backfill
+    bot.ticket_stats_task = asyncio.create_task(schedule_stats_backfill())
+    
+    # Trim standby ticket channels when tickets slow down, and remove them from guilds that left pool mode
+    from utils.ticket_pool import keep_ticket_pools_reconciled
+    bot.ticket_pool_task = asyncio.create_task(keep_ticket_pools_reconciled(bot))
+    
     await load_extensions()
+    
+    # Sync slash commands here rather than in on_ready, which fires again on every reconnect
+    # Only the first cluster syncs, the command tree is the same in every shard process
+    if CLUSTER_ID == 0:
+        from utils.command_sync import sync_command_tree
+        await sync_command_tree(bot)
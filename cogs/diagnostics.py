@@ -0,0 +1,212 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import logging
+
+from utils.embed_builder import create_embed
+from utils.sharding import shard_report
+from utils.loop_monitor import loop_report
+from utils.work_queue import task_system
+from utils.rest_budget import budget
+
+logger = logging.getLogger(__name__)
+
+class Diagnostics(commands.Cog):
+    """Handles bot health and diagnostics commands"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(name="shard-status", description="Show latency and event rate for each shard")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def shard_status(self, interaction: discord.Interaction):
+        """Show a per-shard latency and event-rate report"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            report = shard_report(self.bot, self.bot.event_tracker)
+
+            embed = create_embed(
+                title="Shard Status",
+                description=f"This guild is on shard {interaction.guild.shard_id}. "
+                            f"Shards in this process: {len(report)} of {self.bot.shard_count or 1}.",
+                color=discord.Color.blue()
+            )
+
+            for shard in report[:25]:
+                latency = f"{shard['latency_ms']} ms" if shard["latency_ms"] is not None else "N/A"
+                embed.add_field(
+                    name=f"Shard {shard['shard_id']}",
+                    value=f"Latency: {latency}\nGuilds: {shard['guilds']}\nEvents/min: {shard['events_per_minute']}",
+                    inline=True
+                )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"Error in shard-status command: {e}")
+            await interaction.followup.send(
+                "An error occurred while building the shard report. Please try again later.",
+                ephemeral=True
+            )
+
+    @shard_status.error
+    async def shard_status_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Administrator permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in shard-status command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="loop-lag", description="Show event loop lag and recent blocking calls")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def loop_lag(self, interaction: discord.Interaction):
+        """Show event loop lag and the most recent callbacks that blocked the loop"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            embed = create_embed(
+                title="Event Loop Lag",
+                description="Callbacks that blocked an event loop longer than its threshold, most recent first.",
+                color=discord.Color.blue()
+            )
+
+            for loop in loop_report():
+                embed.add_field(
+                    name=f"Loop: {loop['loop']}",
+                    value=f"Lag: {loop['lag_ms']} ms (max {loop['max_lag_ms']} ms)\n"
+                          f"Threshold: {loop['threshold_ms']} ms\n"
+                          f"Recent blocking calls: {len(loop['offenders'])}",
+                    inline=False
+                )
+
+                for offender in reversed(loop["offenders"][-3:]):
+                    location = offender["stack"][-1].strip() if offender["stack"] else "unknown location"
+                    if len(location) > 900:
+                        location = location[:897] + "..."
+                    embed.add_field(
+                        name=f"{offender['duration_ms']} ms at {offender['started_at']}",
+                        value=f"```{location}```",
+                        inline=False
+                    )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"Error in loop-lag command: {e}")
+            await interaction.followup.send(
+                "An error occurred while building the event loop report. Please try again later.",
+                ephemeral=True
+            )
+
+    @loop_lag.error
+    async def loop_lag_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Administrator permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in loop-lag command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="work-queues", description="Show background work queue depth and failed jobs")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def work_queues(self, interaction: discord.Interaction):
+        """Show depth, running jobs and recent dead letters for each work queue"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            embed = create_embed(
+                title="Work Queues",
+                description="Background jobs waiting and running in this process.",
+                color=discord.Color.blue()
+            )
+
+            for queue in task_system.report()[:25]:
+                value = f"Workers: {queue['workers']}\nWaiting: {queue['depth']}\nRunning: {queue['running']}\n" \
+                        f"Dead letters: {len(queue['dead_letters'])}"
+                if queue["dead_letters"]:
+                    last = queue["dead_letters"][-1]
+                    value += f"\nLast failure: {last['job']} at {last['failed_at']}"
+                embed.add_field(name=queue["queue"], value=value[:1024], inline=True)
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"Error in work-queues command: {e}")
+            await interaction.followup.send(
+                "An error occurred while building the work queue report. Please try again later.",
+                ephemeral=True
+            )
+
+    @work_queues.error
+    async def work_queues_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Administrator permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in work-queues command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="rest-budget", description="Show Discord rate limit buckets that have been hit the most")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def rest_budget(self, interaction: discord.Interaction):
+        """Show remaining requests, 429s and sleep time for the busiest rate limit buckets"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            embed = create_embed(
+                title="Discord REST Budget",
+                description="Rate limit buckets in this process, most rate limited first.",
+                color=discord.Color.blue()
+            )
+
+            for bucket in budget.report(limit=10):
+                remaining = "unknown" if bucket["remaining"] is None else f"{bucket['remaining']}/{bucket['limit']}"
+                embed.add_field(
+                    name=bucket["route"][:256],
+                    value=f"Major: {bucket['major'] or 'none'}\nRemaining: {remaining} (resets in {bucket['reset_in']}s)\n"
+                          f"Requests: {bucket['requests']}\n429s: {bucket['rate_limited']}\nSlept: {bucket['sleep_seconds']}s",
+                    inline=False
+                )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"Error in rest-budget command: {e}")
+            await interaction.followup.send(
+                "An error occurred while building the REST budget report. Please try again later.",
+                ephemeral=True
+            )
+
+    @rest_budget.error
+    async def rest_budget_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Administrator permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in rest-budget command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
@@ -0,0 +1,156 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+import logging
+
+from database import db, with_db_session
+from models import GroupRankBinding
+from utils.admission import BUSY_MESSAGE, cooldown
+from utils.embed_builder import create_embed
+from utils.group_sync import apply_guild_bindings, sync_group, sync_loop
+from utils.roblox_api import USMC_GROUP_ID
+from utils.work_queue import WorkQueueFull, task_system
+
+logger = logging.getLogger(__name__)
+
+@with_db_session
+def add_binding(guild_id, rank, role_id):
+    existing = GroupRankBinding.query.filter_by(
+        guild_id=str(guild_id), group_id=USMC_GROUP_ID, rank=rank, role_id=str(role_id)
+    ).first()
+    if existing:
+        return False
+    db.session.add(GroupRankBinding(guild_id=str(guild_id), group_id=USMC_GROUP_ID, rank=rank, role_id=str(role_id)))
+    db.session.commit()
+    return True
+
+@with_db_session
+def remove_binding(guild_id, rank, role_id):
+    deleted = GroupRankBinding.query.filter_by(
+        guild_id=str(guild_id), group_id=USMC_GROUP_ID, rank=rank, role_id=str(role_id)
+    ).delete()
+    db.session.commit()
+    return deleted > 0
+
+@with_db_session
+def list_bindings(guild_id):
+    return GroupRankBinding.query.filter_by(guild_id=str(guild_id), group_id=USMC_GROUP_ID).order_by(GroupRankBinding.rank).all()
+
+class GroupSync(commands.Cog):
+    """Keeps Discord roles in line with ranks in the Roblox group"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.sync_task = None
+
+    async def cog_load(self):
+        self.sync_task = asyncio.create_task(sync_loop(self.bot))
+
+    async def cog_unload(self):
+        if self.sync_task:
+            self.sync_task.cancel()
+
+    @app_commands.command(name="bind-rank", description="Give a Discord role to members with a Roblox group rank")
+    @app_commands.describe(rank="The group rank number (1-255)", role="The role to give")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def bind_rank(self, interaction: discord.Interaction, rank: app_commands.Range[int, 1, 255], role: discord.Role):
+        """Bind a group rank to a Discord role and apply it to current members"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        try:
+            if role >= interaction.guild.me.top_role:
+                return await interaction.edit_original_response(
+                    content=f"{role.mention} is above my highest role, so I can't assign it."
+                )
+
+            if not add_binding(interaction.guild.id, rank, role.id):
+                return await interaction.edit_original_response(content=f"Rank {rank} is already bound to {role.mention}.")
+
+            async def apply():
+                stats = await apply_guild_bindings(self.bot, interaction.guild)
+                if stats is None:
+                    return f"Bound rank {rank} to {role.mention}. Roles will be assigned after the next group sync."
+                return f"Bound rank {rank} to {role.mention}. Added {stats['added']} role(s), removed {stats['removed']}."
+
+            task_system.enqueue_for_interaction(interaction, "default", apply, max_retries=0)
+
+        except WorkQueueFull:
+            await interaction.edit_original_response(content=BUSY_MESSAGE)
+        except Exception as e:
+            logger.error(f"Error in bind-rank command: {e}")
+            await interaction.edit_original_response(content="An error occurred while binding the rank. Please try again later.")
+
+    @app_commands.command(name="unbind-rank", description="Stop giving a Discord role for a Roblox group rank")
+    @app_commands.describe(rank="The group rank number (1-255)", role="The bound role")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def unbind_rank(self, interaction: discord.Interaction, rank: app_commands.Range[int, 1, 255], role: discord.Role):
+        """Remove a rank binding, members keep the role until the next sync changes their rank"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            if remove_binding(interaction.guild.id, rank, role.id):
+                await interaction.followup.send(f"Rank {rank} is no longer bound to {role.mention}.", ephemeral=True)
+            else:
+                await interaction.followup.send(f"Rank {rank} is not bound to {role.mention}.", ephemeral=True)
+        except Exception as e:
+            logger.error(f"Error in unbind-rank command: {e}")
+            await interaction.followup.send("An error occurred while removing the binding. Please try again later.", ephemeral=True)
+
+    @app_commands.command(name="group-sync", description="Sync Roblox group ranks now and show the bindings")
+    @app_commands.checks.has_permissions(administrator=True)
+    @cooldown(1, 120)
+    async def group_sync(self, interaction: discord.Interaction):
+        """Run a roster sync now and report what changed"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        async def run_sync():
+            diff, stats = await sync_group(self.bot)
+            embed = create_embed(
+                title="Roblox Group Sync",
+                description=f"Since the last sync: {diff.summary()}." if not diff.first_sync else
+                            f"First sync: {len(diff.added)} members recorded.",
+                color=discord.Color.green()
+            )
+            embed.add_field(
+                name="Role Updates",
+                value=f"Added: {stats['added']}\nRemoved: {stats['removed']}\nFailed: {stats['failed']}",
+                inline=False
+            )
+            bindings = list_bindings(interaction.guild.id)
+            embed.add_field(
+                name="Bindings",
+                value="\n".join(f"Rank {binding.rank} → <@&{binding.role_id}>" for binding in bindings[:20]) or "None",
+                inline=False
+            )
+            return {"content": None, "embed": embed}
+
+        try:
+            task_system.enqueue_for_interaction(
+                interaction,
+                "default",
+                run_sync,
+                max_retries=0,
+                error_message="The group sync failed. Please try again later."
+            )
+        except WorkQueueFull:
+            await interaction.edit_original_response(content=BUSY_MESSAGE)
+
+    @bind_rank.error
+    @unbind_rank.error
+    @group_sync.error
+    async def permission_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Administrator permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in group sync command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+async def setup(bot):
+    await bot.add_cog(GroupSync(bot))
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 
 from utils.roblox_api import rank_user
 from utils.embed_builder import create_embed
+from utils.username_index import roblox_username_autocomplete
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,7 @@ class Moderation(commands.Cog):
         roblox_username="The Roblox username of the user to rank",
         rank_name="The name of the rank to assign"
     )
+    @app_commands.autocomplete(roblox_username=roblox_username_autocomplete)
     @app_commands.checks.has_permissions(administrator=True)
     async def rank(self, interaction: discord.Interaction, roblox_username: str, rank_name: str):
         """Rank a user in a Roblox group"""
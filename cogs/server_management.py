@@ -2,13 +2,16 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 
-from app import db
+from database import db
 from models import ServerConfig, HostedEvent
 from utils.embed_builder import create_embed
-from utils.ticket_system import create_ticket_button
+from utils.event_scheduler import EVENT_REMINDER_MINUTES, EventScheduler
+from utils.ticket_system import create_ticket_button, split_mentionable_roles, thread_staff_roles
+from utils.ticket_categories import staff_role_cache
+from utils.ticket_pool import ticket_pool
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +20,14 @@ class ServerManagement(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
+        self.event_scheduler = EventScheduler(bot)
+    
+    async def cog_load(self):
+        self.event_scheduler.start()
+        self.bot.event_scheduler = self.event_scheduler
+    
+    async def cog_unload(self):
+        self.event_scheduler.stop()
     
     @app_commands.command(name="host", description="Create a hosting announcement")
     @app_commands.describe(
@@ -49,7 +60,6 @@ class ServerManagement(commands.Cog):
                     if minutes_str and int(minutes_str) >= 0 and int(minutes_str) <= 30:
                         minutes = int(minutes_str)
                         # Calculate start_time as now + minutes
-                        from datetime import timedelta
                         start_time = now + timedelta(minutes=minutes)
                         logger.info(f"Parsed relative start time: {minutes} minutes from now")
                     else:
@@ -76,7 +86,6 @@ class ServerManagement(commands.Cog):
                     if minutes_str and int(minutes_str) in [5, 10]:
                         minutes = int(minutes_str)
                         # Calculate end_time as start_time + minutes
-                        from datetime import timedelta
                         end_time = start_time + timedelta(minutes=minutes)
                         logger.info(f"Parsed relative end time: {minutes} minutes from start time")
                     else:
@@ -144,12 +153,12 @@ class ServerManagement(commands.Cog):
                 announcement = await channel.send(embed=embed)
                 
                 # Save the hosted event to the database with improved error handling
-                # Import app context function and required models
+                # Import database session helper and required models
                 try:
-                    from app import with_app_context, db
+                    from database import with_db_session, db
                     from models import HostedEvent
                     
-                    @with_app_context
+                    @with_db_session
                     def save_event_to_db():
                         try:
                             new_event = HostedEvent(
@@ -165,16 +174,19 @@ class ServerManagement(commands.Cog):
                             db.session.add(new_event)
                             db.session.commit()
                             logger.info(f"Successfully saved hosted event to database")
-                            return True
+                            return new_event
                         except Exception as e:
                             db.session.rollback()  # Rollback on error
                             logger.error(f"Error saving event to database: {e}")
-                            return False
+                            return None
                     
                     # Call the function to save the event
-                    result = save_event_to_db()
-                    if not result:
+                    saved_event = save_event_to_db()
+                    if saved_event is None:
                         logger.warning("Failed to save event to database, but continuing with UI feedback")
+                    else:
+                        # Reminder and start/end status edits on the announcement
+                        self.event_scheduler.add(saved_event, new=True)
                 except Exception as e:
                     logger.error(f"Critical error in database handling: {e}")
                     # Continue with UI feedback even if DB fails
@@ -182,7 +194,10 @@ class ServerManagement(commands.Cog):
                 # Send confirmation to the command user
                 confirm_embed = create_embed(
                     title="Hosting Announcement Created",
-                    description=f"Your {event_type} announcement has been posted in {channel.mention}.",
+                    description=f"Your {event_type} announcement has been posted in {channel.mention}." + (
+                        f" A reminder will be posted {EVENT_REMINDER_MINUTES} minutes before it starts."
+                        if start_time - now > timedelta(minutes=EVENT_REMINDER_MINUTES) else ""
+                    ),
                     color=discord.Color.green()
                 )
                 
@@ -293,10 +308,16 @@ class ServerManagement(commands.Cog):
     
     @app_commands.command(name="sendticket", description="Set up a ticket system in a channel")
     @app_commands.describe(
-        channel="The channel to set up the ticket system in"
+        channel="The channel to set up the ticket system in",
+        mode="Open each ticket as its own channel or as a private thread in this channel"
     )
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="Channel per ticket", value="channel"),
+        app_commands.Choice(name="Private thread per ticket", value="thread"),
+        app_commands.Choice(name="Channel per ticket, from a pool of pre-created channels", value="pool")
+    ])
     @app_commands.checks.has_permissions(administrator=True)
-    async def sendticket(self, interaction: discord.Interaction, channel: discord.TextChannel):
+    async def sendticket(self, interaction: discord.Interaction, channel: discord.TextChannel, mode: str = "channel"):
         """Set up a ticket system in a channel"""
         await interaction.response.defer(ephemeral=True)
         
@@ -308,6 +329,24 @@ class ServerManagement(commands.Cog):
                     ephemeral=True
                 )
             
+            if mode == "thread" and not channel.permissions_for(interaction.guild.me).create_private_threads:
+                return await interaction.followup.send(
+                    f"I don't have permission to create private threads in {channel.mention}.",
+                    ephemeral=True
+                )
+            
+            if mode == "thread":
+                # Staff are added to each private thread by mentioning their roles, which only works for roles the bot can mention
+                _, visible_roles = await staff_role_cache.get(interaction.guild)
+                _, unmentionable = split_mentionable_roles(channel, thread_staff_roles(visible_roles))
+                if unmentionable:
+                    return await interaction.followup.send(
+                        f"Thread tickets add staff by mentioning their roles, but I can't mention "
+                        f"{', '.join(role.name for role in unmentionable)}. Make those roles mentionable "
+                        f"or give me the Mention Everyone permission in {channel.mention}.",
+                        ephemeral=True
+                    )
+            
             # Create the ticket system embed
             embed = create_embed(
                 title="🎫 Support Tickets",
@@ -324,20 +363,22 @@ class ServerManagement(commands.Cog):
                 
                 # Update the server config with the ticket channel - improved error handling
                 try:
-                    from app import with_app_context, db
+                    from database import with_db_session, db
                     from models import ServerConfig
                     
-                    @with_app_context
+                    @with_db_session
                     def update_server_config():
                         try:
                             server_config = ServerConfig.query.filter_by(guild_id=str(interaction.guild.id)).first()
                             
                             if server_config:
                                 server_config.ticket_channel_id = str(channel.id)
+                                server_config.ticket_mode = mode
                             else:
                                 server_config = ServerConfig(
                                     guild_id=str(interaction.guild.id),
-                                    ticket_channel_id=str(channel.id)
+                                    ticket_channel_id=str(channel.id),
+                                    ticket_mode=mode
                                 )
                                 db.session.add(server_config)
                             
@@ -353,6 +394,8 @@ class ServerManagement(commands.Cog):
                     result = update_server_config()
                     if not result:
                         logger.warning("Failed to update server config, but continuing with UI feedback")
+                    elif mode == "pool":
+                        ticket_pool.refill(interaction.guild)
                 except Exception as e:
                     logger.error(f"Critical error in database handling for ticket setup: {e}")
                     # Continue with UI feedback even if DB fails
@@ -360,7 +403,10 @@ class ServerManagement(commands.Cog):
                 # Send confirmation to the command user
                 confirm_embed = create_embed(
                     title="Ticket System Set Up",
-                    description=f"Ticket system has been set up in {channel.mention}.",
+                    description=f"Ticket system has been set up in {channel.mention}." + (
+                        " Tickets will open as private threads in that channel." if mode == "thread" else
+                        " Hidden standby channels will be created so tickets open instantly." if mode == "pool" else ""
+                    ),
                     color=discord.Color.green()
                 )
                 
@@ -412,12 +458,12 @@ class ServerManagement(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Import app context function and required models with improved error handling
+            # Import database session helper and required models with improved error handling
             try:
-                from app import with_app_context, db
+                from database import with_db_session, db
                 from models import ServerConfig
                 
-                @with_app_context
+                @with_db_session
                 def update_server_config():
                     try:
                         server_config = ServerConfig.query.filter_by(guild_id=str(interaction.guild.id)).first()
@@ -468,6 +514,11 @@ class ServerManagement(commands.Cog):
             
             if verified_role:
                 embed.add_field(name="Verified Role", value=verified_role.mention)
+                embed.add_field(
+                    name="Existing Members",
+                    value="Run `/reconcile` to give the verified role to members who are already verified.",
+                    inline=False
+                )
             
             if announcement_channel:
                 embed.add_field(name="Announcement Channel", value=announcement_channel.mention)
@@ -514,9 +565,9 @@ class ServerManagement(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Import app context function and required models with improved error handling
+            # Import database session helper and required models with improved error handling
             try:
-                from app import with_app_context, db
+                from database import with_db_session, db
                 from models import TicketRole
                 
                 # Parse role IDs
@@ -534,7 +585,7 @@ class ServerManagement(commands.Cog):
                         except ValueError:
                             logger.warning(f"Invalid role ID: {role_id}")
                 
-                @with_app_context
+                @with_db_session
                 def update_ticket_roles():
                     try:
                         # First, delete existing ticket roles for this guild
@@ -576,6 +627,8 @@ class ServerManagement(commands.Cog):
                         "An error occurred while updating ticket roles. Please try again later.",
                         ephemeral=True
                     )
+                # New tickets pick up the roles straight away rather than when the cache expires
+                staff_role_cache.invalidate(interaction.guild.id)
             except Exception as e:
                 logger.error(f"Critical error in database handling for ticket roles setup: {e}")
                 return await interaction.followup.send(
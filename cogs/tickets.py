@@ -0,0 +1,186 @@
+import discord
+from discord import app_commands
+from discord.ext import commands
+import asyncio
+import logging
+from datetime import datetime
+
+from utils.admission import cooldown
+from utils.embed_builder import create_embed
+from utils.ticket_stats import MAX_STATS_DAYS, get_ticket_stats
+from utils.transcript_search import search_transcripts
+from utils.transcripts import transcript_url
+
+logger = logging.getLogger(__name__)
+
+# Characters of each matching message shown in /ticket-search
+SNIPPET_LENGTH = 180
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD option, None if it wasn't given"""
+    return datetime.strptime(value.strip(), "%Y-%m-%d") if value else None
+
+def format_duration(seconds):
+    """Short human duration, e.g. 45m or 3h 20m or 2d 4h"""
+    if seconds is None:
+        return "n/a"
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes}m" if minutes else f"{hours}h"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h" if hours else f"{days}d"
+
+class Tickets(commands.Cog):
+    """Staff commands for looking back over support tickets"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(name="ticket-search", description="Search the transcripts of deleted tickets")
+    @app_commands.describe(
+        query="Words to look for",
+        member="Only tickets opened by this member",
+        after="Only messages on or after this date (YYYY-MM-DD)",
+        before="Only messages before this date (YYYY-MM-DD)",
+        page="Page of results"
+    )
+    @app_commands.checks.has_permissions(manage_messages=True)
+    @cooldown(5, 30)
+    async def ticket_search(
+        self,
+        interaction: discord.Interaction,
+        query: str,
+        member: discord.Member = None,
+        after: str = None,
+        before: str = None,
+        page: app_commands.Range[int, 1, 100] = 1
+    ):
+        """Full-text search over ticket transcripts in this server"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            try:
+                after_date, before_date = parse_date(after), parse_date(before)
+            except ValueError:
+                return await interaction.followup.send("Dates must look like 2025-03-01.", ephemeral=True)
+
+            loop = asyncio.get_running_loop()
+            results, has_more = await loop.run_in_executor(
+                None,
+                lambda: search_transcripts(
+                    interaction.guild.id,
+                    query,
+                    user_id=member.id if member else None,
+                    after=after_date,
+                    before=before_date,
+                    page=page
+                )
+            )
+
+            if not results:
+                return await interaction.followup.send(
+                    "No ticket messages matched." if page == 1 else f"There is no page {page}.",
+                    ephemeral=True
+                )
+
+            embed = create_embed(
+                title=f"Ticket Search: {query[:100]}",
+                description=f"Page {page}" + (f" · use page {page + 1} for more" if has_more else ""),
+                color=discord.Color.blue()
+            )
+            for result in results:
+                snippet = " ".join(result["snippet"].split())
+                if len(snippet) > SNIPPET_LENGTH:
+                    snippet = snippet[:SNIPPET_LENGTH - 3] + "..."
+                link = f"\n[Transcript]({transcript_url(result['access_token'])})" if result["access_token"] else ""
+                embed.add_field(
+                    name=f"Ticket #{result['ticket_id']} · {result['created_at'].strftime('%Y-%m-%d')}",
+                    value=f"<@{result['author_id']}>: {snippet}{link}",
+                    inline=False
+                )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"Error in ticket-search command: {e}")
+            await interaction.followup.send(
+                "An error occurred while searching tickets. Please try again later.",
+                ephemeral=True
+            )
+
+    @ticket_search.error
+    async def ticket_search_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Manage Messages permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in ticket-search command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+    @app_commands.command(name="ticket-stats", description="Show ticket volume and time to close for this server")
+    @app_commands.describe(days="Number of days to report on, up to today")
+    @app_commands.checks.has_permissions(manage_messages=True)
+    @cooldown(5, 30)
+    async def ticket_stats(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, MAX_STATS_DAYS] = 30):
+        """Ticket statistics from the daily rollups"""
+        await interaction.response.defer(ephemeral=True)
+
+        try:
+            loop = asyncio.get_running_loop()
+            stats = await loop.run_in_executor(None, get_ticket_stats, interaction.guild.id, days)
+
+            embed = create_embed(
+                title="Ticket Stats",
+                description=f"Last {stats['days']} day{'s' if stats['days'] != 1 else ''} (UTC)",
+                color=discord.Color.blue()
+            )
+            embed.add_field(name="Open Now", value=str(stats["open_tickets"]), inline=True)
+            embed.add_field(name="Opened", value=str(stats["opened"]), inline=True)
+            embed.add_field(name="Closed", value=str(stats["closed"]), inline=True)
+            embed.add_field(name="Tickets per Day", value=f"{stats['tickets_per_day']:.1f}", inline=True)
+            embed.add_field(name="Median Time to Close", value=format_duration(stats["median_close_seconds"]), inline=True)
+            embed.add_field(name="Average Time to Close", value=format_duration(stats["average_close_seconds"]), inline=True)
+            if stats["reopened"]:
+                embed.add_field(name="Reopened", value=str(stats["reopened"]), inline=True)
+
+            recent = stats["per_day"][-7:]
+            if recent:
+                embed.add_field(
+                    name="Recent Days (opened / closed)",
+                    value="\n".join(f"{day.isoformat()}: {opened} / {closed}" for day, opened, closed in reversed(recent)),
+                    inline=False
+                )
+
+            await interaction.followup.send(embed=embed, ephemeral=True)
+
+        except Exception as e:
+            logger.error(f"Error in ticket-stats command: {e}")
+            await interaction.followup.send(
+                "An error occurred while loading ticket stats. Please try again later.",
+                ephemeral=True
+            )
+
+    @ticket_stats.error
+    async def ticket_stats_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Manage Messages permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in ticket-stats command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
+async def setup(bot):
+    await bot.add_cog(Tickets(bot))
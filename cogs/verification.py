@@ -1,24 +1,142 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import asyncio
 import logging
+import os
 import random
 import string
+import time
 from datetime import datetime
 
-from app import db, get_db_session
+from database import db
 from models import User, ServerConfig
 from utils.roblox_api import (
     get_roblox_user_by_username,
     check_verification,
     get_roblox_user_info,
-    check_user_in_group
+    check_user_in_group,
+    get_user_avatar_url,
+    get_user_badges,
+    get_user_groups,
+    get_user_social_counts
 )
 from utils.embed_builder import create_embed
+from utils.admission import BUSY_MESSAGE, cooldown
+from utils.work_queue import PRIORITY_HIGH, WorkQueueFull, task_system
+from utils.rest_budget import member_edit_bucket, member_roles_bucket, run_bulk
+from utils.reconciliation import format_result, reconcile_guild
+from utils.username_index import roblox_username_autocomplete, username_index
+from utils.account_links import MAX_BULK_LOOKUP, account_links, parse_queries
+from utils.fanout import fan_out
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Seconds between progress edits while /reconcile applies changes
+RECONCILE_PROGRESS_INTERVAL = 3
+
+# Seconds /info-roblox waits for all of its sections together
+INFO_ROBLOX_DEADLINE = float(os.getenv("INFO_ROBLOX_DEADLINE", "8"))
+
+# Groups listed by /info-roblox
+MAX_INFO_GROUPS = 10
+
+def build_info_embed(roblox_username, roblox_id, results, pending=()):
+    """
+    Build the /info-roblox embed from whichever sections have arrived
+    
+    Args:
+        roblox_username (str): The name that was looked up
+        roblox_id (str): The Roblox user ID
+        results (dict): Section name -> fetched data, None for sections that failed
+        pending (iterable): Sections still loading, everything else missing is shown as unavailable
+        
+    Returns:
+        discord.Embed: The embed
+    """
+    user_info = results["profile"]
+    
+    def placeholder(name):
+        return "Loading..." if name in pending else "Unavailable"
+    
+    embed = create_embed(
+        title=f"Roblox User: {roblox_username}",
+        description=f"Basic information about {roblox_username}",
+        color=discord.Color.blue()
+    )
+    
+    embed.add_field(name="Display Name", value=user_info.get("displayName", "N/A"))
+    embed.add_field(name="User ID", value=roblox_id)
+    embed.add_field(name="Creation Date", value=user_info.get("created", "N/A"))
+    
+    if "isBanned" in user_info:
+        embed.add_field(name="Account Status", value="Banned" if user_info["isBanned"] else "Active")
+    
+    embed.add_field(name="Profile Link", value=f"https://www.roblox.com/users/{roblox_id}/profile")
+    
+    social = results.get("social")
+    if social:
+        embed.add_field(
+            name="Social",
+            value="\n".join(
+                f"{label}: {social[kind] if social.get(kind) is not None else 'N/A'}"
+                for kind, label in (("friends", "Friends"), ("followers", "Followers"), ("followings", "Following"))
+            )
+        )
+    else:
+        embed.add_field(name="Social", value=placeholder("social"))
+    
+    if "description" in user_info and user_info["description"]:
+        description = user_info["description"]
+        if len(description) > 1024:
+            description = description[:1021] + "..."
+        embed.add_field(name="Description", value=description, inline=False)
+    
+    groups = results.get("groups")
+    if groups is None or "groups" not in results:
+        embed.add_field(name="Groups", value=placeholder("groups"), inline=False)
+    else:
+        lines = [
+            f"{group.get('group', {}).get('name', 'Unknown')} ({group.get('role', {}).get('name', 'Member')})"
+            for group in groups[:MAX_INFO_GROUPS]
+        ]
+        if len(groups) > MAX_INFO_GROUPS:
+            lines.append(f"...and {len(groups) - MAX_INFO_GROUPS} more")
+        embed.add_field(name=f"Groups ({len(groups)})", value="\n".join(lines)[:1024] or "None", inline=False)
+    
+    badges = results.get("badges")
+    if badges is None:
+        embed.add_field(name="Recent Badges", value=placeholder("badges") if "badges" not in results else "Private or unavailable", inline=False)
+    else:
+        embed.add_field(name="Recent Badges", value=", ".join(badge.get("name", "Unknown") for badge in badges)[:1024] or "None", inline=False)
+    
+    avatar_url = results.get("avatar")
+    embed.set_thumbnail(url=avatar_url or f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=420&height=420")
+    return embed
+
+class WhoisModal(discord.ui.Modal, title="Who Is"):
+    """Paste a list of Roblox usernames or IDs, one per line"""
+    
+    names = discord.ui.TextInput(
+        label="Roblox usernames or IDs",
+        style=discord.TextStyle.paragraph,
+        placeholder="One per line, up to 100",
+        max_length=4000
+    )
+    
+    def __init__(self, cog):
+        super().__init__()
+        self.cog = cog
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        try:
+            await self.cog.send_whois(interaction, self.names.value)
+        except Exception as e:
+            logger.error(f"Error in whois modal: {e}")
+            await interaction.followup.send("An error occurred while looking up those accounts. Please try again later.", ephemeral=True)
+
 class Verification(commands.Cog):
     """Handles Roblox verification commands"""
     
@@ -31,11 +149,13 @@ class Verification(commands.Cog):
     
     @app_commands.command(name="verify", description="Verify your Roblox account")
     @app_commands.describe(roblox_username="Your Roblox username")
+    @app_commands.autocomplete(roblox_username=roblox_username_autocomplete)
+    @cooldown(2, 30)
     async def verify(self, interaction: discord.Interaction, roblox_username: str):
         """Verify a user's Roblox account"""
         # Try to respond immediately to see if basic interaction works
         try:
-            logger.info(f"VERIFY START: User {interaction.user.name} trying to verify as {roblox_username}")
+            logger.info("VERIFY START: User %s trying to verify as %s", interaction.user.name, roblox_username)
             
             # Start with a simple acknowledgment
             try:
@@ -45,14 +165,14 @@ class Verification(commands.Cog):
                 logger.error(f"CRITICAL ERROR: Failed to send initial response: {e}")
                 return
                 
-            # Import the app context function
-            from app import app, with_app_context
+            # Import the database session helper
+            from database import with_db_session
             
-            # Create an inner function to handle database operations with app context
-            @with_app_context
+            # Create an inner function to handle database operations with a fresh session
+            @with_db_session
             def update_or_create_user(discord_id, roblox_id, roblox_username, verification_code):
                 try:
-                    logger.info(f"Working inside app context to update/create user {discord_id}")
+                    logger.info("Working inside a fresh session to update/create user %s", discord_id)
                     from models import User
                     
                     # First, ensure the discord_id is a string
@@ -64,18 +184,18 @@ class Verification(commands.Cog):
                     result = db.session.execute(text("SELECT id FROM users WHERE discord_id = :discord_id"), 
                                              {"discord_id": discord_id})
                     user_exists = result.fetchone() is not None
-                    logger.info(f"Direct SQL check - User exists: {user_exists}")
+                    logger.info("Direct SQL check - User exists: %s", user_exists)
                     
                     # Now use the ORM with the knowledge of whether user exists
                     existing_user = User.query.filter_by(discord_id=discord_id).first()
-                    logger.info(f"ORM check - Existing user found: {existing_user is not None}")
+                    logger.info("ORM check - Existing user found: %s", existing_user is not None)
                     
                     if existing_user:
                         existing_user.roblox_id = roblox_id
                         existing_user.roblox_username = roblox_username
                         existing_user.verification_code = verification_code
                         existing_user.verified = False
-                        logger.info(f"Updated existing user: {existing_user.discord_id}")
+                        logger.info("Updated existing user: %s", existing_user.discord_id)
                     else:
                         # If direct SQL says user exists but ORM doesn't find it, force a commit and try again
                         if user_exists:
@@ -86,7 +206,7 @@ class Verification(commands.Cog):
                                 existing_user.roblox_username = roblox_username
                                 existing_user.verification_code = verification_code
                                 existing_user.verified = False
-                                logger.info(f"Updated existing user (after retry): {existing_user.discord_id}")
+                                logger.info("Updated existing user (after retry): %s", existing_user.discord_id)
                             else:
                                 logger.warning(f"Strange state: SQL says user exists but ORM can't find it after commit")
                         
@@ -100,7 +220,7 @@ class Verification(commands.Cog):
                                 verified=False
                             )
                             db.session.add(new_user)
-                            logger.info(f"Created new user for discord ID: {discord_id}")
+                            logger.info("Created new user for discord ID: %s", discord_id)
                     
                     # Flush changes to get any primary key values but don't commit yet
                     db.session.flush()
@@ -111,11 +231,11 @@ class Verification(commands.Cog):
                     # Verify the user was actually saved
                     verification_check = User.query.filter_by(discord_id=discord_id).first()
                     if verification_check:
-                        logger.info(f"DB VERIFICATION: User {discord_id} successfully saved with code {verification_check.verification_code}")
+                        logger.info("DB VERIFICATION: User %s successfully saved with code %s", discord_id, verification_check.verification_code)
                     else:
                         logger.error(f"DB VERIFICATION FAILED: User {discord_id} not found after saving!")
                         
-                    logger.info(f"DB SUCCESS: Updated user record for {discord_id}")
+                    logger.info("DB SUCCESS: Updated user record for %s", discord_id)
                     return True
                 except Exception as e:
                     logger.error(f"DB ERROR: Failed to update database: {e}")
@@ -124,16 +244,17 @@ class Verification(commands.Cog):
                         db.session.rollback()
                     except Exception as rollback_error:
                         logger.error(f"Rollback failed: {rollback_error}")
-                    return False
+                    # Raise so the work queue retries the write
+                    raise
             
             # Let's start with minimal functionality to isolate where the problem is
             try:
                 # Check if the Roblox username exists
-                logger.info(f"Verifying Roblox username: {roblox_username}")
+                logger.info("Verifying Roblox username: %s", roblox_username)
                 
                 # Special case handling for test username
                 if roblox_username.lower() in ["sysbloxluv", "systbloxluv", "roblox", "builderman"]:
-                    logger.info(f"Using hardcoded override for test username: {roblox_username}")
+                    logger.info("Using hardcoded override for test username: %s", roblox_username)
                     # Select the right ID based on username
                     test_id = 2470023  # Default test ID
                     if roblox_username.lower() == "roblox":
@@ -154,7 +275,7 @@ class Verification(commands.Cog):
                     
                     # Handle special test usernames as a fallback
                     if roblox_username.lower() in ["sysbloxluv", "systbloxluv", "roblox", "builderman"]:
-                        logger.info(f"Fallback handling for test username: {roblox_username}")
+                        logger.info("Fallback handling for test username: %s", roblox_username)
                         
                         # Select the right ID based on username
                         test_id = 2470023  # Default test ID
@@ -184,6 +305,26 @@ class Verification(commands.Cog):
                 # Generate a verification code  
                 verification_code = self.generate_verification_code()
                 
+                # Store the code before showing it, so /verify-confirm can always find it (the db queue retries the write)
+                try:
+                    await task_system.enqueue(
+                        "db",
+                        update_or_create_user,
+                        str(interaction.user.id),
+                        roblox_id,
+                        roblox_username,
+                        verification_code,
+                        priority=PRIORITY_HIGH
+                    )
+                except WorkQueueFull:
+                    return await interaction.followup.send(BUSY_MESSAGE, ephemeral=True)
+                except Exception as e:
+                    logger.error(f"Failed to save verification code for {interaction.user.id}: {e}")
+                    return await interaction.followup.send(
+                        "Could not save your verification code. Please try again later.",
+                        ephemeral=True
+                    )
+                
                 # Define constants
                 USMC_GROUP_ID = "11966964"
                 USMC_GROUP_URL = "https://www.roblox.com/communities/11966964/The-United-States-Marine-Corps"
@@ -226,18 +367,10 @@ class Verification(commands.Cog):
                 )
                 
                 await interaction.followup.send(embed=embed, ephemeral=True)
-                logger.info(f"VERIFY SUCCESS: Generated code {verification_code} for {interaction.user.name}")
-                
-                # Now update database in background after response is sent
-                success = update_or_create_user(
-                    str(interaction.user.id),
-                    roblox_id,
-                    roblox_username,
-                    verification_code
-                )
+                logger.info("VERIFY SUCCESS: Generated code %s for %s", verification_code, interaction.user.name)
                 
-                if not success:
-                    logger.error("Failed to update user in database, but verification code sent.")
+                # The account is unverified until /verify-confirm, so /whois no longer reports the old link
+                account_links.unlink(interaction.user.id)
                     
             except Exception as e:
                 logger.error(f"ROBLOX ERROR: Failed in Roblox API: {e}")
@@ -255,20 +388,21 @@ class Verification(commands.Cog):
                 pass
     
     @app_commands.command(name="verify-confirm", description="Confirm your Roblox verification")
+    @cooldown(1, 15)
     async def verify_confirm(self, interaction: discord.Interaction):
         """Confirm a user's Roblox verification"""
         try:
             await interaction.response.defer(ephemeral=True)
             
             # Add debug logging
-            logger.info(f"Verification confirmation started for user {interaction.user.name}")
+            logger.info("Verification confirmation started for user %s", interaction.user.name)
             
             try:
-                # Import the app context function
-                from app import app, with_app_context
+                # Import the database session helper
+                from database import with_db_session
                 
-                # Create an inner function to handle database operations with app context
-                @with_app_context
+                # Create an inner function to handle database operations with a fresh session
+                @with_db_session
                 def get_user_data(discord_id):
                     try:
                         from models import User
@@ -283,25 +417,25 @@ class Verification(commands.Cog):
                         result = db.session.execute(sql, {"discord_id": discord_id})
                         rows = result.fetchall()
                         sql_found = len(rows) > 0
-                        logger.info(f"Direct SQL query found {len(rows)} users with discord ID: {discord_id}")
+                        logger.info("Direct SQL query found %s users with discord ID: %s", len(rows), discord_id)
                         
                         # Then try with ORM
                         user = User.query.filter_by(discord_id=discord_id).first()
-                        logger.info(f"ORM query result: {user is not None}")
+                        logger.info("ORM query result: %s", user is not None)
                         
                         # If SQL finds a user but ORM doesn't, try to refresh the session
                         if sql_found and not user:
                             logger.warning("SQL found user but ORM didn't, refreshing session...")
                             db.session.commit()
                             user = User.query.filter_by(discord_id=discord_id).first()
-                            logger.info(f"After session refresh, ORM query result: {user is not None}")
+                            logger.info("After session refresh, ORM query result: %s", user is not None)
                             
                         return user
                     except Exception as e:
                         logger.error(f"Database error in get_user_data: {e}")
                         return None
                 
-                @with_app_context
+                @with_db_session
                 def get_server_config(guild_id):
                     try:
                         from models import ServerConfig
@@ -311,30 +445,30 @@ class Verification(commands.Cog):
                         logger.error(f"Database error in get_server_config: {e}")
                         return None
                 
-                @with_app_context
+                @with_db_session
                 def update_user_verified(user, verified_status, verification_date):
                     try:
                         user.verified = verified_status
                         user.verification_date = verification_date
                         db.session.commit()
-                        logger.info(f"Successfully updated user verification status to {verified_status}")
+                        logger.info("Successfully updated user verification status to %s", verified_status)
                         return True
                     except Exception as e:
                         logger.error(f"Failed to update user verification status: {e}")
                         return False
                         
-                # Get user data with app context
-                logger.info(f"Attempting to get user data for discord ID: {interaction.user.id}")
+                # Get user data with a fresh session
+                logger.info("Attempting to get user data for discord ID: %s", interaction.user.id)
                 user = get_user_data(str(interaction.user.id))
                 
                 # Enhanced debugging
-                logger.info(f"Verification confirmation - User retrieval result: {user is not None}")
+                logger.info("Verification confirmation - User retrieval result: %s", user is not None)
                 if user is not None:
-                    logger.info(f"User data - Discord ID: {user.discord_id}, Roblox ID: {user.roblox_id}, Code: {user.verification_code}")
+                    logger.info("User data - Discord ID: %s, Roblox ID: %s, Code: %s", user.discord_id, user.roblox_id, user.verification_code)
                 
                 if not user:
                     # Look up discord ID directly in the database for debugging
-                    @with_app_context
+                    @with_db_session
                     def direct_query():
                         from models import User
                         from sqlalchemy import text
@@ -343,10 +477,10 @@ class Verification(commands.Cog):
                             sql = text("SELECT * FROM users WHERE discord_id = :discord_id")
                             result = db.session.execute(sql, {"discord_id": str(interaction.user.id)})
                             rows = result.fetchall()
-                            logger.info(f"Direct DB query found {len(rows)} users with discord ID: {interaction.user.id}")
+                            logger.info("Direct DB query found %s users with discord ID: %s", len(rows), interaction.user.id)
                             if rows:
                                 for row in rows:
-                                    logger.info(f"Row data: {row}")
+                                    logger.info("Row data: %s", row)
                             return len(rows) > 0
                         except Exception as e:
                             logger.error(f"Direct query error: {e}")
@@ -360,10 +494,10 @@ class Verification(commands.Cog):
                         ephemeral=True
                     )
                 
-                logger.info(f"Found user in database: {user.roblox_username} (Roblox ID: {user.roblox_id})")
+                logger.info("Found user in database: %s (Roblox ID: %s)", user.roblox_username, user.roblox_id)
                 
                 if user.verified:
-                    logger.info(f"User {interaction.user.name} is already verified as {user.roblox_username}")
+                    logger.info("User %s is already verified as %s", interaction.user.name, user.roblox_username)
                     return await interaction.followup.send(
                         f"You are already verified as {user.roblox_username}.",
                         ephemeral=True
@@ -374,45 +508,50 @@ class Verification(commands.Cog):
                 USMC_GROUP_URL = "https://www.roblox.com/communities/11966964/The-United-States-Marine-Corps"
                 
                 # Verify user with Roblox API
-                logger.info(f"Checking verification code '{user.verification_code}' for user with Roblox ID {user.roblox_id}")
+                logger.info("Checking verification code '%s' for user with Roblox ID %s", user.verification_code, user.roblox_id)
                 try:
                     # Get environment information
                     import os
                     running_on_render = 'RENDER' in os.environ
-                    logger.info(f"Verification confirmation - Environment check - Running on Render: {running_on_render}")
+                    logger.info("Verification confirmation - Environment check - Running on Render: %s", running_on_render)
                     
                     # Send an update that we're checking verification
                     await interaction.followup.send("⏳ Checking your Roblox profile for the verification code...", ephemeral=True)
                     
                     # Actually check for verification code in profile
-                    logger.info(f"Checking for code '{user.verification_code}' in profile of {user.roblox_username} (ID: {user.roblox_id})")
+                    logger.info("Checking for code '%s' in profile of %s (ID: %s)", user.verification_code, user.roblox_username, user.roblox_id)
                     verified = await check_verification(user.roblox_id, user.verification_code)
                         
-                    logger.info(f"Verification check result: {verified}")
+                    logger.info("Verification check result: %s", verified)
                     # No longer force verified to True - respect the actual result
                 except Exception as e:
                     logger.error(f"Error during verification check: {e}")
                     verified = False
                 
                 # Group membership check has been removed as requested
-                logger.info(f"User {interaction.user.name} verification is being processed without group requirement")
+                logger.info("User %s verification is being processed without group requirement", interaction.user.name)
                 
                 if verified:
-                    logger.info(f"Verification successful for {interaction.user.name}")
+                    logger.info("Verification successful for %s", interaction.user.name)
                     
-                    # Update database with app context
+                    # Update database with a fresh session
                     success = update_user_verified(user, True, datetime.utcnow())
                     if success:
                         logger.info("Database updated with verified status")
+                        username_index.add(user.roblox_username)
+                        account_links.link(user.discord_id, user.roblox_id, user.roblox_username)
                     
-                        # Try to add verified role if it exists
+                        # Add the verified role and set the nickname; they use different rate limit buckets so run together
+                        member_updates = []
                         try:
                             server_config = get_server_config(str(interaction.guild.id))
                             if server_config and server_config.verified_role_id:
                                 role = interaction.guild.get_role(int(server_config.verified_role_id))
                                 if role:
-                                    await interaction.user.add_roles(role, reason="Roblox verification")
-                                    logger.info(f"Added verified role to {interaction.user.name} ({interaction.user.id})")
+                                    member_updates.append((
+                                        member_roles_bucket(interaction.guild),
+                                        lambda: interaction.user.add_roles(role, reason="Roblox verification")
+                                    ))
                                 else:
                                     logger.warning(f"Verified role with ID {server_config.verified_role_id} not found")
                             else:
@@ -421,11 +560,18 @@ class Verification(commands.Cog):
                             logger.error(f"Failed to add verified role: {e}")
                         
                         # Set nickname to Roblox username
-                        try:
-                            await interaction.user.edit(nick=user.roblox_username)
-                            logger.info(f"Set nickname for {interaction.user.name} to {user.roblox_username}")
-                        except Exception as e:
-                            logger.error(f"Failed to set nickname: {e}")
+                        member_updates.append((
+                            member_edit_bucket(interaction.guild),
+                            lambda: interaction.user.edit(nick=user.roblox_username)
+                        ))
+                        
+                        results = await run_bulk(member_updates)
+                        for (bucket, _), result in zip(member_updates, results):
+                            action = "set nickname" if bucket == member_edit_bucket(interaction.guild) else "add verified role"
+                            if isinstance(result, Exception):
+                                logger.error(f"Failed to {action}: {result}")
+                            else:
+                                logger.info("Did %s for %s (%s)", action, interaction.user.name, interaction.user.id)
                         
                         # Create a successful verification message
                         embed = create_embed(
@@ -482,16 +628,18 @@ class Verification(commands.Cog):
     
     @app_commands.command(name="update", description="Update your Roblox verification")
     @app_commands.describe(roblox_username="Your new Roblox username")
+    @app_commands.autocomplete(roblox_username=roblox_username_autocomplete)
+    @cooldown(2, 30)
     async def update(self, interaction: discord.Interaction, roblox_username: str):
         """Update a user's Roblox verification"""
         await interaction.response.defer(ephemeral=True)
         
         try:
-            # Import the app context function
-            from app import app, with_app_context
+            # Import the database session helper
+            from database import with_db_session
             
-            # Create an inner function to handle database operations with app context
-            @with_app_context
+            # Create an inner function to handle database operations with a fresh session
+            @with_db_session
             def get_user_data(discord_id):
                 try:
                     from models import User
@@ -506,25 +654,25 @@ class Verification(commands.Cog):
                     result = db.session.execute(sql, {"discord_id": discord_id})
                     rows = result.fetchall()
                     sql_found = len(rows) > 0
-                    logger.info(f"Direct SQL query found {len(rows)} users with discord ID: {discord_id}")
+                    logger.info("Direct SQL query found %s users with discord ID: %s", len(rows), discord_id)
                     
                     # Then try with ORM
                     user = User.query.filter_by(discord_id=discord_id).first()
-                    logger.info(f"ORM query result: {user is not None}")
+                    logger.info("ORM query result: %s", user is not None)
                     
                     # If SQL finds a user but ORM doesn't, try to refresh the session
                     if sql_found and not user:
                         logger.warning("SQL found user but ORM didn't, refreshing session...")
                         db.session.commit()
                         user = User.query.filter_by(discord_id=discord_id).first()
-                        logger.info(f"After session refresh, ORM query result: {user is not None}")
+                        logger.info("After session refresh, ORM query result: %s", user is not None)
                         
                     return user
                 except Exception as e:
                     logger.error(f"Database error in get_user_data: {e}")
                     return None
             
-            @with_app_context
+            @with_db_session
             def update_user_verification(user, roblox_id, roblox_username, verification_code):
                 try:
                     user.roblox_id = roblox_id
@@ -542,7 +690,7 @@ class Verification(commands.Cog):
                     from models import User
                     verification_check = User.query.filter_by(discord_id=user.discord_id).first()
                     if verification_check:
-                        logger.info(f"DB VERIFICATION: Update for user {user.discord_id} saved with code {verification_check.verification_code}")
+                        logger.info("DB VERIFICATION: Update for user %s saved with code %s", user.discord_id, verification_check.verification_code)
                         return True
                     else:
                         logger.error(f"DB VERIFICATION FAILED: User {user.discord_id} not found after update!")
@@ -557,11 +705,11 @@ class Verification(commands.Cog):
                     return False
             
             # Check if the Roblox username exists with our improved function
-            logger.info(f"Updating verification for user {interaction.user.name} with new Roblox username: {roblox_username}")
+            logger.info("Updating verification for user %s with new Roblox username: %s", interaction.user.name, roblox_username)
             
             # Special case handling for test username
             if roblox_username.lower() in ["sysbloxluv", "systbloxluv", "roblox", "builderman"]:
-                logger.info(f"Using hardcoded override for test username: {roblox_username}")
+                logger.info("Using hardcoded override for test username: %s", roblox_username)
                 # Select the right ID based on username
                 test_id = 2470023  # Default test ID
                 if roblox_username.lower() == "roblox":
@@ -585,9 +733,9 @@ class Verification(commands.Cog):
                 )
             
             roblox_id = str(roblox_user['id'])
-            logger.info(f"Found Roblox user with ID {roblox_id}")
+            logger.info("Found Roblox user with ID %s", roblox_id)
             
-            # Get user data using app context
+            # Get user data with a fresh session
             user = get_user_data(str(interaction.user.id))
             
             if not user:
@@ -599,9 +747,9 @@ class Verification(commands.Cog):
             
             # Generate new verification code
             verification_code = self.generate_verification_code()
-            logger.info(f"Generated new verification code for {interaction.user.name}: {verification_code}")
+            logger.info("Generated new verification code for %s: %s", interaction.user.name, verification_code)
             
-            # Update user in database using app context
+            # Update user in database with a fresh session
             success = update_user_verification(user, roblox_id, roblox_username, verification_code)
             if not success:
                 logger.error(f"Failed to update user data for {interaction.user.name}")
@@ -609,6 +757,7 @@ class Verification(commands.Cog):
                     "Database error occurred. Please try again later.",
                     ephemeral=True
                 )
+            account_links.unlink(interaction.user.id)
             
             # Define constants
             USMC_GROUP_ID = "11966964"
@@ -651,7 +800,7 @@ class Verification(commands.Cog):
                 inline=False
             )
             
-            logger.info(f"Successfully sent update instructions to {interaction.user.name}")
+            logger.info("Successfully sent update instructions to %s", interaction.user.name)
             await interaction.followup.send(embed=embed, ephemeral=True)
         
         except Exception as e:
@@ -665,6 +814,7 @@ class Verification(commands.Cog):
     
     @app_commands.command(name="info-roblox", description="Get information about a Roblox user")
     @app_commands.describe(roblox_username="The Roblox username to get information about")
+    @app_commands.autocomplete(roblox_username=roblox_username_autocomplete)
     async def info_roblox(self, interaction: discord.Interaction, roblox_username: str):
         """Get information about a Roblox user"""
         await interaction.response.defer()
@@ -672,7 +822,7 @@ class Verification(commands.Cog):
         try:
             # Special case handling for test username
             if roblox_username.lower() in ["sysbloxluv", "systbloxluv", "roblox", "builderman"]:
-                logger.info(f"Using hardcoded override for test username in info command: {roblox_username}")
+                logger.info("Using hardcoded override for test username in info command: %s", roblox_username)
                 # Select the right ID based on username
                 test_id = 2470023  # Default test ID
                 if roblox_username.lower() == "roblox":
@@ -695,39 +845,36 @@ class Verification(commands.Cog):
             
             roblox_id = str(roblox_user['id'])
             
-            # Get detailed user info
-            user_info = await get_roblox_user_info(roblox_id)
+            # Fetch every section at once; the profile renders first and the rest are edited in as they arrive
+            calls = {
+                "profile": get_roblox_user_info(roblox_id),
+                "avatar": get_user_avatar_url(roblox_id),
+                "groups": get_user_groups(roblox_id),
+                "social": get_user_social_counts(roblox_id),
+                "badges": get_user_badges(roblox_id)
+            }
+            
+            async def render(name, result, results):
+                if "profile" not in results:
+                    return True
+                if results["profile"] is None:
+                    await interaction.followup.send(
+                        "Could not retrieve information for that Roblox user. Please try again later."
+                    )
+                    return False
+                pending = set(calls) - set(results)
+                await interaction.edit_original_response(embed=build_info_embed(roblox_username, roblox_id, results, pending))
+                return True
             
-            if not user_info:
+            results = await fan_out(calls, INFO_ROBLOX_DEADLINE, on_result=render)
+            
+            if "profile" not in results:
                 return await interaction.followup.send(
                     "Could not retrieve information for that Roblox user. Please try again later."
                 )
-            
-            # Create embed with user info
-            embed = create_embed(
-                title=f"Roblox User: {roblox_username}",
-                description=f"Basic information about {roblox_username}",
-                color=discord.Color.blue()
-            )
-            
-            embed.add_field(name="Display Name", value=user_info.get("displayName", "N/A"))
-            embed.add_field(name="User ID", value=roblox_id)
-            embed.add_field(name="Creation Date", value=user_info.get("created", "N/A"))
-            
-            if "isBanned" in user_info:
-                embed.add_field(name="Account Status", value="Banned" if user_info["isBanned"] else "Active")
-            
-            embed.add_field(name="Profile Link", value=f"https://www.roblox.com/users/{roblox_id}/profile")
-            
-            if "description" in user_info and user_info["description"]:
-                description = user_info["description"]
-                if len(description) > 1024:
-                    description = description[:1021] + "..."
-                embed.add_field(name="Description", value=description, inline=False)
-            
-            embed.set_thumbnail(url=f"https://www.roblox.com/bust-thumbnail/image?userId={roblox_id}&width=420&height=420")
-            
-            await interaction.followup.send(embed=embed)
+            if results["profile"] is not None and len(results) < len(calls):
+                # Sections that missed the deadline are marked unavailable instead of loading
+                await interaction.edit_original_response(embed=build_info_embed(roblox_username, roblox_id, results))
         
         except Exception as e:
             logger.error(f"Error in info-roblox command: {e}")
@@ -735,6 +882,122 @@ class Verification(commands.Cog):
                 "An error occurred while retrieving Roblox user information. Please try again later."
             )
 
+    async def send_whois(self, interaction: discord.Interaction, text: str):
+        """Look up the pasted names or IDs and send the results; the interaction must already be deferred"""
+        queries = parse_queries(text)
+        if not queries:
+            return await interaction.followup.send("Give at least one Roblox username or ID.", ephemeral=True)
+        
+        extra = len(queries) - MAX_BULK_LOOKUP
+        results = await account_links.lookup_many(queries[:MAX_BULK_LOOKUP])
+        
+        lines = []
+        for query, link in results.items():
+            if link is None:
+                lines.append(f"`{query}` → not linked")
+            else:
+                lines.append(f"`{link.roblox_username or query}` ({link.roblox_id}) → <@{link.discord_id}>")
+        
+        found = sum(1 for link in results.values() if link is not None)
+        description = "\n".join(lines)
+        if len(description) > 4000:
+            description = description[:4000].rsplit("\n", 1)[0] + "\n..."
+        
+        embed = create_embed(
+            title="Who Is",
+            description=description,
+            color=discord.Color.blue()
+        )
+        embed.set_footer(text=f"{found} of {len(results)} linked to a verified Discord account"
+                              + (f", {extra} over the limit of {MAX_BULK_LOOKUP} skipped" if extra > 0 else ""))
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    
+    @app_commands.command(name="whois", description="Find the Discord members who own Roblox accounts")
+    @app_commands.describe(query="Roblox usernames or IDs separated by spaces or commas; leave empty to paste a list")
+    @app_commands.autocomplete(query=roblox_username_autocomplete)
+    async def whois(self, interaction: discord.Interaction, query: str = None):
+        """Look up verified Discord accounts by Roblox username or ID, up to 100 at once"""
+        if not query:
+            # A modal accepts a pasted multi-line list, slash command options don't
+            return await interaction.response.send_modal(WhoisModal(self))
+        
+        await interaction.response.defer(ephemeral=True)
+        try:
+            await self.send_whois(interaction, query)
+        except Exception as e:
+            logger.error(f"Error in whois command: {e}")
+            await interaction.followup.send("An error occurred while looking up those accounts. Please try again later.", ephemeral=True)
+    
+    @app_commands.command(name="reconcile", description="Fix verified roles and nicknames that drifted from the database")
+    @app_commands.describe(
+        dry_run="Only report what would change (default: true)",
+        previous_role="A role to remove from everyone, such as the old verified role"
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    @cooldown(1, 300)
+    async def reconcile(self, interaction: discord.Interaction, dry_run: bool = True, previous_role: discord.Role = None):
+        """Bring every member's verified role and nickname in line with the database"""
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        
+        last_update = [0.0]
+        progress_edit = [None]
+        
+        def report_progress(completed, total):
+            # The summary replaces the response once everything is applied
+            if completed >= total:
+                return
+            # Edit at most every few seconds to stay clear of the webhook rate limit, and one edit at a time
+            now = time.monotonic()
+            if now - last_update[0] < RECONCILE_PROGRESS_INTERVAL:
+                return
+            if progress_edit[0] is not None and not progress_edit[0].done():
+                return
+            last_update[0] = now
+            progress_edit[0] = asyncio.ensure_future(
+                interaction.edit_original_response(content=f"Reconciling... {completed}/{total} changes applied")
+            )
+        
+        async def run_reconcile():
+            try:
+                result = await reconcile_guild(
+                    interaction.guild,
+                    dry_run=dry_run,
+                    stale_roles=[previous_role] if previous_role else (),
+                    progress=report_progress
+                )
+            except PermissionError as e:
+                return f"{e}. Move the bot's role above it and try again."
+            finally:
+                # A progress edit still in flight must land before the summary, not overwrite it
+                if progress_edit[0] is not None:
+                    await asyncio.gather(progress_edit[0], return_exceptions=True)
+            return format_result(result)
+        
+        try:
+            task_system.enqueue_for_interaction(
+                interaction,
+                "default",
+                run_reconcile,
+                max_retries=0,
+                error_message="An error occurred while reconciling roles and nicknames. Please try again later."
+            )
+        except WorkQueueFull:
+            await interaction.edit_original_response(content=BUSY_MESSAGE)
+    
+    @reconcile.error
+    async def reconcile_error(self, interaction: discord.Interaction, error):
+        if isinstance(error, app_commands.errors.MissingPermissions):
+            await interaction.response.send_message(
+                "You don't have permission to use this command. You need the Administrator permission.",
+                ephemeral=True
+            )
+        else:
+            logger.error(f"Unhandled error in reconcile command: {error}")
+            await interaction.response.send_message(
+                "An error occurred while executing the command.",
+                ephemeral=True
+            )
+
 async def setup(bot):
     from models import ServerConfig
     await bot.add_cog(Verification(bot))
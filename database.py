@@ -0,0 +1,142 @@
+import os
+import logging
+import threading
+from functools import wraps
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import DeclarativeBase, scoped_session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+def get_database_url():
+    """Get the database URL from the environment, falling back to a local SQLite file"""
+    database_url = os.environ.get("DATABASE_URL")
+
+    # Fix Neon/Render PostgreSQL connection URL if needed
+    # Some providers like Heroku/Render can add 'postgres://' instead of 'postgresql://'
+    if database_url and database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    if not database_url:
+        logger.warning("DATABASE_URL is not set, using local SQLite database bot.db")
+        database_url = "sqlite:///bot.db"
+
+    return database_url
+
+class _QueryProperty:
+    """Gives models a Flask-SQLAlchemy style `Model.query` bound to the current session"""
+
+    def __get__(self, obj, cls):
+        return db.session.query(cls)
+
+class Base(DeclarativeBase):
+    query = _QueryProperty()
+
+class Database:
+    """
+    Engine and session factory shared by the bot and the web app
+
+    The engine is created lazily on first use so importing models never opens a
+    connection or loads the database driver.
+    """
+
+    def __init__(self):
+        self._engine = None
+        # expire_on_commit=False keeps returned objects readable after the session is removed
+        self._session = scoped_session(sessionmaker(expire_on_commit=False))
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            database_url = get_database_url()
+            options = {}
+            if database_url.startswith("postgresql"):
+                options = {
+                    "pool_recycle": 300,
+                    "pool_pre_ping": True,
+                    "connect_args": {
+                        # Add SSL mode required by some PostgreSQL providers
+                        "sslmode": "require" if "RENDER" in os.environ else "prefer"
+                    }
+                }
+            self._engine = create_engine(database_url, **options)
+            from utils.metrics import install_db_instrumentation
+            install_db_instrumentation(self._engine)
+            self._session.configure(bind=self._engine)
+        return self._engine
+
+    @property
+    def session(self):
+        """The thread-local session, bound to the engine on first access"""
+        if self._engine is None:
+            self.engine
+        return self._session
+
+    def create_all(self):
+        """Create all tables and indexes that don't exist yet"""
+        import models  # noqa: F401 - registers the models on Base.metadata
+        Base.metadata.create_all(self.engine)
+        self.add_missing_columns()
+        # create_all skips indexes on tables that already exist, so add new ones explicitly
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(self.engine, checkfirst=True)
+                except Exception as e:
+                    # e.g. a unique index over rows that already break it; the rest of the schema is still usable
+                    logger.error(f"Could not create index {index.name} on {table.name}: {e}")
+
+    def add_missing_columns(self):
+        """
+        Add columns that were added to a model after its table was created
+
+        Only columns that are nullable or have a server default can be added
+        this way; anything else has to be migrated by hand.
+        """
+        from sqlalchemy import inspect, text
+        from sqlalchemy.schema import CreateColumn
+
+        inspector = inspect(self.engine)
+        preparer = self.engine.dialect.identifier_preparer
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                if not inspector.has_table(table.name):
+                    continue
+                existing = {column["name"] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    if not column.nullable and column.server_default is None:
+                        logger.warning(f"Cannot add required column {table.name}.{column.name} to an existing table")
+                        continue
+                    definition = CreateColumn(column).compile(dialect=self.engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {definition}"))
+                    logger.info(f"Added column {table.name}.{column.name}")
+
+db = Database()
+
+def init_db():
+    """Create database tables, safe to call from both the bot and the web app"""
+    try:
+        db.create_all()
+        return True
+    except Exception as e:
+        logger.error(f"Failed to create database tables: {e}")
+        return False
+
+_session_depth = threading.local()
+
+def with_db_session(func):
+    """Decorator to run a function with a fresh database session that is removed afterwards"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        depth = getattr(_session_depth, "value", 0)
+        _session_depth.value = depth + 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _session_depth.value = depth
+            # Only the outermost call owns the session
+            if depth == 0:
+                db.session.remove()
+    return wrapper
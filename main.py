@@ -3,27 +3,34 @@ import os
 import threading
 import time
 from dotenv import load_dotenv
+from utils.log_config import configure_logging
 from app import app
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Set up queue-based logging so log I/O never blocks the event loop
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
 # Import the bot activation module
-# This will start the bot in a background thread
+# This joins the leader election; only the elected process starts the bot
 import activate_bot
 
 # Add a route to check bot status
 @app.route('/bot-status')
 def bot_status():
+    role = activate_bot.get_bot_role()
     if activate_bot.is_bot_running():
-        return {"status": "online"}, 200
+        return {"status": "online", "role": role}, 200
+    elif role == "follower":
+        # Followers are healthy hot standbys, not failures
+        return {"status": "standby", "role": role}, 200
+    elif role == "external":
+        # The bot runs in its own processes, this web server never starts it
+        return {"status": "external", "role": role}, 200
     else:
-        return {"status": "offline"}, 503
+        return {"status": "offline", "role": role}, 503
 
 # This is needed for Gunicorn to find the Flask app
 if __name__ == "__main__":
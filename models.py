@@ -1,71 +1,239 @@
-from app import db
 from datetime import datetime
-from flask_login import UserMixin
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Index, Integer, LargeBinary, String, Text, UniqueConstraint, func, text
 
-class User(UserMixin, db.Model):
+from database import Base
+
+class User(Base):
     __tablename__ = 'users'
     
-    id = db.Column(db.Integer, primary_key=True)
-    discord_id = db.Column(db.String(20), unique=True, nullable=False)
-    roblox_id = db.Column(db.String(20), unique=True, nullable=True)
-    roblox_username = db.Column(db.String(100), nullable=True)
-    verification_code = db.Column(db.String(10), nullable=True)
-    verified = db.Column(db.Boolean, default=False)
-    verification_date = db.Column(db.DateTime, nullable=True)
+    id = Column(Integer, primary_key=True)
+    discord_id = Column(String(20), unique=True, nullable=False)
+    roblox_id = Column(String(20), unique=True, nullable=True)
+    roblox_username = Column(String(100), nullable=True)
+    verification_code = Column(String(10), nullable=True)
+    verified = Column(Boolean, default=False)
+    verification_date = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # Case-insensitive lookups by Roblox username for /whois
+        Index('ix_users_roblox_username_lower', func.lower(roblox_username)),
+    )
     
     def __repr__(self):
         return f"<User discord_id={self.discord_id} roblox_username={self.roblox_username} verified={self.verified}>"
 
-class ServerConfig(db.Model):
+class ServerConfig(Base):
     __tablename__ = 'server_configs'
     
-    id = db.Column(db.Integer, primary_key=True)
-    guild_id = db.Column(db.String(20), unique=True, nullable=False)
-    verified_role_id = db.Column(db.String(20), nullable=True)
-    announcement_channel_id = db.Column(db.String(20), nullable=True)
-    ticket_channel_id = db.Column(db.String(20), nullable=True)
-    host_channel_id = db.Column(db.String(20), nullable=True)
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), unique=True, nullable=False)
+    verified_role_id = Column(String(20), nullable=True)
+    announcement_channel_id = Column(String(20), nullable=True)
+    ticket_channel_id = Column(String(20), nullable=True)
+    host_channel_id = Column(String(20), nullable=True)
+    # "channel" (a text channel per ticket), "thread" (a private thread under the ticket channel)
+    # or "pool" (a text channel per ticket, claimed from pre-created standby channels)
+    ticket_mode = Column(String(20), nullable=True, default="channel")
     
     def __repr__(self):
         return f"<ServerConfig guild_id={self.guild_id}>"
 
-class Ticket(db.Model):
+class Ticket(Base):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # At most one open ticket per member in each guild
+        Index(
+            'ux_tickets_open_user', 'guild_id', 'user_id',
+            unique=True,
+            postgresql_where=text("status = 'open'"),
+            sqlite_where=text("status = 'open'")
+        ),
+    )
     
-    id = db.Column(db.Integer, primary_key=True)
-    guild_id = db.Column(db.String(20), nullable=False)
-    channel_id = db.Column(db.String(20), unique=True, nullable=True)
-    user_id = db.Column(db.String(20), nullable=False)
-    status = db.Column(db.String(20), default="open")
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    closed_at = db.Column(db.DateTime, nullable=True)
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), nullable=False)
+    channel_id = Column(String(20), unique=True, nullable=True)
+    user_id = Column(String(20), nullable=False)
+    status = Column(String(20), default="open")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    closed_at = Column(DateTime, nullable=True)
     
     def __repr__(self):
         return f"<Ticket id={self.id} user_id={self.user_id} status={self.status}>"
 
-class TicketRole(db.Model):
+class TicketTranscript(Base):
+    __tablename__ = 'ticket_transcripts'
+    
+    id = Column(Integer, primary_key=True)
+    ticket_id = Column(Integer, unique=True, nullable=False)
+    guild_id = Column(String(20), nullable=False, index=True)
+    # Gzipped JSON lines under TRANSCRIPT_DIR, see utils.transcripts
+    path = Column(String(255), nullable=False)
+    # Unguessable part of the transcript's web URL
+    access_token = Column(String(64), unique=True, nullable=False)
+    message_count = Column(Integer, default=0)
+    size_bytes = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # When the archive was added to the search index, None until then
+    indexed_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<TicketTranscript ticket_id={self.ticket_id} messages={self.message_count}>"
+
+class TicketSearchEntry(Base):
+    __tablename__ = 'ticket_search_entries'
+    __table_args__ = (
+        Index('ix_ticket_search_entries_guild_created', 'guild_id', 'created_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    ticket_id = Column(Integer, nullable=False, index=True)
+    guild_id = Column(String(20), nullable=False)
+    # The ticket's opener, for searching one member's tickets
+    user_id = Column(String(20), nullable=False)
+    author_id = Column(String(20), nullable=False)
+    message_id = Column(String(20), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    # Full-text indexed, see utils.transcript_search
+    content = Column(Text, nullable=False)
+    
+    def __repr__(self):
+        return f"<TicketSearchEntry ticket_id={self.ticket_id} message_id={self.message_id}>"
+
+class TicketRole(Base):
     __tablename__ = 'ticket_roles'
     
-    id = db.Column(db.Integer, primary_key=True)
-    guild_id = db.Column(db.String(20), nullable=False)
-    role_id = db.Column(db.String(20), nullable=False)
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), nullable=False)
+    role_id = Column(String(20), nullable=False)
     # Whether this role is the verified role
-    is_verified_role = db.Column(db.Boolean, default=False)
+    is_verified_role = Column(Boolean, default=False)
     
     def __repr__(self):
         return f"<TicketRole id={self.id} role_id={self.role_id} is_verified_role={self.is_verified_role}>"
 
-class HostedEvent(db.Model):
+class HostedEvent(Base):
     __tablename__ = 'hosted_events'
     
-    id = db.Column(db.Integer, primary_key=True)
-    guild_id = db.Column(db.String(20), nullable=False)
-    host_id = db.Column(db.String(20), nullable=False)
-    event_type = db.Column(db.String(100), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
-    end_time = db.Column(db.DateTime, nullable=False)
-    message_id = db.Column(db.String(20), nullable=True)
-    channel_id = db.Column(db.String(20), nullable=False)
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), nullable=False)
+    host_id = Column(String(20), nullable=False)
+    event_type = Column(String(100), nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    message_id = Column(String(20), nullable=True)
+    channel_id = Column(String(20), nullable=False)
+    # Last lifecycle step carried out, see utils.event_scheduler (0 = nothing yet)
+    stage = Column(Integer, nullable=False, default=0, server_default="0")
+    # Failed attempts at the next stage, and the lease of the process carrying it out
+    stage_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    stage_locked_until = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # The scheduler loads events that haven't ended yet
+        Index('ix_hosted_events_stage_end_time', stage, end_time),
+    )
     
     def __repr__(self):
-        return f"<HostedEvent id={self.id} event_type={self.event_type}>"
+        return f"<HostedEvent id={self.id} event_type={self.event_type} stage={self.stage}>"
+
+class CommandSyncState(Base):
+    __tablename__ = 'command_sync_state'
+
+    id = Column(Integer, primary_key=True)
+    # "global" or the ID of a development guild
+    scope = Column(String(20), unique=True, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CommandSyncState scope={self.scope} fingerprint={self.fingerprint[:8]}>"
+
+class GroupRoster(Base):
+    __tablename__ = 'group_rosters'
+
+    id = Column(Integer, primary_key=True)
+    group_id = Column(String(20), unique=True, nullable=False)
+    member_count = Column(Integer, default=0)
+    # Compressed (user_id, rank) pairs, see utils.group_sync.encode_roster
+    roster = Column(LargeBinary, nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GroupRoster group_id={self.group_id} member_count={self.member_count}>"
+
+class GroupRankBinding(Base):
+    __tablename__ = 'group_rank_bindings'
+    __table_args__ = (UniqueConstraint('guild_id', 'group_id', 'rank', 'role_id'),)
+
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), nullable=False, index=True)
+    group_id = Column(String(20), nullable=False)
+    # Group rank number (1-255) whose members get the role
+    rank = Column(Integer, nullable=False)
+    role_id = Column(String(20), nullable=False)
+
+    def __repr__(self):
+        return f"<GroupRankBinding guild_id={self.guild_id} rank={self.rank} role_id={self.role_id}>"
+
+class DelayedJob(Base):
+    __tablename__ = 'delayed_jobs'
+    __table_args__ = (
+        # Runners look for due jobs by status and run_at
+        Index('ix_delayed_jobs_status_run_at', 'status', 'run_at'),
+        Index('ix_delayed_jobs_kind_key', 'kind', 'key'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Handler name, see utils.delayed_jobs
+    kind = Column(String(50), nullable=False)
+    # Optional identity so a job can be replaced or cancelled, e.g. "ticket:42"
+    key = Column(String(100), nullable=True)
+    payload = Column(Text, nullable=False, default="{}")
+    run_at = Column(DateTime, nullable=False)
+    # pending, running, done or failed
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    # Shard of the guild the job acts on, so only the cluster running that shard claims it
+    shard_id = Column(Integer, nullable=True)
+    # A running job whose lease expires is claimed again, e.g. after a crash
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DelayedJob id={self.id} kind={self.kind} status={self.status} run_at={self.run_at}>"
+
+class TicketDailyStats(Base):
+    __tablename__ = 'ticket_daily_stats'
+    __table_args__ = (UniqueConstraint('guild_id', 'day'),)
+
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), nullable=False)
+    # UTC date
+    day = Column(Date, nullable=False)
+    opened = Column(Integer, nullable=False, default=0)
+    closed = Column(Integer, nullable=False, default=0)
+    reopened = Column(Integer, nullable=False, default=0)
+    # Total seconds from open to close of the tickets closed this day
+    close_seconds = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TicketDailyStats guild_id={self.guild_id} day={self.day} opened={self.opened} closed={self.closed}>"
+
+class TicketCloseTimeBucket(Base):
+    __tablename__ = 'ticket_close_time_buckets'
+    __table_args__ = (UniqueConstraint('guild_id', 'day', 'bucket'),)
+
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(String(20), nullable=False)
+    day = Column(Date, nullable=False)
+    # Upper bound in seconds of the open-to-close times counted here, 0 for anything longer than the last bound
+    bucket = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+class TicketOpenCount(Base):
+    __tablename__ = 'ticket_open_counts'
+
+    guild_id = Column(String(20), primary_key=True)
+    open_tickets = Column(Integer, nullable=False, default=0)
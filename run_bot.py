@@ -1,11 +1,14 @@
 import os
+import signal
+import sys
 import logging
 from dotenv import load_dotenv
-from bot import bot
+from utils.log_config import configure_logging
+from bot import bot, CLUSTER_ID
+from utils.leader_election import start_bot_with_leader_election
 
-# Set up logging
-logging.basicConfig(level=logging.INFO,
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Set up queue-based logging so log I/O never blocks the event loop
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -20,10 +23,14 @@ if not DISCORD_TOKEN:
 
 def main():
     logger.info("Starting Discord bot")
+    # A leader whose bot stops signals itself; exit normally so queued logs are written and the supervisor restarts us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    # Competes with any web workers for the same lock so only one process logs in
+    election, runner = start_bot_with_leader_election(bot, DISCORD_TOKEN, name=f"discord-bot-cluster-{CLUSTER_ID}")
     try:
-        bot.run(DISCORD_TOKEN)
-    except Exception as e:
-        logger.error(f"Error running Discord bot: {e}")
+        election.thread.join()
+    except KeyboardInterrupt:
+        runner.stop()
         
 if __name__ == "__main__":
     main()
@@ -2,10 +2,80 @@ import subprocess
 import sys
 import os
 import signal
+import threading
 import time
+import logging.handlers
+
+from utils.sharding import split_shards, format_shard_ids
 
 processes = []
 
+# Seconds before a process that exited is started again
+SUPERVISOR_RESTART_DELAY = float(os.getenv("SUPERVISOR_RESTART_DELAY", "5"))
+
+# supervisor.log rotates instead of growing forever
+SUPERVISOR_LOG = os.getenv("SUPERVISOR_LOG", "supervisor.log")
+SUPERVISOR_LOG_MAX_BYTES = int(os.getenv("SUPERVISOR_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SUPERVISOR_LOG_BACKUP_COUNT = int(os.getenv("SUPERVISOR_LOG_BACKUP_COUNT", "5"))
+
+def create_log_handler():
+    handler = logging.handlers.RotatingFileHandler(
+        SUPERVISOR_LOG,
+        maxBytes=SUPERVISOR_LOG_MAX_BYTES,
+        backupCount=SUPERVISOR_LOG_BACKUP_COUNT,
+        encoding="utf-8"
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+def write_log(handler, line):
+    # handle() takes the handler's lock; reader threads and the main thread share the file and its rollover
+    handler.handle(logging.makeLogRecord({"msg": line.rstrip("\n"), "levelno": logging.INFO}))
+
+def forward_output(proc, handler):
+    """Copy a child's output into the rotating log, line by line, on a reader thread"""
+    for line in iter(proc.stdout.readline, ""):
+        write_log(handler, line)
+    proc.stdout.close()
+
+def start_process(args, handler, env=None, label=None):
+    proc = subprocess.Popen(
+        args,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        env=env
+    )
+    reader = threading.Thread(target=forward_output, args=(proc, handler), daemon=True)
+    reader.start()
+    # Kept so the process can be started again the same way if it exits
+    proc.start_args = (args, env, label)
+    return proc
+
+def get_cluster_envs():
+    """
+    Build the environment for each bot process
+
+    SHARD_CLUSTERS sets how many bot processes to run and SHARD_COUNT the total
+    number of shards spread across them. Without SHARD_CLUSTERS a single
+    unsharded bot process is started.
+    """
+    cluster_count = int(os.getenv("SHARD_CLUSTERS", "1"))
+    shard_count = int(os.getenv("SHARD_COUNT", "0")) or cluster_count
+    
+    if cluster_count <= 1 and not os.getenv("SHARD_COUNT"):
+        return [dict(os.environ)]
+    
+    envs = []
+    for cluster_id, shard_ids in enumerate(split_shards(shard_count, cluster_count)):
+        env = dict(os.environ)
+        env["CLUSTER_ID"] = str(cluster_id)
+        env["SHARD_COUNT"] = str(shard_count)
+        env["SHARD_IDS"] = format_shard_ids(shard_ids)
+        envs.append(env)
+    return envs
+
 def signal_handler(sig, frame):
     print("\nShutting down all processes...")
     for proc in processes:
@@ -20,46 +90,47 @@ def main():
     
     print("Starting Discord Bot + Web Application")
     
-    # Open a log file for capturing output
-    with open("supervisor.log", "a") as log_file:
-        current_time = time.strftime("%Y-%m-%d %H:%M:%S")
-        log_file.write(f"\n\n=== Starting services at {current_time} ===\n")
-        
-        # Start the Discord bot with output redirection
-        bot_process = subprocess.Popen(
-            [sys.executable, "run_bot.py"],
-            stdout=log_file,
-            stderr=log_file
-        )
+    # Child output goes through a size-bounded rotating log
+    log_handler = create_log_handler()
+    current_time = time.strftime("%Y-%m-%d %H:%M:%S")
+    write_log(log_handler, f"\n\n=== Starting services at {current_time} ===")
+    
+    # Start the Discord bot (one process per shard cluster) with output redirection
+    for env in get_cluster_envs():
+        cluster = f" (cluster {env['CLUSTER_ID']}, shards {env['SHARD_IDS']})" if "CLUSTER_ID" in env else ""
+        bot_process = start_process([sys.executable, "run_bot.py"], log_handler, env=env, label=f"Discord bot process{cluster}")
         processes.append(bot_process)
-        print("Started Discord bot process")
-        log_file.write("Started Discord bot process\n")
-        
-        # Start the web server using gunicorn with output redirection
-        web_process = subprocess.Popen(
-            ["gunicorn", "--bind", "0.0.0.0:5000", "--reuse-port", "main:app"],
-            stdout=log_file,
-            stderr=log_file
-        )
-        processes.append(web_process)
-        print("Started web server process")
-        log_file.write("Started web server process\n")
-        
-        # Log that everything started
-        log_file.write("All processes started successfully\n")
-        log_file.flush()
+        print(f"Started Discord bot process{cluster}")
+        write_log(log_handler, f"Started Discord bot process{cluster}")
+    
+    # Start the web server using gunicorn with output redirection
+    # The bot processes above run the bot, so the web workers must not join the election too
+    web_env = dict(os.environ)
+    web_env["RUN_BOT"] = "0"
+    web_process = start_process(
+        ["gunicorn", "--bind", "0.0.0.0:5000", "--reuse-port", "main:app"], log_handler, env=web_env, label="web server process"
+    )
+    processes.append(web_process)
+    print("Started web server process")
+    write_log(log_handler, "Started web server process")
+    
+    # Log that everything started
+    write_log(log_handler, "All processes started successfully")
     
     # Keep the script running
     try:
         while True:
             time.sleep(5)  # Check less frequently to reduce overhead
             
-            # Check if any process has terminated
-            for proc in processes:
+            # Start any process that exited again, e.g. a bot that stepped down as leader
+            for index, proc in enumerate(processes):
                 if proc.poll() is not None:
-                    print(f"Process exited with code {proc.poll()}")
-                    # Terminate all processes and exit
-                    signal_handler(None, None)
+                    args, env, label = proc.start_args
+                    message = f"{label} exited with code {proc.poll()}, restarting in {SUPERVISOR_RESTART_DELAY:g}s"
+                    print(message)
+                    write_log(log_handler, message)
+                    time.sleep(SUPERVISOR_RESTART_DELAY)
+                    processes[index] = start_process(args, log_handler, env=env, label=label)
                     
     except KeyboardInterrupt:
         signal_handler(None, None)
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import func, or_
+
+from database import with_db_session
+from models import User
+
+logger = logging.getLogger(__name__)
+
+# Seconds between full reloads, which pick up links made by other shard clusters
+ACCOUNT_LINKS_REFRESH = int(os.getenv("ACCOUNT_LINKS_REFRESH", "600"))
+
+# Names or IDs accepted by one bulk lookup
+MAX_BULK_LOOKUP = 100
+
+class AccountLink:
+    """A verified Discord account and the Roblox account it owns"""
+
+    __slots__ = ("discord_id", "roblox_id", "roblox_username")
+
+    def __init__(self, discord_id, roblox_id, roblox_username):
+        self.discord_id = discord_id
+        self.roblox_id = roblox_id
+        self.roblox_username = roblox_username
+
+class AccountLinks:
+    """
+    In-memory reverse map from Roblox accounts to verified Discord accounts
+
+    Lookups are answered from memory. Anything not in memory is looked up with
+    a single query over roblox_id and lower(roblox_username), and the results
+    are cached.
+    """
+
+    def __init__(self):
+        self.by_roblox_id = {}
+        self.by_username = {}
+        self.by_discord_id = {}
+        self.loaded_at = 0.0
+
+    def link(self, discord_id, roblox_id, roblox_username):
+        """Record a verified link, replacing any previous link for the Discord account"""
+        self.unlink(discord_id)
+        link = AccountLink(str(discord_id), str(roblox_id) if roblox_id else None, roblox_username)
+        self.by_discord_id[link.discord_id] = link
+        if link.roblox_id:
+            self.by_roblox_id[link.roblox_id] = link
+        if roblox_username:
+            self.by_username[roblox_username.lower()] = link
+        return link
+
+    def unlink(self, discord_id):
+        """Forget the Discord account's link, e.g. when it starts verifying another Roblox account"""
+        link = self.by_discord_id.pop(str(discord_id), None)
+        if link is None:
+            return
+        if link.roblox_id and self.by_roblox_id.get(link.roblox_id) is link:
+            del self.by_roblox_id[link.roblox_id]
+        if link.roblox_username and self.by_username.get(link.roblox_username.lower()) is link:
+            del self.by_username[link.roblox_username.lower()]
+
+    def replace(self, rows):
+        """Swap in a full set of (discord_id, roblox_id, roblox_username) rows"""
+        by_roblox_id, by_username, by_discord_id = {}, {}, {}
+        for discord_id, roblox_id, roblox_username in rows:
+            link = AccountLink(discord_id, roblox_id, roblox_username)
+            by_discord_id[discord_id] = link
+            if roblox_id:
+                by_roblox_id[roblox_id] = link
+            if roblox_username:
+                by_username[roblox_username.lower()] = link
+        self.by_roblox_id, self.by_username, self.by_discord_id = by_roblox_id, by_username, by_discord_id
+        self.loaded_at = time.monotonic()
+
+    def cached(self, query):
+        query = query.strip()
+        if query.isdigit() and query in self.by_roblox_id:
+            return self.by_roblox_id[query]
+        return self.by_username.get(query.lower())
+
+    async def lookup_many(self, queries):
+        """
+        Resolve Roblox usernames or IDs to verified Discord accounts
+
+        Args:
+            queries (list): Roblox usernames or numeric IDs, case-insensitive
+
+        Returns:
+            dict: query -> AccountLink, or None when no verified account owns it
+        """
+        queries = [query.strip() for query in queries if query and query.strip()][:MAX_BULK_LOOKUP]
+        results = {query: self.cached(query) for query in queries}
+        missing = [query for query, link in results.items() if link is None]
+        if missing:
+            loop = asyncio.get_running_loop()
+            rows = await loop.run_in_executor(None, query_links, missing)
+            for row in rows:
+                self.link(*row)
+            for query in missing:
+                results[query] = self.cached(query)
+        return results
+
+account_links = AccountLinks()
+
+@with_db_session
+def query_links(queries):
+    """One query for verified users matching any of the Roblox IDs or usernames"""
+    ids = [query for query in queries if query.isdigit()]
+    names = [query.lower() for query in queries]
+    conditions = [func.lower(User.roblox_username).in_(names)]
+    if ids:
+        conditions.append(User.roblox_id.in_(ids))
+    rows = User.query.with_entities(User.discord_id, User.roblox_id, User.roblox_username).filter(
+        User.verified.is_(True),
+        or_(*conditions)
+    )
+    return [tuple(row) for row in rows]
+
+@with_db_session
+def load_all_links():
+    rows = User.query.with_entities(User.discord_id, User.roblox_id, User.roblox_username).filter(User.verified.is_(True))
+    return [tuple(row) for row in rows]
+
+async def keep_account_links_warm(interval=ACCOUNT_LINKS_REFRESH):
+    """Background task that reloads the reverse map periodically"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            rows = await loop.run_in_executor(None, load_all_links)
+            account_links.replace(rows)
+            logger.info(f"Loaded {len(rows)} verified account links")
+        except Exception as e:
+            logger.error(f"Failed to load verified account links: {e}")
+        await asyncio.sleep(interval)
+
+def parse_queries(text):
+    """Split pasted names on commas, whitespace and newlines, keeping order and dropping duplicates"""
+    seen = set()
+    queries = []
+    for part in text.replace(",", " ").split():
+        key = part.lower()
+        if key not in seen:
+            seen.add(key)
+            queries.append(part)
+    return queries
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from utils.metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+# Handlers allowed to run at once in one guild
+ADMISSION_GUILD_CONCURRENCY = int(os.getenv("ADMISSION_GUILD_CONCURRENCY", "5"))
+
+# Handlers allowed to run at once across the whole process
+ADMISSION_GLOBAL_CONCURRENCY = int(os.getenv("ADMISSION_GLOBAL_CONCURRENCY", "50"))
+
+# Requests allowed to wait for a free slot; beyond this they are turned away immediately
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+
+# How long a request may wait for a slot, well under Discord's 3 second deadline to respond
+ADMISSION_WAIT_TIMEOUT = float(os.getenv("ADMISSION_WAIT_TIMEOUT", "1.5"))  # seconds
+
+# Uses allowed per user, command and guild within the window, unless the command sets its own
+ADMISSION_DEFAULT_RATE = int(os.getenv("ADMISSION_DEFAULT_RATE", "5"))
+ADMISSION_DEFAULT_PER = float(os.getenv("ADMISSION_DEFAULT_PER", "10"))  # seconds
+
+# Sweep idle cooldown windows once this many keys are tracked
+MAX_TRACKED_WINDOWS = 10000
+
+ADMISSION_REJECTED = registry.register(Counter(
+    "admission_rejected",
+    "Interactions turned away by cooldowns or concurrency limits",
+    ["command", "reason"]
+))
+ADMISSION_WAITING = registry.register(Gauge(
+    "admission_waiting",
+    "Interactions waiting for a free concurrency slot"
+))
+ADMISSION_RUNNING = registry.register(Gauge(
+    "admission_running",
+    "Interactions currently holding a concurrency slot"
+))
+
+BUSY_MESSAGE = "The bot is busy right now. Please try again in a few seconds."
+
+class Cooldown:
+    """Allow `rate` uses per `per` seconds"""
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+
+    def __repr__(self):
+        return f"<Cooldown {self.rate}/{self.per}s>"
+
+DEFAULT_COOLDOWN = Cooldown(ADMISSION_DEFAULT_RATE, ADMISSION_DEFAULT_PER)
+
+class AdmissionRejected(Exception):
+    """Raised when an interaction is not admitted"""
+
+    def __init__(self, reason, retry_after=None):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(reason)
+
+    @property
+    def message(self):
+        if self.reason == "cooldown" and self.retry_after:
+            return f"You're doing that too often. Please try again in {self.retry_after:.0f} seconds."
+        return BUSY_MESSAGE
+
+class SlidingWindowLimiter:
+    """Sliding-window rate limiter keyed by arbitrary tuples"""
+
+    def __init__(self):
+        self.windows = {}
+
+    def hit(self, key, cooldown, now=None):
+        """
+        Record a use of `key`
+
+        Returns:
+            float: 0 if the use is allowed, otherwise seconds until it would be
+        """
+        now = time.monotonic() if now is None else now
+        window = self.windows.get(key)
+        if window is None:
+            if len(self.windows) >= MAX_TRACKED_WINDOWS:
+                self.sweep(now)
+            window = self.windows[key] = deque()
+
+        while window and now - window[0] >= cooldown.per:
+            window.popleft()
+
+        if len(window) >= cooldown.rate:
+            return cooldown.per - (now - window[0])
+
+        window.append(now)
+        return 0.0
+
+    def sweep(self, now=None):
+        """Forget windows with no recent uses"""
+        now = time.monotonic() if now is None else now
+        for key in [key for key, window in self.windows.items() if not window or now - window[-1] >= ADMISSION_DEFAULT_PER * 6]:
+            del self.windows[key]
+
+class AdmissionController:
+    """
+    Decides whether an interaction may run
+
+    Each request passes a cooldown per (guild, user, command), then waits
+    briefly for a slot in its guild's semaphore and in the global semaphore.
+    Only ADMISSION_QUEUE_SIZE requests may wait at once and none wait longer
+    than ADMISSION_WAIT_TIMEOUT, so under load requests fail fast instead of
+    piling up behind Discord's response deadline.
+    """
+
+    def __init__(self, guild_concurrency=ADMISSION_GUILD_CONCURRENCY, global_concurrency=ADMISSION_GLOBAL_CONCURRENCY,
+                 queue_size=ADMISSION_QUEUE_SIZE, wait_timeout=ADMISSION_WAIT_TIMEOUT):
+        self.guild_concurrency = guild_concurrency
+        self.queue_size = queue_size
+        self.wait_timeout = wait_timeout
+        self.limiter = SlidingWindowLimiter()
+        self.global_semaphore = asyncio.Semaphore(global_concurrency)
+        self.guild_semaphores = {}
+        self.waiting = 0
+        self.running = 0
+
+    def _guild_semaphore(self, guild_id):
+        semaphore = self.guild_semaphores.get(guild_id)
+        if semaphore is None:
+            semaphore = self.guild_semaphores[guild_id] = asyncio.Semaphore(self.guild_concurrency)
+        return semaphore
+
+    def check_cooldown(self, name, guild_id, user_id, cooldown):
+        retry_after = self.limiter.hit((guild_id, user_id, name), cooldown or DEFAULT_COOLDOWN)
+        if retry_after:
+            ADMISSION_REJECTED.inc(name, "cooldown")
+            raise AdmissionRejected("cooldown", retry_after)
+
+    async def _acquire(self, name, guild_semaphore):
+        if self.waiting >= self.queue_size:
+            ADMISSION_REJECTED.inc(name, "queue_full")
+            raise AdmissionRejected("queue_full")
+
+        self.waiting += 1
+        ADMISSION_WAITING.set(value=self.waiting)
+        acquired = []
+        try:
+            async with asyncio.timeout(self.wait_timeout):
+                for semaphore in (guild_semaphore, self.global_semaphore):
+                    await semaphore.acquire()
+                    acquired.append(semaphore)
+        except TimeoutError:
+            for semaphore in acquired:
+                semaphore.release()
+            reason = "guild_busy" if not acquired else "global_busy"
+            ADMISSION_REJECTED.inc(name, reason)
+            raise AdmissionRejected(reason)
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        finally:
+            self.waiting -= 1
+            ADMISSION_WAITING.set(value=self.waiting)
+
+    @asynccontextmanager
+    async def admit(self, name, guild_id, user_id, cooldown=None):
+        """
+        Hold a concurrency slot for the duration of the block
+
+        Raises:
+            AdmissionRejected: The cooldown is active or no slot freed up in time
+        """
+        self.check_cooldown(name, guild_id, user_id, cooldown)
+
+        guild_semaphore = self._guild_semaphore(guild_id)
+        await self._acquire(name, guild_semaphore)
+        self.running += 1
+        ADMISSION_RUNNING.set(value=self.running)
+        try:
+            yield
+        finally:
+            self.running -= 1
+            ADMISSION_RUNNING.set(value=self.running)
+            self.global_semaphore.release()
+            guild_semaphore.release()
+
+admission = AdmissionController()
+
+def cooldown(rate, per):
+    """
+    Set the per-user cooldown for an app command
+
+    Works above or below @app_commands.command.
+
+    Example:
+        @app_commands.command(name="verify-confirm", ...)
+        @cooldown(1, 15)
+        async def verify_confirm(self, interaction): ...
+    """
+    def decorator(command):
+        if hasattr(command, "extras"):
+            command.extras["cooldown"] = Cooldown(rate, per)
+        else:
+            command.__admission_cooldown__ = Cooldown(rate, per)
+        return command
+    return decorator
+
+def command_cooldown(command):
+    """The cooldown set on an app command with @cooldown, if any"""
+    if command is None:
+        return None
+    configured = command.extras.get("cooldown") if getattr(command, "extras", None) else None
+    return configured or getattr(getattr(command, "callback", None), "__admission_cooldown__", None)
+
+async def send_rejection(interaction, rejected):
+    """Tell the user their request was turned away, without raising"""
+    try:
+        if interaction.response.is_done():
+            await interaction.followup.send(rejected.message, ephemeral=True)
+        else:
+            await interaction.response.send_message(rejected.message, ephemeral=True)
+    except Exception as e:
+        logger.debug("Failed to send admission rejection: %s", e)
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import discord
+
+from database import db, with_db_session
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated guild IDs that get commands synced directly (instant updates while developing)
+DEV_GUILD_IDS = [
+    int(guild_id) for guild_id in os.getenv("DEV_GUILD_IDS", "").replace(" ", "").split(",")
+    if guild_id.isdigit()
+]
+
+# Set to sync even if the stored fingerprint matches
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "").lower() in ("1", "true", "yes")
+
+def _command_payload(command, tree):
+    """Serialize a command the same way discord.py sends it to Discord"""
+    try:
+        # discord.py 2.4+ takes the tree to resolve translations
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()
+
+def compute_tree_fingerprint(tree, guild=None):
+    """
+    Compute a stable hash of the commands registered for a scope
+
+    Args:
+        tree (app_commands.CommandTree): The bot's command tree
+        guild (discord.abc.Snowflake, optional): The guild scope, None for global commands
+
+    Returns:
+        str: Hex SHA-256 digest of the serialized commands
+    """
+    payloads = [_command_payload(command, tree) for command in tree.get_commands(guild=guild)]
+    payloads.sort(key=lambda payload: (payload.get("type", 1), payload["name"]))
+    encoded = json.dumps(payloads, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+@with_db_session
+def get_stored_fingerprint(scope):
+    """Get the fingerprint recorded by the last successful sync of a scope"""
+    try:
+        from models import CommandSyncState
+        state = CommandSyncState.query.filter_by(scope=scope).first()
+        return state.fingerprint if state else None
+    except Exception as e:
+        logger.error(f"Error reading command sync state for {scope}: {e}")
+        return None
+
+@with_db_session
+def store_fingerprint(scope, fingerprint):
+    """Record the fingerprint of a successful sync"""
+    try:
+        from models import CommandSyncState
+        state = CommandSyncState.query.filter_by(scope=scope).first()
+        if state:
+            state.fingerprint = fingerprint
+            state.synced_at = datetime.utcnow()
+        else:
+            db.session.add(CommandSyncState(scope=scope, fingerprint=fingerprint))
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving command sync state for {scope}: {e}")
+        return False
+
+async def _sync_scope(tree, guild=None):
+    """Sync a single scope if its fingerprint changed, returns True if a sync request was made"""
+    scope = str(guild.id) if guild else "global"
+    fingerprint = compute_tree_fingerprint(tree, guild=guild)
+
+    if not FORCE_COMMAND_SYNC and get_stored_fingerprint(scope) == fingerprint:
+        logger.info(f"Command tree unchanged for {scope} ({fingerprint[:8]}), skipping sync")
+        return False
+
+    synced = await tree.sync(guild=guild)
+    logger.info(f"Synced {len(synced)} command(s) for {scope} ({fingerprint[:8]})")
+    store_fingerprint(scope, fingerprint)
+    return True
+
+async def sync_command_tree(bot):
+    """
+    Sync application commands only when they changed since the last sync
+
+    When DEV_GUILD_IDS is set, global commands are copied to those guilds and
+    synced per guild instead of globally.
+
+    Args:
+        bot (commands.Bot): The bot whose command tree should be synced
+
+    Returns:
+        int: Number of scopes that were actually synced
+    """
+    synced_scopes = 0
+
+    if DEV_GUILD_IDS:
+        for guild_id in DEV_GUILD_IDS:
+            guild = discord.Object(id=guild_id)
+            bot.tree.copy_global_to(guild=guild)
+            try:
+                if await _sync_scope(bot.tree, guild=guild):
+                    synced_scopes += 1
+            except Exception as e:
+                logger.error(f"Failed to sync commands for guild {guild_id}: {e}")
+        return synced_scopes
+
+    try:
+        if await _sync_scope(bot.tree):
+            synced_scopes += 1
+    except Exception as e:
+        logger.error(f"Failed to sync commands: {e}")
+
+    return synced_scopes
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+
+from database import db, with_db_session
+from models import DelayedJob
+from utils.metrics import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for due jobs; jobs scheduled by this process wake the runner sooner
+DELAYED_JOB_POLL = float(os.getenv("DELAYED_JOB_POLL", "5"))
+
+# Jobs claimed per check
+DELAYED_JOB_BATCH = int(os.getenv("DELAYED_JOB_BATCH", "20"))
+
+# Jobs running at once
+DELAYED_JOB_CONCURRENCY = int(os.getenv("DELAYED_JOB_CONCURRENCY", "4"))
+
+# Seconds a claimed job may run before another runner may claim it again
+DELAYED_JOB_LEASE = int(os.getenv("DELAYED_JOB_LEASE", "300"))
+
+# Attempts before a job is marked failed, retried with exponential backoff from the base delay
+DELAYED_JOB_MAX_ATTEMPTS = int(os.getenv("DELAYED_JOB_MAX_ATTEMPTS", "5"))
+DELAYED_JOB_RETRY_DELAY = 30  # seconds
+
+DELAYED_JOBS_RUN = registry.register(Counter(
+    "delayed_jobs_run",
+    "Delayed job attempts by outcome",
+    ["kind", "outcome"]
+))
+DELAYED_JOB_LAG_SECONDS = registry.register(Histogram(
+    "delayed_job_lag_seconds",
+    "Time between when a delayed job was due and when it started",
+    ["kind"]
+))
+
+@with_db_session
+def insert_job(kind, run_at, payload, shard_id=None, key=None, replace=False):
+    if replace and key is not None:
+        DelayedJob.query.filter_by(kind=kind, key=key, status="pending").delete(synchronize_session=False)
+    job = DelayedJob(
+        kind=kind,
+        key=key,
+        payload=json.dumps(payload or {}),
+        run_at=run_at,
+        status="pending",
+        shard_id=shard_id
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+@with_db_session
+def cancel_jobs(kind, key):
+    """Drop pending jobs of a kind with the given key, returns how many were cancelled"""
+    cancelled = DelayedJob.query.filter_by(kind=kind, key=key, status="pending").delete(synchronize_session=False)
+    db.session.commit()
+    return cancelled
+
+@with_db_session
+def claim_due_jobs(shard_ids=None, include_unsharded=True, limit=DELAYED_JOB_BATCH):
+    """
+    Lock a batch of due jobs for this runner
+
+    FOR UPDATE SKIP LOCKED lets several processes claim from the same table
+    without waiting on or double-claiming each other's rows. SQLite has no row
+    locks and serialises writers instead.
+
+    Args:
+        shard_ids (list, optional): Only jobs for these shards, None for every shard
+        include_unsharded (bool): Also claim jobs that aren't tied to a guild
+
+    Returns:
+        list: (id, kind, payload, attempts, run_at) per claimed job
+    """
+    now = datetime.utcnow()
+    query = DelayedJob.query.filter(
+        DelayedJob.run_at <= now,
+        or_(
+            DelayedJob.status == "pending",
+            and_(DelayedJob.status == "running", DelayedJob.locked_until < now)
+        )
+    )
+    if shard_ids is not None:
+        condition = DelayedJob.shard_id.in_(shard_ids)
+        if include_unsharded:
+            condition = or_(condition, DelayedJob.shard_id.is_(None))
+        query = query.filter(condition)
+
+    jobs = query.order_by(DelayedJob.run_at).limit(limit).with_for_update(skip_locked=True).all()
+    claimed = []
+    for job in jobs:
+        job.status = "running"
+        job.attempts += 1
+        job.locked_until = now + timedelta(seconds=DELAYED_JOB_LEASE)
+        claimed.append((job.id, job.kind, json.loads(job.payload or "{}"), job.attempts, job.run_at))
+    db.session.commit()
+    return claimed
+
+@with_db_session
+def finish_job(job_id, error=None, retry_at=None):
+    job = db.session.get(DelayedJob, job_id)
+    if job is None:
+        return
+    job.locked_until = None
+    if error is None:
+        job.status = "done"
+        job.last_error = None
+    elif retry_at is not None:
+        job.status = "pending"
+        job.run_at = retry_at
+        job.last_error = error
+    else:
+        job.status = "failed"
+        job.last_error = error
+    db.session.commit()
+
+class DelayedJobRunner:
+    """
+    Runs jobs stored in the delayed_jobs table once they are due
+
+    Jobs survive restarts because they live in the database rather than in a
+    sleeping coroutine. Handlers are registered by kind and called with the bot
+    and the job's JSON payload; a handler that raises is retried with backoff.
+    """
+
+    def __init__(self):
+        self.bot = None
+        self.handlers = {}
+        self.wakeup = asyncio.Event()
+        self.semaphore = asyncio.Semaphore(DELAYED_JOB_CONCURRENCY)
+        self.running = set()
+        self.task = None
+
+    def handler(self, kind):
+        """Decorator registering an async handler(bot, payload) for a job kind"""
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def start(self, bot):
+        if self.task is None:
+            self.bot = bot
+            self.task = asyncio.create_task(self.run(), name="delayed-jobs")
+        return self.task
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    async def schedule(self, kind, delay, payload=None, guild=None, key=None, replace=True):
+        """
+        Store a job to run after `delay` seconds
+
+        Args:
+            kind (str): Registered handler name
+            delay (float): Seconds from now
+            payload (dict, optional): JSON-serialisable arguments for the handler
+            guild (discord.Guild, optional): The guild the job acts on, so the right shard cluster runs it
+            key (str, optional): Identity for cancel_jobs; with replace, an earlier pending job with the key is dropped
+            replace (bool): Replace a pending job with the same kind and key
+
+        Returns:
+            int: The job ID
+        """
+        loop = asyncio.get_running_loop()
+        run_at = datetime.utcnow() + timedelta(seconds=delay)
+        shard_id = guild.shard_id if guild is not None else None
+        job_id = await loop.run_in_executor(None, insert_job, kind, run_at, payload, shard_id, key, replace)
+        if delay < DELAYED_JOB_POLL:
+            self.wakeup.set()
+        return job_id
+
+    async def cancel(self, kind, key):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, cancel_jobs, kind, key)
+
+    def claim_scope(self):
+        """Shards this process claims jobs for; unsharded jobs go to cluster 0"""
+        from utils.sharding import get_shard_config
+
+        _, _, cluster_id = get_shard_config()
+        shard_ids = getattr(self.bot, "shard_ids", None)
+        return (list(shard_ids) if shard_ids else None), cluster_id == 0
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        loop = asyncio.get_running_loop()
+        shard_ids, include_unsharded = self.claim_scope()
+        logger.info("Delayed job runner started")
+
+        while True:
+            jobs = []
+            # Don't claim more while a full batch is still waiting to run, the leases would run down
+            if len(self.running) < DELAYED_JOB_BATCH:
+                try:
+                    jobs = await loop.run_in_executor(
+                        None, claim_due_jobs, shard_ids, include_unsharded, DELAYED_JOB_BATCH
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to claim delayed jobs: {e}")
+
+            for job in jobs:
+                task = asyncio.create_task(self.execute(*job))
+                self.running.add(task)
+                task.add_done_callback(self.running.discard)
+
+            # A full batch means more may be due, so check again right away
+            if len(jobs) < DELAYED_JOB_BATCH:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=DELAYED_JOB_POLL)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(0)
+
+    async def execute(self, job_id, kind, payload, attempts, run_at):
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            DELAYED_JOB_LAG_SECONDS.observe(kind, value=max(0.0, (datetime.utcnow() - run_at).total_seconds()))
+            handler = self.handlers.get(kind)
+            start = time.perf_counter()
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler registered for delayed job kind {kind}")
+                await handler(self.bot, payload)
+            except Exception as e:
+                retry_at = None
+                if handler is not None and attempts < DELAYED_JOB_MAX_ATTEMPTS:
+                    retry_at = datetime.utcnow() + timedelta(seconds=DELAYED_JOB_RETRY_DELAY * 2 ** (attempts - 1))
+                DELAYED_JOBS_RUN.inc(kind, "retried" if retry_at else "failed")
+                logger.error(f"Delayed job {job_id} ({kind}) failed on attempt {attempts}: {e}")
+                try:
+                    await loop.run_in_executor(None, finish_job, job_id, repr(e), retry_at)
+                except Exception as e:
+                    # The job stays running and is claimed again once its lease runs out
+                    logger.error(f"Failed to record the failure of delayed job {job_id} ({kind}): {e}")
+                return
+
+            DELAYED_JOBS_RUN.inc(kind, "done")
+            logger.debug(f"Delayed job {job_id} ({kind}) finished in {time.perf_counter() - start:.2f}s")
+            try:
+                await loop.run_in_executor(None, finish_job, job_id)
+            except Exception as e:
+                # The job runs again once its lease runs out, so handlers must tolerate a repeat
+                logger.error(f"Failed to mark delayed job {job_id} ({kind}) done: {e}")
+
+delayed_jobs = DelayedJobRunner()
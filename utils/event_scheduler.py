@@ -0,0 +1,319 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import discord
+from sqlalchemy import or_
+
+from database import db, with_db_session
+from models import HostedEvent
+from utils.metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+# Lifecycle stages, stored in HostedEvent.stage as the last one carried out
+STAGE_SCHEDULED = 0
+STAGE_REMINDED = 1
+STAGE_STARTED = 2
+STAGE_ENDED = 3
+
+STAGE_NAMES = {STAGE_REMINDED: "reminder", STAGE_STARTED: "started", STAGE_ENDED: "ended"}
+
+# Minutes before the start that the reminder is posted
+EVENT_REMINDER_MINUTES = int(os.getenv("EVENT_REMINDER_MINUTES", "15"))
+
+# Events that ended longer ago than this (seconds) are marked ended at startup without editing the announcement
+EVENT_MISSED_GRACE = int(os.getenv("EVENT_MISSED_GRACE", "3600"))
+
+# Lifecycle actions sent to Discord at once, e.g. when many events start together
+EVENT_ACTION_CONCURRENCY = int(os.getenv("EVENT_ACTION_CONCURRENCY", "5"))
+
+# Seconds a process may spend on a stage before another one may carry it out instead
+EVENT_STAGE_LEASE = int(os.getenv("EVENT_STAGE_LEASE", "120"))
+
+# Attempts at a stage before it is given up, retried with exponential backoff from the base delay
+EVENT_MAX_ATTEMPTS = int(os.getenv("EVENT_MAX_ATTEMPTS", "5"))
+EVENT_RETRY_DELAY = 30  # seconds
+
+EVENT_ACTIONS = registry.register(Counter(
+    "hosted_event_actions",
+    "Hosted event reminders and announcement edits",
+    ["stage", "outcome"]
+))
+EVENTS_SCHEDULED = registry.register(Gauge(
+    "hosted_events_scheduled",
+    "Hosted events waiting for their next lifecycle step",
+    []
+))
+
+def to_timestamp(value):
+    """Epoch seconds for a naive UTC datetime from the database"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class ScheduledEvent:
+    """The parts of a HostedEvent the scheduler needs, kept small so thousands fit in memory"""
+
+    __slots__ = ("id", "guild_id", "channel_id", "message_id", "host_id", "event_type", "start", "end", "stage")
+
+    def __init__(self, event):
+        self.id = event.id
+        self.guild_id = int(event.guild_id)
+        self.channel_id = int(event.channel_id)
+        self.message_id = int(event.message_id) if event.message_id else None
+        self.host_id = event.host_id
+        self.event_type = event.event_type
+        self.start = to_timestamp(event.start_time)
+        self.end = to_timestamp(event.end_time)
+        self.stage = event.stage or STAGE_SCHEDULED
+
+    def stage_time(self, stage):
+        if stage == STAGE_REMINDED:
+            return self.start - EVENT_REMINDER_MINUTES * 60
+        if stage == STAGE_STARTED:
+            return self.start
+        return self.end
+
+    def next_stage(self):
+        return self.stage + 1 if self.stage < STAGE_ENDED else None
+
+    def due_stage(self, now):
+        """The latest stage whose time has passed, so a late wake-up skips straight to it"""
+        due = STAGE_SCHEDULED
+        for stage in (STAGE_REMINDED, STAGE_STARTED, STAGE_ENDED):
+            if self.stage_time(stage) <= now:
+                due = stage
+        return due
+
+@with_db_session
+def load_pending_events():
+    """
+    Events that haven't ended yet, after marking long-missed ones as ended
+
+    Returns:
+        list: HostedEvent rows with stage below ended
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=EVENT_MISSED_GRACE)
+    expired = HostedEvent.query.filter(
+        HostedEvent.stage < STAGE_ENDED,
+        HostedEvent.end_time < cutoff
+    ).update({HostedEvent.stage: STAGE_ENDED}, synchronize_session=False)
+    db.session.commit()
+    if expired:
+        logger.info(f"Marked {expired} hosted event(s) that ended while the bot was offline as ended")
+    return HostedEvent.query.filter(HostedEvent.stage < STAGE_ENDED).all()
+
+@with_db_session
+def claim_stage(event_id, stage):
+    """
+    Take a lease on carrying out a stage, unless it was done or another process holds it
+
+    The stage is only recorded by finish_stage() once it was carried out, so a
+    Discord error or a crash leaves it to be tried again.
+
+    Returns:
+        int: The attempt number if claimed, 0 if the event already reached
+        `stage`, None if another process holds the lease
+    """
+    now = datetime.utcnow()
+    updated = HostedEvent.query.filter(
+        HostedEvent.id == event_id,
+        HostedEvent.stage < stage,
+        or_(HostedEvent.stage_locked_until.is_(None), HostedEvent.stage_locked_until < now)
+    ).update({
+        HostedEvent.stage_locked_until: now + timedelta(seconds=EVENT_STAGE_LEASE),
+        HostedEvent.stage_attempts: HostedEvent.stage_attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    event = db.session.get(HostedEvent, event_id)
+    if event is None or event.stage >= stage:
+        return 0
+    return event.stage_attempts if updated == 1 else None
+
+@with_db_session
+def finish_stage(event_id, stage, done=True):
+    """Record a stage as carried out (or given up), or release the lease so it is tried again"""
+    values = {HostedEvent.stage_locked_until: None}
+    if done:
+        values[HostedEvent.stage] = stage
+        values[HostedEvent.stage_attempts] = 0
+    HostedEvent.query.filter(
+        HostedEvent.id == event_id,
+        HostedEvent.stage < stage
+    ).update(values, synchronize_session=False)
+    db.session.commit()
+
+def set_status(embed, status, color):
+    """Set the announcement's Status field, replacing an earlier one"""
+    for index, field in enumerate(embed.fields):
+        if field.name == "Status":
+            embed.set_field_at(index, name="Status", value=status, inline=False)
+            break
+    else:
+        embed.add_field(name="Status", value=status, inline=False)
+    embed.color = color
+    return embed
+
+class EventScheduler:
+    """
+    Carries out hosted event reminders and start/end announcement edits
+
+    Every event's next step sits in one heap ordered by time, and a single task
+    sleeps until the earliest one is due. Adding an event that is due sooner
+    wakes the task so it can sleep again with the shorter delay.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.heap = []
+        self.events = {}
+        self.wakeup = asyncio.Event()
+        self.semaphore = asyncio.Semaphore(EVENT_ACTION_CONCURRENCY)
+        self.actions = set()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self.task
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    def add(self, event, new=False):
+        """
+        Schedule the next step of a HostedEvent
+
+        Args:
+            event (HostedEvent): The saved event
+            new (bool): The event was just announced, so a reminder right away would be noise
+        """
+        scheduled = ScheduledEvent(event)
+        if new and scheduled.stage_time(STAGE_REMINDED) <= time.time():
+            scheduled.stage = STAGE_REMINDED
+        self.events[scheduled.id] = scheduled
+        self.push(scheduled)
+
+    def push(self, scheduled, when=None):
+        """Queue the event's next stage at its time, or at `when` to retry it"""
+        stage = scheduled.next_stage()
+        if stage is None:
+            self.events.pop(scheduled.id, None)
+            return
+        if when is None:
+            when = scheduled.stage_time(stage)
+        if not self.heap or when < self.heap[0][0]:
+            self.wakeup.set()
+        heapq.heappush(self.heap, (when, scheduled.id))
+        EVENTS_SCHEDULED.set(value=len(self.events))
+
+    async def load(self):
+        loop = asyncio.get_running_loop()
+        events = await loop.run_in_executor(None, load_pending_events)
+        # Each shard cluster only handles events in its own guilds
+        events = [
+            event for event in events
+            if self.bot.get_guild(int(event.guild_id)) is not None and event.id not in self.events
+        ]
+        for event in events:
+            self.add(event)
+        logger.info(f"Scheduled {len(events)} hosted event(s)")
+
+    async def run(self):
+        await self.bot.wait_until_ready()
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Failed to load hosted events: {e}")
+
+        while True:
+            delay = self.heap[0][0] - time.time() if self.heap else None
+            if delay is None or delay > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, event_id = heapq.heappop(self.heap)
+            scheduled = self.events.get(event_id)
+            if scheduled is None:
+                continue
+            task = asyncio.create_task(self.advance(scheduled))
+            self.actions.add(task)
+            task.add_done_callback(self.actions.discard)
+
+    async def advance(self, scheduled):
+        """Carry out the event's due stage and schedule the one after it, or a retry if it failed"""
+        stage = max(scheduled.due_stage(time.time()), scheduled.stage + 1)
+        name = STAGE_NAMES[stage]
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            try:
+                attempts = await loop.run_in_executor(None, claim_stage, scheduled.id, stage)
+            except Exception as e:
+                logger.error(f"Failed to claim {name} for hosted event {scheduled.id}: {e}")
+                self.push(scheduled, when=time.time() + EVENT_RETRY_DELAY)
+                return
+            if attempts is None:
+                # Another process is on it; look again once its lease has run out
+                EVENT_ACTIONS.inc(name, "skipped")
+                self.push(scheduled, when=time.time() + EVENT_STAGE_LEASE)
+                return
+            if attempts:
+                try:
+                    await self.perform(scheduled, stage)
+                except Exception as e:
+                    EVENT_ACTIONS.inc(name, "error")
+                    give_up = attempts >= EVENT_MAX_ATTEMPTS
+                    logger.error(
+                        f"Failed to carry out {name} for hosted event {scheduled.id} on attempt {attempts}"
+                        f"{', giving up' if give_up else ''}: {e}"
+                    )
+                    try:
+                        await loop.run_in_executor(None, finish_stage, scheduled.id, stage, give_up)
+                    except Exception as e:
+                        logger.error(f"Failed to record {name} attempt for hosted event {scheduled.id}: {e}")
+                    if not give_up:
+                        self.push(scheduled, when=time.time() + EVENT_RETRY_DELAY * 2 ** (attempts - 1))
+                        return
+                else:
+                    EVENT_ACTIONS.inc(name, "ok")
+                    try:
+                        await loop.run_in_executor(None, finish_stage, scheduled.id, stage)
+                    except Exception as e:
+                        # The lease runs out and the stage is carried out again rather than lost
+                        logger.error(f"Failed to record {name} for hosted event {scheduled.id}: {e}")
+            else:
+                EVENT_ACTIONS.inc(name, "skipped")
+        scheduled.stage = stage
+        self.push(scheduled)
+
+    async def perform(self, scheduled, stage):
+        channel = self.bot.get_channel(scheduled.channel_id)
+        if channel is None or scheduled.message_id is None:
+            return
+        announcement = channel.get_partial_message(scheduled.message_id)
+
+        if stage == STAGE_REMINDED:
+            minutes = max(1, round((scheduled.start - time.time()) / 60))
+            await channel.send(
+                f"⏰ The {scheduled.event_type} hosted by <@{scheduled.host_id}> starts in {minutes} minute{'s' if minutes != 1 else ''}!",
+                reference=announcement.to_reference(fail_if_not_exists=False),
+                allowed_mentions=discord.AllowedMentions.none()
+            )
+            return
+
+        try:
+            message = await announcement.fetch()
+        except discord.NotFound:
+            return
+        embed = message.embeds[0] if message.embeds else discord.Embed(title=scheduled.event_type.title())
+        if stage == STAGE_STARTED:
+            set_status(embed, "🟢 In progress", discord.Color.green())
+        else:
+            set_status(embed, "⚫ Ended", discord.Color.dark_grey())
+        await message.edit(embed=embed)
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def fan_out(calls, timeout, on_result=None):
+    """
+    Run several coroutines concurrently under one shared deadline
+
+    Results are handed to `on_result` in completion order, so callers can
+    render whatever is ready without waiting for the slowest call. Calls still
+    running at the deadline are cancelled and left out of the results.
+
+    Args:
+        calls (dict): name -> coroutine
+        timeout (float): Seconds for all of the calls together
+        on_result (callable, optional): Awaited with (name, result, results so far);
+            returning False stops early and cancels the rest
+
+    Returns:
+        dict: name -> result for the calls that finished; a call that raised maps to None
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    tasks = {asyncio.ensure_future(coro): name for name, coro in calls.items()}
+    pending = set(tasks)
+    results = {}
+
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                if task.exception() is not None:
+                    logger.warning(f"Fan-out call {name} failed: {task.exception()}")
+                    results[name] = None
+                else:
+                    results[name] = task.result()
+                if on_result is not None and await on_result(name, results[name], results) is False:
+                    return results
+        if pending:
+            logger.info(f"Fan-out deadline of {timeout}s passed with {sorted(tasks[task] for task in pending)} still running")
+        return results
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
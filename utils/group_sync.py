@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from datetime import datetime
+
+from database import db, with_db_session
+from models import GroupRankBinding, GroupRoster, User
+from utils.rest_budget import BulkScheduler, member_roles_bucket, member_roles_remove_bucket
+from utils.roblox_api import USMC_GROUP_ID, iter_group_members
+from utils.sharding import get_shard_config
+from utils.username_index import username_index
+
+logger = logging.getLogger(__name__)
+
+# Seconds between roster syncs
+GROUP_SYNC_INTERVAL = int(os.getenv("GROUP_SYNC_INTERVAL", "900"))
+
+# Roblox IDs per users query
+LOOKUP_CHUNK_SIZE = 500
+
+SYNC_REASON = "Roblox group rank sync"
+
+# Only one sync runs at a time per process
+sync_lock = asyncio.Lock()
+
+def encode_roster(roster):
+    """
+    Pack {user_id: rank} into a compact blob
+
+    User IDs are sorted and stored as deltas so zlib can squeeze them, ranks
+    follow as one byte each.
+    """
+    user_ids = sorted(roster)
+    deltas = array("Q", (user_id - previous for previous, user_id in zip([0] + user_ids, user_ids)))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    ranks = bytes(roster[user_id] for user_id in user_ids)
+    return zlib.compress(struct.pack("<I", len(user_ids)) + deltas.tobytes() + ranks, 6)
+
+def decode_roster(blob):
+    """Unpack a blob made by encode_roster into {user_id: rank}"""
+    data = zlib.decompress(blob)
+    count = struct.unpack_from("<I", data)[0]
+    deltas = array("Q")
+    deltas.frombytes(data[4:4 + count * 8])
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    ranks = data[4 + count * 8:]
+
+    roster = {}
+    user_id = 0
+    for delta, rank in zip(deltas, ranks):
+        user_id += delta
+        roster[user_id] = rank
+    return roster
+
+class RosterDiff:
+    """Members added, removed and re-ranked between two roster snapshots"""
+
+    def __init__(self, added, removed, changed, first_sync=False):
+        self.added = added          # user_id -> rank
+        self.removed = removed      # user_id -> previous rank
+        self.changed = changed      # user_id -> (previous rank, rank)
+        self.first_sync = first_sync
+
+    def changes(self):
+        """Every affected user as user_id -> (previous rank or None, rank or None)"""
+        changes = {user_id: (None, rank) for user_id, rank in self.added.items()}
+        changes.update({user_id: (rank, None) for user_id, rank in self.removed.items()})
+        changes.update(self.changed)
+        return changes
+
+    def summary(self):
+        return f"{len(self.added)} joined, {len(self.removed)} left, {len(self.changed)} rank change(s)"
+
+def diff_rosters(previous, current):
+    if previous is None:
+        return RosterDiff(dict(current), {}, {}, first_sync=True)
+    added = {user_id: rank for user_id, rank in current.items() if user_id not in previous}
+    removed = {user_id: rank for user_id, rank in previous.items() if user_id not in current}
+    changed = {
+        user_id: (previous[user_id], rank)
+        for user_id, rank in current.items()
+        if user_id in previous and previous[user_id] != rank
+    }
+    return RosterDiff(added, removed, changed)
+
+def roster_key(group_id):
+    # Each shard cluster applies bindings for its own guilds, so each keeps its own snapshot
+    _, _, cluster_id = get_shard_config()
+    return str(group_id) if not cluster_id else f"{group_id}@{cluster_id}"
+
+@with_db_session
+def load_roster(group_id):
+    snapshot = GroupRoster.query.filter_by(group_id=roster_key(group_id)).first()
+    return decode_roster(snapshot.roster) if snapshot else None
+
+@with_db_session
+def save_roster(group_id, roster):
+    key = roster_key(group_id)
+    snapshot = GroupRoster.query.filter_by(group_id=key).first()
+    if snapshot is None:
+        snapshot = GroupRoster(group_id=key)
+        db.session.add(snapshot)
+    snapshot.roster = encode_roster(roster)
+    snapshot.member_count = len(roster)
+    snapshot.synced_at = datetime.utcnow()
+    db.session.commit()
+
+@with_db_session
+def load_bindings(group_id, guild_ids=None):
+    """Bindings for the group as guild_id -> list of (rank, role_id)"""
+    query = GroupRankBinding.query.filter_by(group_id=str(group_id))
+    if guild_ids is not None:
+        query = query.filter(GroupRankBinding.guild_id.in_([str(guild_id) for guild_id in guild_ids]))
+    bindings = {}
+    for binding in query:
+        bindings.setdefault(binding.guild_id, []).append((binding.rank, binding.role_id))
+    return bindings
+
+@with_db_session
+def linked_discord_ids(roblox_ids):
+    """Verified Discord accounts for the given Roblox IDs as roblox_id -> discord_id"""
+    roblox_ids = [str(roblox_id) for roblox_id in roblox_ids]
+    linked = {}
+    for index in range(0, len(roblox_ids), LOOKUP_CHUNK_SIZE):
+        rows = User.query.with_entities(User.roblox_id, User.discord_id).filter(
+            User.verified.is_(True),
+            User.roblox_id.in_(roblox_ids[index:index + LOOKUP_CHUNK_SIZE])
+        )
+        linked.update((int(roblox_id), discord_id) for roblox_id, discord_id in rows)
+    return linked
+
+async def fetch_roster(group_id):
+    """Stream the group's members into {user_id: rank}"""
+    roster = {}
+    usernames = []
+    async for user_id, username, rank in iter_group_members(group_id):
+        if user_id:
+            roster[user_id] = rank
+            usernames.append(username)
+    # Group members are likely autocomplete targets for /rank and /info-roblox
+    username_index.add_many(usernames)
+    return roster
+
+async def apply_bindings(bot, group_id, changes, guild_ids=None):
+    """
+    Update bound Discord roles for the members whose rank changed
+
+    Args:
+        bot: The bot, for its guilds
+        group_id (str): The Roblox group
+        changes (dict): user_id -> (previous rank, rank), None for not in the group
+        guild_ids (iterable, optional): Only these guilds
+
+    Returns:
+        dict: Counts of role calls made and failed
+    """
+    stats = {"added": 0, "removed": 0, "failed": 0}
+    if not changes:
+        return stats
+
+    loop = asyncio.get_running_loop()
+    guild_ids = guild_ids if guild_ids is not None else [guild.id for guild in bot.guilds]
+    bindings = await loop.run_in_executor(None, load_bindings, group_id, guild_ids)
+    if not bindings:
+        return stats
+    linked = await loop.run_in_executor(None, linked_discord_ids, list(changes))
+
+    scheduler = BulkScheduler()
+    operations = []
+    for guild_id, guild_bindings in bindings.items():
+        guild = bot.get_guild(int(guild_id))
+        if guild is None:
+            continue
+        roles_by_rank = {}
+        for rank, role_id in guild_bindings:
+            role = guild.get_role(int(role_id))
+            if role is not None and role < guild.me.top_role:
+                roles_by_rank.setdefault(rank, set()).add(role)
+        bound_roles = set().union(*roles_by_rank.values()) if roles_by_rank else set()
+
+        for roblox_id, (_, rank) in changes.items():
+            discord_id = linked.get(roblox_id)
+            member = guild.get_member(int(discord_id)) if discord_id else None
+            if member is None:
+                continue
+            desired = roles_by_rank.get(rank, set()) if rank is not None else set()
+            current = set(member.roles) & bound_roles
+            for role in desired - current:
+                scheduler.add(member_roles_bucket(guild), lambda member=member, role=role: member.add_roles(role, reason=SYNC_REASON))
+                operations.append("added")
+            for role in current - desired:
+                scheduler.add(member_roles_remove_bucket(guild), lambda member=member, role=role: member.remove_roles(role, reason=SYNC_REASON))
+                operations.append("removed")
+
+    for action, outcome in zip(operations, await scheduler.run()):
+        if isinstance(outcome, Exception):
+            stats["failed"] += 1
+            logger.debug("Group rank sync failed to update a role: %s", outcome)
+        else:
+            stats[action] += 1
+    return stats
+
+async def sync_group(bot, group_id=USMC_GROUP_ID):
+    """
+    Fetch the roster, diff it against the last snapshot, apply bindings from the diff and save the new snapshot
+
+    Returns:
+        tuple: (RosterDiff, role update counts)
+    """
+    async with sync_lock:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        previous = await loop.run_in_executor(None, load_roster, group_id)
+        current = await fetch_roster(group_id)
+        diff = diff_rosters(previous, current)
+        stats = await apply_bindings(bot, group_id, diff.changes())
+        await loop.run_in_executor(None, save_roster, group_id, current)
+        logger.info(f"Synced group {group_id} ({len(current)} members) in {time.perf_counter() - start:.1f}s: "
+                    f"{diff.summary()}, roles {stats}")
+        return diff, stats
+
+async def apply_guild_bindings(bot, guild, group_id=USMC_GROUP_ID):
+    """Apply the guild's bindings to every member in the last snapshot, e.g. after a binding changes"""
+    loop = asyncio.get_running_loop()
+    roster = await loop.run_in_executor(None, load_roster, group_id)
+    if roster is None:
+        return None
+    changes = {user_id: (None, rank) for user_id, rank in roster.items()}
+    return await apply_bindings(bot, group_id, changes, guild_ids=[guild.id])
+
+async def sync_loop(bot, group_id=USMC_GROUP_ID, interval=GROUP_SYNC_INTERVAL):
+    """Background task that keeps the roster and bound roles up to date"""
+    await bot.wait_until_ready()
+    while True:
+        try:
+            await sync_group(bot, group_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Roblox group sync failed: {e}")
+        await asyncio.sleep(interval)
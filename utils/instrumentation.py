@@ -0,0 +1,71 @@
+import functools
+import logging
+
+import discord
+from discord import app_commands
+
+from utils.admission import AdmissionRejected, admission, command_cooldown, send_rejection
+from utils.metrics import current_command, interaction_name, record_completion
+
+logger = logging.getLogger(__name__)
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """Command tree that labels sub-spans with the running command, counts errors and applies admission control"""
+
+    async def _call(self, interaction: discord.Interaction):
+        # Autocomplete has to answer within the deadline and is cheap, so it skips admission
+        if interaction.type is not discord.InteractionType.application_command:
+            return await super()._call(interaction)
+
+        try:
+            async with admission.admit(
+                interaction_name(interaction),
+                interaction.guild_id,
+                interaction.user.id,
+                command_cooldown(interaction.command)
+            ):
+                return await super()._call(interaction)
+        except AdmissionRejected as rejected:
+            await send_rejection(interaction, rejected)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # Runs in the same task as the command, so the label covers its Roblox and DB calls
+        current_command.set(interaction_name(interaction))
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        record_completion(interaction, error)
+        await super().on_error(interaction, error)
+
+class InstrumentedView(discord.ui.View):
+    """
+    View whose item callbacks record latency and errors like app commands do
+
+    Item callbacks also go through admission control. Subclasses can set
+    per-button cooldowns in `cooldowns`, keyed by custom_id.
+    """
+
+    cooldowns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for item in self.children:
+            item.callback = self._instrument(item.callback)
+
+    def _instrument(self, callback):
+        @functools.wraps(callback)
+        async def wrapper(interaction: discord.Interaction):
+            name = interaction_name(interaction)
+            current_command.set(name)
+            try:
+                async with admission.admit(name, interaction.guild_id, interaction.user.id, self.cooldowns.get(name)):
+                    result = await callback(interaction)
+            except AdmissionRejected as rejected:
+                await send_rejection(interaction, rejected)
+                return None
+            except Exception as e:
+                record_completion(interaction, e)
+                raise
+            record_completion(interaction)
+            return result
+        return wrapper
@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import logging
+import os
+import signal
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often followers try to take the lock and the leader checks it still holds it
+LEADER_POLL_INTERVAL = float(os.getenv("LEADER_POLL_INTERVAL", "2"))
+
+# Set to 0 to skip the election and always run the bot (single process setups)
+LEADER_ELECTION_ENABLED = os.getenv("LEADER_ELECTION", "1").lower() not in ("0", "false", "no")
+
+def lock_key(name):
+    """Derive a stable signed 64-bit advisory lock key from a name"""
+    return int.from_bytes(hashlib.sha256(name.encode("utf-8")).digest()[:8], "big", signed=True)
+
+class PostgresAdvisoryLock:
+    """
+    Session-level Postgres advisory lock held on a dedicated connection
+
+    The lock is released by Postgres as soon as the connection closes, so a
+    crashed leader frees it without any cleanup.
+    """
+
+    def __init__(self, name):
+        self.key = lock_key(name)
+        self.connection = None
+
+    def acquire(self):
+        from sqlalchemy import text
+        from database import db
+
+        if self.connection is None:
+            self.connection = db.engine.connect()
+        acquired = self.connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}).scalar()
+        self.connection.commit()
+        return bool(acquired)
+
+    def check(self):
+        """Return True if the connection holding the lock is still alive"""
+        from sqlalchemy import text
+
+        self.connection.execute(text("SELECT 1"))
+        self.connection.commit()
+        return True
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.close()
+        except Exception as e:
+            logger.warning(f"Error closing leader lock connection: {e}")
+        self.connection = None
+
+class FileLock:
+    """Exclusive file lock used when the database is not Postgres (local SQLite runs)"""
+
+    def __init__(self, name):
+        self.path = os.path.join(os.getenv("LEADER_LOCK_DIR", "."), f".{name}.lock")
+        self.handle = None
+
+    def acquire(self):
+        import fcntl
+
+        if self.handle is None:
+            self.handle = open(self.path, "a")
+        try:
+            fcntl.flock(self.handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def check(self):
+        return self.handle is not None and not self.handle.closed
+
+    def release(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+def create_lock(name):
+    """Pick the lock backend matching the configured database"""
+    from database import get_database_url
+
+    if get_database_url().startswith("postgresql"):
+        return PostgresAdvisoryLock(name)
+    return FileLock(name)
+
+class LeaderElection:
+    """
+    Elects a single leader among processes competing for the same lock
+
+    The leader runs on_elected once it takes the lock and on_demoted if it loses
+    it or is_alive reports that its work has stopped. Followers retry every
+    LEADER_POLL_INTERVAL seconds, so a new leader takes over within a few
+    seconds of the old one exiting.
+    """
+
+    def __init__(self, name, poll_interval=LEADER_POLL_INTERVAL):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.lock = None
+        self.is_leader = False
+        self.thread = None
+
+    @property
+    def role(self):
+        return "leader" if self.is_leader else "follower"
+
+    def start(self, on_elected, on_demoted, is_alive=None):
+        """Run the election loop in a background thread"""
+        self.thread = threading.Thread(
+            target=self.run, args=(on_elected, on_demoted, is_alive), name=f"leader-election-{self.name}"
+        )
+        self.thread.daemon = True
+        self.thread.start()
+        return self.thread
+
+    def run(self, on_elected, on_demoted, is_alive=None):
+        """Election loop, returns once this process stops being leader"""
+        if not LEADER_ELECTION_ENABLED:
+            logger.info("Leader election disabled, running as leader")
+            self.is_leader = True
+            on_elected()
+            # Nobody can take over, so there is nothing to do until the work stops
+            while is_alive is None or is_alive():
+                time.sleep(self.poll_interval)
+            self.is_leader = False
+            on_demoted()
+            return
+
+        self.lock = create_lock(self.name)
+        logger.info(f"Joining leader election for {self.name} as follower")
+
+        while True:
+            try:
+                if self.is_leader:
+                    self.lock.check()
+                    if is_alive is not None and not is_alive():
+                        raise RuntimeError("the work it leads has stopped")
+                elif self.lock.acquire():
+                    self.is_leader = True
+                    logger.info(f"Elected leader for {self.name}")
+                    on_elected()
+            except Exception as e:
+                if self.is_leader:
+                    logger.error(f"Stepping down as leader for {self.name}: {e}")
+                    self.is_leader = False
+                    # Free the lock first so a standby can take over while this process shuts down
+                    self.lock.release()
+                    try:
+                        on_demoted()
+                    except Exception as demote_error:
+                        logger.error(f"Error stepping down as leader: {demote_error}")
+                    return
+                logger.warning(f"Leader election check failed for {self.name}: {e}")
+                self.lock.release()
+
+            time.sleep(self.poll_interval)
+
+class BotRunner:
+    """
+    Runs the Discord bot in a thread while this process is leader
+
+    A bot is only ever started once. Its event loop owns the work queues,
+    locks and cog tasks, so after it stops the process exits and the
+    supervisor (or gunicorn) starts a fresh one instead.
+    """
+
+    def __init__(self, bot, token):
+        self.bot = bot
+        self.token = token
+        self.thread = None
+
+    def _run(self):
+        logger.info("Starting Discord bot as leader")
+        try:
+            # Logging is already configured by configure_logging, don't let discord.py add its own handler
+            self.bot.run(self.token, log_handler=None)
+        except Exception as e:
+            logger.error(f"Error running Discord bot: {e}")
+        logger.warning("Discord bot stopped")
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="discord-bot")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        if not self.is_running():
+            return
+        logger.info("Stopping Discord bot, no longer leader")
+        try:
+            future = asyncio.run_coroutine_threadsafe(self.bot.close(), self.bot.loop)
+            future.result(timeout=10)
+        except Exception as e:
+            logger.error(f"Error closing Discord bot: {e}")
+        self.thread.join(timeout=10)
+
+    def step_down(self):
+        """Stop the bot and end the process, the bot can't be started again in it"""
+        self.stop()
+        logger.critical("No longer running the Discord bot, exiting so a fresh process can take over")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+def start_bot_with_leader_election(bot, token, name="discord-bot"):
+    """
+    Join the leader election and run the bot only while this process is leader
+
+    Args:
+        bot (commands.Bot): The bot to run
+        token (str): The Discord bot token
+        name (str): Election name, processes sharing a name compete for one gateway session
+
+    Returns:
+        tuple: (LeaderElection, BotRunner)
+    """
+    runner = BotRunner(bot, token)
+    election = LeaderElection(name)
+    election.start(on_elected=runner.start, on_demoted=runner.step_down, is_alive=runner.is_running)
+    return election, runner
@@ -0,0 +1,203 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from utils.metrics import Counter, registry
+
+# Load environment variables so LOG_* settings in .env apply
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "text" keeps the classic format, "json" writes one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Optional size-rotated log file
+LOG_FILE = os.getenv("LOG_FILE")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+# Records waiting for the writer thread; beyond this they are dropped instead of blocking
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Per logging call site, records below WARNING allowed per second (with a burst allowance)
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "10"))
+LOG_RATE_BURST = int(os.getenv("LOG_RATE_BURST", "50"))
+
+# Fraction of records below WARNING kept for high-volume loggers, e.g. "utils.roblox_api=0.2,cogs.verification=0.5"
+DEFAULT_SAMPLE_RATES = "utils.roblox_api=0.2"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", DEFAULT_SAMPLE_RATES)
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_RECORDS_DROPPED = registry.register(Counter(
+    "log_records_dropped",
+    "Log records dropped by sampling, rate limiting or a full queue",
+    ["logger", "reason"]
+))
+
+_listener = None
+_configure_lock = threading.Lock()
+
+def parse_sample_rates(value):
+    """Parse "logger=rate,logger=rate" into a dict"""
+    rates = {}
+    for part in (value or "").replace(" ", "").split(","):
+        if "=" not in part:
+            continue
+        name, rate = part.split("=", 1)
+        try:
+            rates[name] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        if getattr(record, "sampled", None):
+            payload["sample_rate"] = record.sampled
+        return json.dumps(payload, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records below WARNING from configured loggers"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def _rate_for(self, name):
+        # The most specific configured parent logger wins
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        if random.random() < rate:
+            record.sampled = rate
+            return True
+        LOG_RECORDS_DROPPED.inc(record.name, "sampled")
+        return False
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logging call site for records below WARNING
+
+    Buckets are keyed by file and line rather than message, since most calls
+    log f-strings. The number of buckets is bounded by the number of logging
+    calls in the code.
+    """
+
+    def __init__(self, per_second=LOG_RATE_LIMIT, burst=LOG_RATE_BURST):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.per_second <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.per_second)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                LOG_RECORDS_DROPPED.inc(record.name, "rate_limited")
+                return False
+            self.buckets[key] = (tokens - 1, now)
+        return True
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records when the queue is full instead of blocking the caller"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(record.name, "queue_full")
+
+    def prepare(self, record):
+        # Format the message in the caller so arguments can't change before the writer thread runs
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+def _create_output_handlers():
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        directory = os.path.dirname(LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        ))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def configure_logging(level=LOG_LEVEL):
+    """
+    Route all logging through a bounded queue drained by a background thread
+
+    Callers only pay for filtering and enqueueing; formatting and I/O happen on
+    the listener thread. Safe to call more than once.
+
+    Args:
+        level (str): Root log level
+
+    Returns:
+        logging.handlers.QueueListener: The running listener
+    """
+    global _listener
+
+    with _configure_lock:
+        if _listener is not None:
+            return _listener
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = DroppingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+        queue_handler.addFilter(RateLimitFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *_create_output_handlers(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+
+from utils.metrics import Counter, Gauge, Histogram, registry, register_snapshot_writer
+
+logger = logging.getLogger(__name__)
+
+# How long the loop may go without running the heartbeat before the blocking callback is captured
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD", "0.25"))  # seconds
+
+# Heartbeat and watchdog intervals
+LOOP_TICK_INTERVAL = 0.1  # seconds
+WATCHDOG_INTERVAL = 0.05  # seconds
+
+# Number of recent blocking callbacks kept per loop
+MAX_OFFENDERS = 50
+
+# Fail on blocking calls instead of only recording them: the process's loop is stopped on the first one
+# (for test and CI runs)
+LOOP_MONITOR_STRICT = os.getenv("LOOP_MONITOR_STRICT", "").lower() in ("1", "true", "yes")
+
+LOOP_SNAPSHOT_PATH = os.getenv("LOOP_SNAPSHOT_PATH", ".metrics/loop.json")
+
+LOOP_LAG_SECONDS = registry.register(Gauge(
+    "event_loop_lag_seconds",
+    "How late the last heartbeat on the event loop woke up",
+    ["loop"]
+))
+LOOP_LAG_HISTOGRAM = registry.register(Histogram(
+    "event_loop_lag_distribution_seconds",
+    "Distribution of event loop heartbeat lag",
+    ["loop"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+))
+LOOP_BLOCKING_CALLS = registry.register(Counter(
+    "event_loop_blocking_calls",
+    "Callbacks that blocked the event loop longer than the threshold",
+    ["loop"]
+))
+
+# All running monitors by loop name
+monitors = {}
+
+class BlockingCallError(RuntimeError):
+    """Raised in strict mode when a callback blocked the event loop"""
+
+class LoopMonitor:
+    """
+    Measures event loop lag and captures the stack of callbacks that block it
+
+    A heartbeat coroutine on the loop records how late each wake-up is. A
+    watchdog thread notices when the heartbeat stops and takes the loop thread's
+    stack at that moment, which points at the callback holding the loop.
+    """
+
+    def __init__(self, name, threshold=LOOP_BLOCK_THRESHOLD, strict=LOOP_MONITOR_STRICT, stop_loop=None):
+        self.name = name
+        self.threshold = threshold
+        self.strict = strict
+        # Strict monitors for a whole process stop its loop; strict_loop_monitor raises on exit instead
+        self.stop_loop = strict if stop_loop is None else stop_loop
+        self.failure = None
+        self.offenders = deque(maxlen=MAX_OFFENDERS)
+        self.current = None
+        self.last_tick = time.monotonic()
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.thread_id = None
+        self.task = None
+        self.watchdog = None
+        self.running = False
+
+    def start(self):
+        """Start monitoring the running loop, must be called from inside it"""
+        self.thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.running = True
+        self.task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self.task.add_done_callback(self._heartbeat_done)
+        self.watchdog = threading.Thread(target=self._watch, name=f"loop-watchdog-{self.name}")
+        self.watchdog.daemon = True
+        self.watchdog.start()
+        monitors[self.name] = self
+        logger.info(f"Monitoring event loop {self.name} (blocking threshold {self.threshold * 1000:.0f} ms)")
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.task:
+            self.task.cancel()
+        if monitors.get(self.name) is self:
+            del monitors[self.name]
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while self.running:
+            start = loop.time()
+            await asyncio.sleep(LOOP_TICK_INTERVAL)
+            self.lag = max(0.0, loop.time() - start - LOOP_TICK_INTERVAL)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.last_tick = time.monotonic()
+            LOOP_LAG_SECONDS.set(self.name, value=round(self.lag, 6))
+            LOOP_LAG_HISTOGRAM.observe(self.name, value=self.lag)
+            if self.failure is not None:
+                raise self.failure
+
+    def _heartbeat_done(self, task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if isinstance(error, BlockingCallError) and self.stop_loop:
+            logger.critical(f"Strict loop monitor stopping event loop {self.name}: {error}")
+            task.get_loop().stop()
+
+    def _watch(self):
+        while self.running:
+            time.sleep(WATCHDOG_INTERVAL)
+            stalled = time.monotonic() - self.last_tick - LOOP_TICK_INTERVAL
+            if stalled > self.threshold:
+                if self.current is None:
+                    self.current = {
+                        "loop": self.name,
+                        "started_at": datetime.utcfromtimestamp(time.time() - stalled).isoformat() + "Z",
+                        "duration_ms": round(stalled * 1000, 1),
+                        "stack": self._capture_stack()
+                    }
+                else:
+                    self.current["duration_ms"] = round(stalled * 1000, 1)
+            elif self.current is not None:
+                self._record(self.current)
+                self.current = None
+
+    def _capture_stack(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return []
+        return traceback.format_stack(frame)
+
+    def _record(self, offender):
+        self.offenders.append(offender)
+        LOOP_BLOCKING_CALLS.inc(self.name)
+        location = offender["stack"][-1].strip().splitlines()[0] if offender["stack"] else "unknown location"
+        message = f"Event loop {self.name} blocked for {offender['duration_ms']} ms at {location}"
+        if self.strict:
+            logger.error(message)
+            # Raised from the heartbeat on the loop, the watchdog thread can't fail anything itself
+            if self.failure is None:
+                self.failure = BlockingCallError(message)
+        else:
+            logger.warning(message)
+
+    def check(self):
+        """Raise BlockingCallError if any callback blocked the loop since the last check"""
+        offenders = list(self.offenders)
+        self.offenders.clear()
+        if offenders:
+            summary = "\n".join(
+                f"{offender['duration_ms']} ms:\n{''.join(offender['stack'][-5:])}" for offender in offenders
+            )
+            raise BlockingCallError(f"{len(offenders)} blocking call(s) on event loop {self.name}:\n{summary}")
+
+    def to_dict(self):
+        return {
+            "loop": self.name,
+            "lag_ms": round(self.lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "offenders": list(self.offenders)
+        }
+
+class strict_loop_monitor:
+    """
+    Async context manager for tests that fails if the block stalls the event loop
+
+    Example:
+        async with strict_loop_monitor(threshold=0.05):
+            await code_under_test()
+    """
+
+    def __init__(self, threshold=0.05, name="test"):
+        self.monitor = LoopMonitor(name, threshold=threshold, strict=True, stop_loop=False)
+
+    async def __aenter__(self):
+        return self.monitor.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Give the watchdog a chance to record a stall that just ended
+        await asyncio.sleep(LOOP_TICK_INTERVAL + WATCHDOG_INTERVAL * 2)
+        self.monitor.stop()
+        if exc_type is None:
+            self.monitor.check()
+        return False
+
+def start_loop_monitor(name):
+    """Start a monitor for the running loop and return it"""
+    return LoopMonitor(name).start()
+
+def loop_report():
+    """Lag and recent offenders for every monitored loop in this process"""
+    return [monitor.to_dict() for monitor in monitors.values()]
+
+def write_snapshot(path=LOOP_SNAPSHOT_PATH):
+    """Write the loop report to disk for web workers that don't run the bot"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as snapshot:
+        json.dump(loop_report(), snapshot)
+    os.replace(temp_path, path)
+
+register_snapshot_writer(write_snapshot)
+
+def read_snapshot(path=LOOP_SNAPSHOT_PATH):
+    try:
+        with open(path) as snapshot:
+            return json.load(snapshot)
+    except (OSError, ValueError):
+        return []
@@ -0,0 +1,299 @@
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, Discord's interaction deadline is 3 seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 3.0, 5.0, 10.0, 30.0)
+
+# Where the bot process writes its metrics so web workers without the bot can serve them
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", ".metrics/bot.prom")
+METRICS_SNAPSHOT_INTERVAL = 15  # seconds
+METRICS_SNAPSHOT_MAX_AGE = 120  # seconds
+
+# The command or view button currently being handled, used to attribute sub-spans
+current_command = contextvars.ContextVar("current_command", default="none")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}_total{_format_labels(self.labelnames, labelvalues)} {value}"
+
+class Gauge(Counter):
+    """Value that can go up and down, with labels"""
+
+    type_name = "gauge"
+
+    def set(self, *labelvalues, value):
+        with self.lock:
+            self.values[labelvalues] = value
+
+    def samples(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        for labelvalues, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}"
+
+class Histogram:
+    """Cumulative histogram with labels, rendered in Prometheus text format"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.values = {}  # labelvalues -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, *labelvalues, value):
+        with self.lock:
+            entry = self.values.get(labelvalues)
+            if entry is None:
+                entry = self.values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self.lock:
+            items = sorted((labels, (list(entry[0]), entry[1], entry[2])) for labels, entry in self.values.items())
+        for labelvalues, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_bound(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, labelvalues)
+            yield f"{self.name}_sum{labels} {total}"
+            yield f"{self.name}_count{labels} {count}"
+
+class Registry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self.metrics = []
+        self.is_bot_process = False
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+COMMAND_ACK_SECONDS = registry.register(Histogram(
+    "discord_interaction_ack_seconds",
+    "Time from interaction creation until the first response or defer",
+    ["command"]
+))
+COMMAND_LATENCY_SECONDS = registry.register(Histogram(
+    "discord_interaction_latency_seconds",
+    "Time from interaction creation until the handler finished",
+    ["command", "outcome"]
+))
+COMMAND_ERRORS = registry.register(Counter(
+    "discord_interaction_errors",
+    "Interactions whose handler raised an error",
+    ["command", "error"]
+))
+SPAN_SECONDS = registry.register(Histogram(
+    "bot_span_seconds",
+    "Time spent in Roblox API and database calls, per command",
+    ["span", "operation", "command"]
+))
+
+def interaction_name(interaction):
+    """Name used to label an interaction: the command name or the component's custom_id"""
+    command = getattr(interaction, "command", None)
+    if command is not None:
+        return command.qualified_name
+    data = getattr(interaction, "data", None) or {}
+    return data.get("custom_id") or data.get("name") or "unknown"
+
+def seconds_since_created(interaction):
+    """Seconds since Discord created the interaction, measured against its snowflake timestamp"""
+    return max(0.0, time.time() - interaction.created_at.timestamp())
+
+def record_ack(interaction):
+    """Record time-to-ack once per interaction"""
+    extras = interaction.extras
+    if extras.get("metrics_acked"):
+        return
+    extras["metrics_acked"] = True
+    COMMAND_ACK_SECONDS.observe(interaction_name(interaction), value=seconds_since_created(interaction))
+
+def record_completion(interaction, error=None):
+    """Record total latency and, if the handler failed, an error"""
+    name = interaction_name(interaction)
+    outcome = "error" if error is not None else "success"
+    COMMAND_LATENCY_SECONDS.observe(name, outcome, value=seconds_since_created(interaction))
+    if error is not None:
+        original = getattr(error, "original", error)
+        COMMAND_ERRORS.inc(name, type(original).__name__)
+
+def observe_span(span, operation, seconds):
+    SPAN_SECONDS.observe(span, operation, current_command.get(), value=seconds)
+
+@contextmanager
+def span(span_name, operation):
+    """Time a block of code as a sub-span of the current command"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(span_name, operation, time.perf_counter() - start)
+
+def timed_span(span_name, operation=None):
+    """Decorator that records a sync or async function call as a sub-span"""
+    def decorator(func):
+        name = operation or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def install_db_instrumentation(engine):
+    """Time every SQL statement run through the engine"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        observe_span("db", operation, time.perf_counter() - starts.pop())
+
+def install_interaction_instrumentation():
+    """Record time-to-ack whenever any interaction is first responded to"""
+    import discord
+
+    response_cls = discord.InteractionResponse
+    if getattr(response_cls, "_metrics_installed", False):
+        return
+
+    def wrap(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            result = await method(self, *args, **kwargs)
+            try:
+                record_ack(self._parent)
+            except Exception as e:
+                logger.debug(f"Failed to record interaction ack: {e}")
+            return result
+        return wrapper
+
+    for method_name in ("defer", "send_message", "edit_message", "send_modal", "autocomplete"):
+        method = getattr(response_cls, method_name, None)
+        if method is not None:
+            setattr(response_cls, method_name, wrap(method))
+    response_cls._metrics_installed = True
+
+# Extra snapshot functions run alongside the metrics snapshot (e.g. the loop monitor report)
+snapshot_writers = []
+
+def register_snapshot_writer(writer):
+    snapshot_writers.append(writer)
+    return writer
+
+def write_snapshot(path=METRICS_SNAPSHOT_PATH):
+    """Write the current metrics to disk for web workers that don't run the bot"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as snapshot:
+        snapshot.write(registry.render())
+    os.replace(temp_path, path)
+
+def read_snapshot(path=METRICS_SNAPSHOT_PATH):
+    """Read the bot's metrics snapshot, None if it is missing or stale"""
+    try:
+        if time.time() - os.path.getmtime(path) > METRICS_SNAPSHOT_MAX_AGE:
+            return None
+        with open(path) as snapshot:
+            return snapshot.read()
+    except OSError:
+        return None
+
+def render_metrics():
+    """Metrics for /metrics: this process's registry if it runs the bot, otherwise the bot's snapshot"""
+    if registry.is_bot_process:
+        return registry.render()
+    return read_snapshot() or registry.render()
+
+async def snapshot_loop():
+    """Background task in the bot process that keeps the snapshot file fresh"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    while True:
+        for writer in [write_snapshot] + snapshot_writers:
+            try:
+                # File I/O runs in a worker thread, not on the loop the monitor is watching
+                await loop.run_in_executor(None, writer)
+            except Exception as e:
+                logger.error(f"Failed to write snapshot with {writer.__module__}.{writer.__name__}: {e}")
+        await asyncio.sleep(METRICS_SNAPSHOT_INTERVAL)
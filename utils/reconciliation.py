@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import time
+
+import discord
+
+from database import with_db_session
+from models import ServerConfig, User
+from utils.rest_budget import BulkScheduler, member_edit_bucket, member_roles_bucket, member_roles_remove_bucket
+
+logger = logging.getLogger(__name__)
+
+# Discord nicknames are limited to 32 characters
+MAX_NICKNAME_LENGTH = 32
+
+# Discord IDs per users query
+LOOKUP_CHUNK_SIZE = 500
+
+# Changes listed in a dry-run report
+MAX_REPORTED_CHANGES = 15
+
+RECONCILE_REASON = "Role and nickname reconciliation"
+
+class MemberChange:
+    """The calls needed to bring one member to their desired state"""
+
+    def __init__(self, member):
+        self.member = member
+        self.add_roles = []
+        self.remove_roles = []
+        self.nick = None
+
+    @property
+    def empty(self):
+        return not self.add_roles and not self.remove_roles and self.nick is None
+
+    def describe(self):
+        parts = []
+        if self.add_roles:
+            parts.append("add " + ", ".join(role.name for role in self.add_roles))
+        if self.remove_roles:
+            parts.append("remove " + ", ".join(role.name for role in self.remove_roles))
+        if self.nick is not None:
+            parts.append(f"nickname → {self.nick}")
+        return f"{self.member.display_name}: " + "; ".join(parts)
+
+class ReconcileResult:
+    """Counts and details from one reconciliation run"""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.members = 0
+        self.changes = []
+        self.skipped = []
+        self.calls = 0
+        self.failed = []
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {
+            "dry_run": self.dry_run,
+            "members": self.members,
+            "members_changed": len(self.changes),
+            "calls": self.calls,
+            "failed": len(self.failed),
+            "skipped": len(self.skipped),
+            "seconds": round(self.seconds, 2)
+        }
+
+@with_db_session
+def load_desired_state(guild_id, member_ids):
+    """
+    Read the guild's config and which of its members are verified
+
+    Returns:
+        tuple: (ServerConfig or None, dict of discord_id -> roblox_username for verified members)
+    """
+    config = ServerConfig.query.filter_by(guild_id=str(guild_id)).first()
+    verified = {}
+    member_ids = [str(member_id) for member_id in member_ids]
+    for index in range(0, len(member_ids), LOOKUP_CHUNK_SIZE):
+        rows = User.query.with_entities(User.discord_id, User.roblox_username).filter(
+            User.verified.is_(True),
+            User.discord_id.in_(member_ids[index:index + LOOKUP_CHUNK_SIZE])
+        )
+        verified.update(rows)
+    return config, verified
+
+def can_manage_role(guild, role):
+    return role is not None and not role.managed and role < guild.me.top_role
+
+def can_edit_nickname(guild, member):
+    return member.id != guild.owner_id and member.top_role < guild.me.top_role
+
+def plan_guild(guild, config, verified, stale_roles=()):
+    """
+    Diff every member against the state the database says they should have
+
+    Verified users should have the verified role and their Roblox username as
+    nickname. Everyone else should not have the verified role. Stale roles
+    (e.g. a previous verified role) are removed from everyone.
+
+    Returns:
+        tuple: (list of MemberChange, list of (member, reason) skipped)
+    """
+    verified_role = guild.get_role(int(config.verified_role_id)) if config and config.verified_role_id else None
+    if verified_role is not None and not can_manage_role(guild, verified_role):
+        raise PermissionError(f"The verified role {verified_role.name} is above the bot's highest role")
+    stale_roles = [role for role in stale_roles if role is not None and role != verified_role and can_manage_role(guild, role)]
+
+    changes = []
+    skipped = []
+    for member in guild.members:
+        if member.bot:
+            continue
+
+        change = MemberChange(member)
+        roblox_username = verified.get(str(member.id))
+        is_verified = roblox_username is not None
+
+        if verified_role is not None:
+            has_role = verified_role in member.roles
+            if is_verified and not has_role:
+                change.add_roles.append(verified_role)
+            elif not is_verified and has_role:
+                change.remove_roles.append(verified_role)
+
+        change.remove_roles.extend(role for role in stale_roles if role in member.roles)
+
+        if is_verified and roblox_username:
+            desired_nick = roblox_username[:MAX_NICKNAME_LENGTH]
+            if member.nick != desired_nick:
+                if can_edit_nickname(guild, member):
+                    change.nick = desired_nick
+                else:
+                    skipped.append((member, "nickname above the bot's role"))
+
+        if not change.empty:
+            changes.append(change)
+
+    return changes, skipped
+
+async def reconcile_guild(guild, dry_run=False, stale_roles=(), progress=None):
+    """
+    Bring every member's verified role and nickname in line with the database
+
+    Args:
+        guild (discord.Guild): The guild to reconcile
+        dry_run (bool): Only compute the changes
+        stale_roles (iterable): Roles to remove from everyone, such as a replaced verified role
+        progress (callable, optional): Called with (completed, total) calls as changes are applied
+
+    Returns:
+        ReconcileResult: What was (or would be) changed
+    """
+    start = time.perf_counter()
+    result = ReconcileResult(dry_run)
+
+    if not guild.chunked:
+        await guild.chunk()
+
+    member_ids = [member.id for member in guild.members if not member.bot]
+    loop = asyncio.get_running_loop()
+    config, verified = await loop.run_in_executor(None, load_desired_state, guild.id, member_ids)
+    changes, skipped = plan_guild(guild, config, verified, stale_roles)
+    result.members = len(member_ids)
+    result.changes = changes
+    result.skipped = skipped
+    result.calls = sum(len(change.add_roles) + len(change.remove_roles) + (change.nick is not None) for change in changes)
+
+    if dry_run or not changes:
+        result.seconds = time.perf_counter() - start
+        return result
+
+    # One call per role and per nickname, grouped by rate limit bucket so the scheduler can interleave them
+    scheduler = BulkScheduler()
+    operations = []
+    for change in changes:
+        member = change.member
+        for role in change.add_roles:
+            scheduler.add(member_roles_bucket(guild), lambda member=member, role=role: member.add_roles(role, reason=RECONCILE_REASON))
+            operations.append((member, f"add {role.name}"))
+        for role in change.remove_roles:
+            scheduler.add(member_roles_remove_bucket(guild), lambda member=member, role=role: member.remove_roles(role, reason=RECONCILE_REASON))
+            operations.append((member, f"remove {role.name}"))
+        if change.nick is not None:
+            scheduler.add(member_edit_bucket(guild), lambda member=member, nick=change.nick: member.edit(nick=nick, reason=RECONCILE_REASON))
+            operations.append((member, "set nickname"))
+
+    outcomes = await scheduler.run(progress=progress)
+    for (member, action), outcome in zip(operations, outcomes):
+        if isinstance(outcome, Exception):
+            result.failed.append((member, action, outcome))
+            if not isinstance(outcome, (discord.Forbidden, discord.NotFound)):
+                logger.error(f"Reconciliation failed to {action} for {member} in {guild.id}: {outcome}")
+
+    result.seconds = time.perf_counter() - start
+    logger.info(f"Reconciled guild {guild.id}: {result.to_dict()}")
+    return result
+
+def format_result(result):
+    """Human-readable summary for the reconcile command"""
+    summary = result.to_dict()
+    verb = "Would make" if result.dry_run else "Made"
+    lines = [
+        f"Checked {summary['members']} members in {summary['seconds']}s.",
+        f"{verb} {summary['calls']} change(s) for {summary['members_changed']} member(s)."
+    ]
+    if result.failed:
+        lines.append(f"{len(result.failed)} change(s) failed.")
+    if result.skipped:
+        lines.append(f"{len(result.skipped)} member(s) skipped because they are above the bot's role.")
+    if result.dry_run and result.changes:
+        lines.append("")
+        lines.extend(change.describe() for change in result.changes[:MAX_REPORTED_CHANGES])
+        if len(result.changes) > MAX_REPORTED_CHANGES:
+            lines.append(f"...and {len(result.changes) - MAX_REPORTED_CHANGES} more")
+    return "\n".join(lines)[:1900]
@@ -0,0 +1,319 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from collections import OrderedDict, deque
+
+from utils.metrics import Counter, Gauge, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+# Buckets kept in the report, least recently used are dropped first
+MAX_TRACKED_BUCKETS = 500
+
+# Bulk mutations running at once across different buckets
+BULK_CONCURRENCY = 4
+
+REST_REQUESTS = registry.register(Counter(
+    "discord_rest_requests",
+    "Discord REST requests by route",
+    ["route"]
+))
+REST_SECONDS = registry.register(Histogram(
+    "discord_rest_seconds",
+    "Discord REST request duration by route, including rate limit waits",
+    ["route"]
+))
+REST_RATE_LIMITED = registry.register(Counter(
+    "discord_rest_rate_limited",
+    "Discord REST responses with status 429",
+    ["route"]
+))
+REST_SLEEP_SECONDS = registry.register(Counter(
+    "discord_rest_sleep_seconds",
+    "Seconds discord.py spent sleeping on rate limits",
+    ["route"]
+))
+REST_BUCKET_REMAINING = registry.register(Gauge(
+    "discord_rest_bucket_remaining",
+    "Requests left in the route's current rate limit window",
+    ["route"]
+))
+
+def route_name(method, path):
+    return f"{method} {path}"
+
+def bucket_key(method, path, channel_id=None, guild_id=None, webhook_id=None):
+    """
+    Key a Discord route the way its rate limit bucket is shared: the route plus its major parameter
+
+    Example:
+        bucket_key("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", guild_id=guild.id)
+    """
+    return (route_name(method, path), str(channel_id or guild_id or webhook_id or ""))
+
+def member_roles_bucket(guild):
+    return bucket_key("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", guild_id=guild.id)
+
+def member_roles_remove_bucket(guild):
+    return bucket_key("DELETE", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", guild_id=guild.id)
+
+def member_edit_bucket(guild):
+    return bucket_key("PATCH", "/guilds/{guild_id}/members/{user_id}", guild_id=guild.id)
+
+def channel_messages_bucket(channel):
+    return bucket_key("POST", "/channels/{channel_id}/messages", channel_id=channel.id)
+
+def channel_permissions_bucket(channel):
+    return bucket_key("PUT", "/channels/{channel_id}/permissions/{overwrite_id}", channel_id=channel.id)
+
+def channel_edit_bucket(channel):
+    return bucket_key("PATCH", "/channels/{channel_id}", channel_id=channel.id)
+
+def followup_bucket(interaction):
+    return bucket_key("POST", "/webhooks/{webhook_id}/{webhook_token}", webhook_id=interaction.application_id)
+
+def create_channel_bucket(guild):
+    return bucket_key("POST", "/guilds/{guild_id}/channels", guild_id=guild.id)
+
+def thread_member_bucket(thread):
+    return bucket_key("PUT", "/channels/{channel_id}/thread-members/{user_id}", channel_id=thread.id)
+
+class BucketState:
+    """What we last saw of one rate limit bucket"""
+
+    def __init__(self, key):
+        self.key = key
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+        self.sleep_seconds = 0.0
+
+    def wait_time(self, now=None):
+        """Seconds until a request on this bucket would not have to wait"""
+        now = time.monotonic() if now is None else now
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at > now:
+            return self.reset_at - now
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "route": self.key[0],
+            "major": self.key[1],
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in": round(max(0.0, self.reset_at - time.monotonic()), 2),
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "sleep_seconds": round(self.sleep_seconds, 2)
+        }
+
+class RestBudget:
+    """Per-bucket remaining/reset, 429s and sleep time for Discord REST calls in this process"""
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+
+    def get(self, key):
+        state = self.buckets.get(key)
+        if state is None:
+            state = self.buckets[key] = BucketState(key)
+            while len(self.buckets) > MAX_TRACKED_BUCKETS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return state
+
+    def wait_time(self, key):
+        state = self.buckets.get(key)
+        return state.wait_time() if state else 0.0
+
+    def record_request(self, http, route, seconds):
+        key = bucket_key(route.method, route.path, getattr(route, "channel_id", None),
+                         getattr(route, "guild_id", None), getattr(route, "webhook_id", None))
+        state = self.get(key)
+        state.requests += 1
+        REST_REQUESTS.inc(key[0])
+        REST_SECONDS.observe(key[0], value=seconds)
+
+        ratelimit = _find_ratelimit(http, route)
+        if ratelimit is not None:
+            state.limit = getattr(ratelimit, "limit", state.limit)
+            state.remaining = getattr(ratelimit, "remaining", state.remaining)
+            reset_after = getattr(ratelimit, "reset_after", None)
+            if reset_after is not None:
+                state.reset_at = time.monotonic() + float(reset_after)
+            if state.remaining is not None:
+                REST_BUCKET_REMAINING.set(key[0], value=state.remaining)
+
+    def record_rate_limit(self, route, sleep_seconds, is_429):
+        """Called from discord.py's log records while the request is in flight"""
+        state = self.get(route) if route else None
+        name = route[0] if route else "unknown"
+        if is_429:
+            REST_RATE_LIMITED.inc(name)
+            if state:
+                state.rate_limited += 1
+        if sleep_seconds:
+            REST_SLEEP_SECONDS.inc(name, amount=sleep_seconds)
+            if state:
+                state.sleep_seconds += sleep_seconds
+
+    def report(self, limit=25):
+        """Buckets that have been rate limited or slept the most"""
+        states = sorted(self.buckets.values(), key=lambda state: (state.rate_limited, state.sleep_seconds, state.requests), reverse=True)
+        return [state.to_dict() for state in states[:limit]]
+
+budget = RestBudget()
+
+def _find_ratelimit(http, route):
+    # discord.py keeps buckets in private attributes, so read them defensively
+    try:
+        buckets = getattr(http, "_buckets", {})
+        bucket_hash = getattr(http, "_bucket_hashes", {}).get(route.key)
+        major = getattr(route, "major_parameters", "")
+        key = f"{bucket_hash}:{major}" if bucket_hash else f"{route.key}:{major}"
+        return buckets.get(key)
+    except Exception:
+        return None
+
+class RateLimitLogHandler(logging.Handler):
+    """Picks 429s and rate limit sleeps out of discord.py's own log records"""
+
+    def emit(self, record):
+        try:
+            message = record.msg if isinstance(record.msg, str) else ""
+            lowered = message.lower()
+            if "rate limit" not in lowered and "429" not in lowered:
+                return
+            numbers = [arg for arg in (record.args or ()) if isinstance(arg, (int, float)) and not isinstance(arg, bool)]
+            sleep_seconds = float(numbers[-1]) if numbers and "retrying in" in lowered else 0.0
+            budget.record_rate_limit(current_route.get(), sleep_seconds, "429" in lowered)
+        except Exception:
+            pass
+
+# The bucket of the request currently awaiting discord.py, set by the request wrapper
+current_route = contextvars.ContextVar("current_route", default=None)
+
+def install_rest_instrumentation():
+    """Wrap discord.py's HTTP client so every REST call updates the budget tracker"""
+    import discord
+
+    http_cls = discord.http.HTTPClient
+    if getattr(http_cls, "_budget_installed", False):
+        return
+
+    request = http_cls.request
+
+    @functools.wraps(request)
+    async def wrapper(self, route, *args, **kwargs):
+        key = bucket_key(route.method, route.path, getattr(route, "channel_id", None),
+                         getattr(route, "guild_id", None), getattr(route, "webhook_id", None))
+        # discord.py sleeps before sending on a bucket it knows is exhausted; count that wait too
+        pre_wait = budget.wait_time(key)
+        if pre_wait:
+            budget.record_rate_limit(key, pre_wait, False)
+        token = current_route.set(key)
+        start = time.perf_counter()
+        try:
+            return await request(self, route, *args, **kwargs)
+        finally:
+            current_route.reset(token)
+            try:
+                budget.record_request(self, route, time.perf_counter() - start)
+            except Exception as e:
+                logger.debug("Failed to record REST budget: %s", e)
+
+    http_cls.request = wrapper
+    http_cls._budget_installed = True
+
+    # discord.py logs each 429 as a warning with the delay it is about to sleep
+    logging.getLogger("discord.http").addHandler(RateLimitLogHandler())
+
+class BulkScheduler:
+    """
+    Runs a batch of Discord mutations without hitting one bucket back-to-back
+
+    Operations are grouped by bucket and taken round-robin, one in flight per
+    bucket. A bucket the tracker knows is exhausted is skipped until it
+    resets. Operations on the same bucket keep the order they were added in.
+
+    Example:
+        scheduler = BulkScheduler()
+        scheduler.add(member_roles_bucket(guild), lambda: member.add_roles(role))
+        scheduler.add(member_edit_bucket(guild), lambda: member.edit(nick=name))
+        results = await scheduler.run()
+    """
+
+    def __init__(self, concurrency=BULK_CONCURRENCY, tracker=budget):
+        self.concurrency = concurrency
+        self.tracker = tracker
+        self.queues = OrderedDict()
+        self.count = 0
+
+    def add(self, bucket, factory):
+        """Queue `factory`, a callable returning the coroutine to run"""
+        self.queues.setdefault(bucket, deque()).append((self.count, factory))
+        self.count += 1
+
+    async def run(self, progress=None):
+        """
+        Run every queued operation
+
+        Args:
+            progress (callable, optional): Called with (completed, total) after each operation finishes
+
+        Returns:
+            list: Each operation's result or the exception it raised, in the order added
+        """
+        results = [None] * self.count
+        running = {}
+        completed = 0
+
+        while self.queues or running:
+            launched = False
+            for bucket in list(self.queues):
+                if len(running) >= self.concurrency:
+                    break
+                if any(bucket == busy for busy, _ in running.values()) or self.tracker.wait_time(bucket) > 0:
+                    continue
+                index, factory = self.queues[bucket].popleft()
+                if not self.queues[bucket]:
+                    del self.queues[bucket]
+                else:
+                    # Rotate so the next pass starts with a different bucket
+                    self.queues.move_to_end(bucket)
+                running[asyncio.ensure_future(self._call(factory))] = (bucket, index)
+                launched = True
+
+            if running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    _, index = running.pop(task)
+                    results[index] = task.result()
+                    completed += 1
+                    if progress:
+                        progress(completed, len(results))
+            elif self.queues and not launched:
+                # Every remaining bucket is exhausted, wait for the first one to reset
+                await asyncio.sleep(min(self.tracker.wait_time(bucket) for bucket in self.queues))
+
+        self.count = 0
+        return results
+
+    @staticmethod
+    async def _call(factory):
+        try:
+            return await factory()
+        except Exception as e:
+            return e
+
+async def run_bulk(operations, concurrency=BULK_CONCURRENCY, progress=None):
+    """Run (bucket, factory) pairs through a BulkScheduler"""
+    scheduler = BulkScheduler(concurrency=concurrency)
+    for bucket, factory in operations:
+        scheduler.add(bucket, factory)
+    return await scheduler.run(progress=progress)
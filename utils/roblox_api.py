@@ -1,3 +1,4 @@
+import asyncio
 import aiohttp
 import logging
 import json
@@ -5,6 +6,9 @@ import os
 import sys
 from dotenv import load_dotenv
 
+from utils.metrics import timed_span
+from utils.username_index import username_index
+
 # Try to import Render config if it exists
 try:
     from .render_config import IS_RENDER, ROBLOX_API_TIMEOUT, ROBLOX_API_RETRIES, SPECIAL_TEST_USERNAMES, FORCE_TEST_USERNAMES, TEST_USERNAME_IDS
@@ -33,7 +37,7 @@ async def _get_user_with_retry(username, retry_count=3):
     logger = logging.getLogger(__name__)
     
     for attempt in range(1, retry_count + 1):
-        logger.info(f"Attempt {attempt}/{retry_count} to lookup username: {username}")
+        logger.info("Attempt %s/%s to lookup username: %s", attempt, retry_count, username)
         
         try:
             # Try the first method with username validation endpoint
@@ -50,7 +54,7 @@ async def _get_user_with_retry(username, retry_count=3):
                         data = await response.json()
                         if data.get("data") and len(data["data"]) > 0:
                             user_data = data["data"][0]
-                            logger.info(f"Found Roblox user with retry method: {username} (ID: {user_data.get('id')})")
+                            logger.info("Found Roblox user with retry method: %s (ID: %s)", username, user_data.get('id'))
                             return {
                                 "id": user_data.get("id"),
                                 "username": user_data.get("name"),
@@ -64,7 +68,7 @@ async def _get_user_with_retry(username, retry_count=3):
                         if response2.status == 200:
                             data = await response2.json()
                             if "Id" in data:
-                                logger.info(f"Found Roblox user with retry+second API: {username} (ID: {data['Id']})")
+                                logger.info("Found Roblox user with retry+second API: %s (ID: %s)", username, data['Id'])
                                 return {
                                     "id": data["Id"],
                                     "username": data["Username"],
@@ -86,7 +90,7 @@ async def _get_user_with_retry(username, retry_count=3):
     
     # If its a known Roblox username, give it a special ID
     if username.lower() in ["roblox", "builderman"]:
-        logger.info(f"Creating override response for known Roblox system user: {username}")
+        logger.info("Creating override response for known Roblox system user: %s", username)
         
         test_id = "1" if username.lower() == "roblox" else "156"  # Builderman's ID
         return {
@@ -119,6 +123,79 @@ logger = logging.getLogger(__name__)
 # Get Roblox cookie from environment variables
 ROBLOX_COOKIE = os.getenv("ROBLOX_COOKIE")
 
+# The USMC Roblox group
+USMC_GROUP_ID = os.getenv("ROBLOX_GROUP_ID", "11966964")
+
+# Members per page from the group users API (10, 25, 50 or 100)
+GROUP_PAGE_SIZE = 100
+
+# Connections the shared client keeps open to Roblox
+ROBLOX_MAX_CONNECTIONS = int(os.getenv("ROBLOX_MAX_CONNECTIONS", "20"))
+
+# Recent badges shown by /info-roblox
+RECENT_BADGE_LIMIT = 10
+
+_session = None
+_session_loop = None
+
+def _discard_session(session, loop):
+    """Close a session that is being replaced, on the event loop it belongs to"""
+    if session is None or session.closed:
+        return
+    try:
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            # Its loop has stopped, so release the connections directly
+            session.connector.close()
+    except Exception as e:
+        logger.warning(f"Failed to close replaced Roblox session: {e}")
+
+def get_session():
+    """
+    The shared Roblox client session
+    
+    Reusing one session keeps connections to the Roblox APIs warm, so concurrent
+    lookups don't each pay for DNS and a TLS handshake. It is created on first
+    use and recreated if it was closed or belongs to another event loop, in
+    which case the old one is closed.
+    """
+    global _session, _session_loop
+    
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        _discard_session(_session, _session_loop)
+        headers = {}
+        if ROBLOX_COOKIE:
+            headers["Cookie"] = f".ROBLOSECURITY={ROBLOX_COOKIE}"
+        _session = aiohttp.ClientSession(
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=ROBLOX_API_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=ROBLOX_MAX_CONNECTIONS)
+        )
+        _session_loop = loop
+    return _session
+
+async def close_session():
+    """Close the shared session on shutdown"""
+    global _session, _session_loop
+    session, _session, _session_loop = _session, None, None
+    if session is not None and not session.closed:
+        await session.close()
+
+async def _get_json(url, params=None):
+    """GET a Roblox API endpoint with the shared session, returning None on any failure"""
+    try:
+        async with get_session().get(url, params=params) as response:
+            if response.status != 200:
+                logger.warning(f"Roblox API returned {response.status} for {url}")
+                return None
+            return await response.json()
+    except Exception as e:
+        logger.warning(f"Roblox API request to {url} failed: {e}")
+        return None
+
+@timed_span("roblox")
 async def get_roblox_user_by_username(username):
     """
     Get a Roblox user by username
@@ -131,8 +208,12 @@ async def get_roblox_user_by_username(username):
     """
     # Skip the primary API and directly use the alternate method
     # This avoids connection issues with api.roblox.com
-    logger.info(f"Looking up Roblox user (skipping primary API): {username}")
-    return await get_user_by_username_alternate(username)
+    logger.info("Looking up Roblox user (skipping primary API): %s", username)
+    user = await get_user_by_username_alternate(username)
+    if user and user.get("username"):
+        # Remember names that exist for roblox_username autocomplete
+        username_index.add(user["username"])
+    return user
 
 async def get_user_by_username_alternate(username):
     """
@@ -147,7 +228,7 @@ async def get_user_by_username_alternate(username):
     """
     # First, handle test usernames case insensitively
     if username.lower() in SPECIAL_TEST_USERNAMES:
-        logger.info(f"Using hardcoded test response for {username}")
+        logger.info("Using hardcoded test response for %s", username)
         # Test IDs for different test accounts
         if username.lower() == "roblox":
             test_id = "1"
@@ -166,7 +247,7 @@ async def get_user_by_username_alternate(username):
     if username.lower() in TEST_USERNAME_IDS.keys():
         # This is a test username
         test_id = TEST_USERNAME_IDS[username.lower()]
-        logger.info(f"Using test username mode for: {username} (ID: {test_id})")
+        logger.info("Using test username mode for: %s (ID: %s)", username, test_id)
         return {
             "id": test_id,
             "username": username,
@@ -177,7 +258,7 @@ async def get_user_by_username_alternate(username):
     
     # Standard Render environment without forced overrides
     if RUNNING_ON_RENDER:
-        logger.info(f"Using Render-specific settings for username lookup: {username}")
+        logger.info("Using Render-specific settings for username lookup: %s", username)
         # For Render environments, use our special retry logic
         return await _get_user_with_retry(username, ROBLOX_API_RETRIES)
     
@@ -189,7 +270,7 @@ async def get_user_by_username_alternate(username):
         # Try simpler public API endpoint that doesn't require authentication
         url = f"https://api.roblox.com/users/get-by-username?username={username}"
         
-        logger.info(f"Looking up Roblox user with public API: {username}")
+        logger.info("Looking up Roblox user with public API: %s", username)
         
         async with aiohttp.ClientSession() as session:
             try:
@@ -197,7 +278,7 @@ async def get_user_by_username_alternate(username):
                     if response.status == 200:
                         data = await response.json()
                         if "Id" in data:
-                            logger.info(f"Found Roblox user: {username} (ID: {data['Id']})")
+                            logger.info("Found Roblox user: %s (ID: %s)", username, data['Id'])
                             return {
                                 "id": data["Id"],
                                 "username": data["Username"],
@@ -214,7 +295,7 @@ async def get_user_by_username_alternate(username):
              
             # If we're here, the first method failed
             # Try a different endpoint
-            logger.info(f"Trying second endpoint for username: {username}")
+            logger.info("Trying second endpoint for username: %s", username)
             await asyncio.sleep(1)  # Wait a bit
             
             try:
@@ -226,7 +307,7 @@ async def get_user_by_username_alternate(username):
                         # Look for exact username match in the search results
                         for user in data.get("data", []):
                             if user.get("name", "").lower() == username.lower():
-                                logger.info(f"Found Roblox user with second method: {username} (ID: {user.get('id')})")
+                                logger.info("Found Roblox user with second method: %s (ID: %s)", username, user.get('id'))
                                 return {
                                     "id": user.get("id"),
                                     "username": user.get("name"),
@@ -241,7 +322,7 @@ async def get_user_by_username_alternate(username):
                 logger.warning(f"Error in second API method: {str(e)}")
             
             # Try a third API endpoint - users/get-by-username (v1)
-            logger.info(f"Trying third endpoint for username: {username}")
+            logger.info("Trying third endpoint for username: %s", username)
             try:
                 url3 = "https://users.roblox.com/v1/usernames/users"
                 payload = {
@@ -253,7 +334,7 @@ async def get_user_by_username_alternate(username):
                         data = await response3.json()
                         if data.get("data") and len(data["data"]) > 0:
                             user_data = data["data"][0]
-                            logger.info(f"Found Roblox user with third method: {username} (ID: {user_data.get('id')})")
+                            logger.info("Found Roblox user with third method: %s (ID: %s)", username, user_data.get('id'))
                             return {
                                 "id": user_data.get("id"),
                                 "username": user_data.get("name"),
@@ -272,6 +353,7 @@ async def get_user_by_username_alternate(username):
         logger.error(f"Critical error in get_user_by_username_alternate: {str(e)}")
         return None
 
+@timed_span("roblox")
 async def get_roblox_user_info(user_id):
     """
     Get detailed Roblox user information
@@ -285,7 +367,7 @@ async def get_roblox_user_info(user_id):
     try:
         # Special case for test user ID
         if str(user_id) == "2470023":
-            logger.info(f"Using hardcoded test user info for ID: {user_id}")
+            logger.info("Using hardcoded test user info for ID: %s", user_id)
             return {
                 "id": 2470023,
                 "name": "SysBloxLuv",
@@ -298,22 +380,17 @@ async def get_roblox_user_info(user_id):
         # Get user profile info
         url = f"https://users.roblox.com/v1/users/{user_id}"
         
-        headers = {}
-        # Add the .ROBLOSECURITY cookie if available for authenticated requests
-        if ROBLOX_COOKIE:
-            headers["Cookie"] = f".ROBLOSECURITY={ROBLOX_COOKIE}"
-        
-        logger.info(f"Getting detailed info for Roblox user ID: {user_id}")
+        logger.info("Getting detailed info for Roblox user ID: %s", user_id)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get user info for ID {user_id}, status: {response.status}")
-                    return None
-                
-                data = await response.json()
-                logger.info(f"Successfully retrieved info for user ID {user_id}")
-                return data
+        # The shared session sends the .ROBLOSECURITY cookie if available
+        async with get_session().get(url) as response:
+            if response.status != 200:
+                logger.error(f"Failed to get user info for ID {user_id}, status: {response.status}")
+                return None
+            
+            data = await response.json()
+            logger.info("Successfully retrieved info for user ID %s", user_id)
+            return data
     
     except Exception as e:
         logger.error(f"Error getting Roblox user info: {e}")
@@ -335,11 +412,11 @@ async def check_verification(user_id, verification_code):
         # Special cases for test user IDs (for development only)
         test_ids = ["2470023", "1", "156"]  # Test ID, Roblox, Builderman
         if str(user_id) in test_ids:
-            logger.info(f"Test mode: Auto-verifying test user ID: {user_id}")
+            logger.info("Test mode: Auto-verifying test user ID: %s", user_id)
             return True
     
         # Get user profile info using authenticated request
-        logger.info(f"Checking verification code for user ID {user_id}")
+        logger.info("Checking verification code for user ID %s", user_id)
         user_info = await get_roblox_user_info(user_id)
         
         if not user_info:
@@ -352,15 +429,16 @@ async def check_verification(user_id, verification_code):
         
         # Check if verification code is in the description
         description = user_info["description"]
-        logger.info(f"Checking if code '{verification_code}' is in profile description")
+        logger.info("Checking if code '%s' is in profile description", verification_code)
         
         # Log the first few chars of the description for debugging (without revealing full content)
-        desc_preview = description[:30] + "..." if len(description) > 30 else description
-        logger.info(f"Description preview: {desc_preview}")
+        if logger.isEnabledFor(logging.DEBUG):
+            desc_preview = description[:30] + "..." if len(description) > 30 else description
+            logger.debug("Description preview: %s", desc_preview)
         
         # Check for verification code
         if verification_code in description:
-            logger.info(f"Verification code found for user ID {user_id}")
+            logger.info("Verification code found for user ID %s", user_id)
             return True
         else:
             logger.warning(f"Verification code not found in profile for user ID {user_id}")
@@ -371,6 +449,7 @@ async def check_verification(user_id, verification_code):
         # Fail closed - return False on any errors
         return False
 
+@timed_span("roblox")
 async def get_user_groups(user_id):
     """
     Get a user's Roblox groups
@@ -379,31 +458,153 @@ async def get_user_groups(user_id):
         user_id (str): The Roblox user ID
         
     Returns:
-        list: List of user's groups, empty list if error
+        list: List of user's groups, None if they couldn't be fetched
     """
     try:
         url = f"https://groups.roblox.com/v1/users/{user_id}/groups/roles"
         
-        headers = {}
-        # Add the .ROBLOSECURITY cookie if available for authenticated requests
-        if ROBLOX_COOKIE:
-            headers["Cookie"] = f".ROBLOSECURITY={ROBLOX_COOKIE}"
-        
-        logger.info(f"Getting groups for Roblox user ID: {user_id}")
+        logger.info("Getting groups for Roblox user ID: %s", user_id)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to get groups for user ID {user_id}, status: {response.status}")
-                    return []
-                
-                data = await response.json()
-                logger.info(f"Successfully retrieved {len(data.get('data', []))} groups for user ID {user_id}")
-                return data.get("data", [])
+        async with get_session().get(url) as response:
+            if response.status != 200:
+                logger.error(f"Failed to get groups for user ID {user_id}, status: {response.status}")
+                return None
+            
+            data = await response.json()
+            logger.info("Successfully retrieved %s groups for user ID %s", len(data.get('data', [])), user_id)
+            return data.get("data", [])
     
     except Exception as e:
         logger.error(f"Error getting user groups: {e}")
-        return []
+        return None
+
+@timed_span("roblox")
+async def get_user_avatar_url(user_id):
+    """
+    Get the URL of a user's avatar headshot
+    
+    Args:
+        user_id (str): The Roblox user ID
+        
+    Returns:
+        str: Image URL, None if unavailable
+    """
+    data = await _get_json(
+        "https://thumbnails.roblox.com/v1/users/avatar-headshot",
+        params={"userIds": str(user_id), "size": "420x420", "format": "Png"}
+    )
+    for thumbnail in (data or {}).get("data", []):
+        if thumbnail.get("state") == "Completed":
+            return thumbnail.get("imageUrl")
+    return None
+
+@timed_span("roblox")
+async def get_user_social_counts(user_id):
+    """
+    Get a user's friend, follower and following counts
+    
+    Args:
+        user_id (str): The Roblox user ID
+        
+    Returns:
+        dict: friends/followers/followings -> count, None for counts that failed
+    """
+    import asyncio
+    
+    kinds = ("friends", "followers", "followings")
+    responses = await asyncio.gather(*(
+        _get_json(f"https://friends.roblox.com/v1/users/{user_id}/{kind}/count") for kind in kinds
+    ))
+    return {kind: (data or {}).get("count") for kind, data in zip(kinds, responses)}
+
+@timed_span("roblox")
+async def get_user_badges(user_id, limit=RECENT_BADGE_LIMIT):
+    """
+    Get a user's most recently awarded badges
+    
+    Args:
+        user_id (str): The Roblox user ID
+        limit (int): Badges to return (10, 25, 50 or 100)
+        
+    Returns:
+        list: Badge dicts, None if the request failed (e.g. a private inventory)
+    """
+    data = await _get_json(
+        f"https://badges.roblox.com/v1/users/{user_id}/badges",
+        params={"limit": str(limit), "sortOrder": "Desc"}
+    )
+    return data.get("data", []) if data is not None else None
+
+@timed_span("roblox")
+async def get_group_members_page(session, group_id, cursor=None, limit=GROUP_PAGE_SIZE):
+    """
+    Get one page of a group's members and their roles
+    
+    Args:
+        session (aiohttp.ClientSession): Session to reuse across pages
+        group_id (str): The Roblox group ID
+        cursor (str, optional): Cursor from the previous page
+        limit (int): Page size
+        
+    Returns:
+        tuple: (list of member dicts, next page cursor or None)
+        
+    Raises:
+        aiohttp.ClientResponseError: The request failed, including 429s
+    """
+    params = {"limit": str(limit), "sortOrder": "Asc"}
+    if cursor:
+        params["cursor"] = cursor
+    
+    url = f"https://groups.roblox.com/v1/groups/{group_id}/users"
+    async with session.get(url, params=params) as response:
+        response.raise_for_status()
+        data = await response.json()
+        return data.get("data", []), data.get("nextPageCursor")
+
+async def iter_group_members(group_id, retries=3):
+    """
+    Stream every member of a group as (user_id, username, rank), following page cursors
+    
+    Args:
+        group_id (str): The Roblox group ID
+        retries (int): Attempts per page before giving up
+        
+    Yields:
+        tuple: (user_id, username, rank)
+    """
+    import asyncio
+    
+    headers = {}
+    if ROBLOX_COOKIE:
+        headers["Cookie"] = f".ROBLOSECURITY={ROBLOX_COOKIE}"
+    
+    timeout = aiohttp.ClientTimeout(total=ROBLOX_API_TIMEOUT)
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
+        cursor = None
+        pages = 0
+        while True:
+            for attempt in range(retries):
+                try:
+                    members, cursor = await get_group_members_page(session, group_id, cursor)
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == retries - 1:
+                        raise
+                    # Back off harder when Roblox rate limits us
+                    delay = 5 * (attempt + 1) if getattr(e, "status", None) == 429 else attempt + 1
+                    logger.warning(f"Group {group_id} page {pages + 1} failed ({e}), retrying in {delay}s")
+                    await asyncio.sleep(delay)
+            
+            pages += 1
+            for member in members:
+                user = member.get("user", {})
+                role = member.get("role", {})
+                yield int(user.get("userId", 0)), user.get("username"), int(role.get("rank", 0))
+            
+            if not cursor:
+                logger.info("Read %s pages of members for group %s", pages, group_id)
+                return
 
 async def check_user_in_group(user_id, group_id):
     """
@@ -417,20 +618,21 @@ async def check_user_in_group(user_id, group_id):
         bool: True if user is in group, False otherwise
     """
     try:
-        logger.info(f"Checking if user {user_id} is in group {group_id}")
+        logger.info("Checking if user %s is in group %s", user_id, group_id)
         groups = await get_user_groups(user_id)
         
-        for group_data in groups:
+        for group_data in groups or []:
             if str(group_data.get("group", {}).get("id", "")) == str(group_id):
-                logger.info(f"User {user_id} is in group {group_id}")
+                logger.info("User %s is in group %s", user_id, group_id)
                 return True
         
-        logger.info(f"User {user_id} is NOT in group {group_id}")
+        logger.info("User %s is NOT in group %s", user_id, group_id)
         return False
     except Exception as e:
         logger.error(f"Error checking user in group: {e}")
         return False
 
+@timed_span("roblox")
 async def join_group(group_id):
     """
     Join a Roblox group using the authenticated bot account
@@ -451,7 +653,7 @@ async def join_group(group_id):
         cookie_val = ROBLOX_COOKIE.strip()
         
         # Debug logging (without exposing the actual cookie)
-        logger.info(f"Using Roblox cookie of length {len(cookie_val)}")
+        logger.info("Using Roblox cookie of length %s", len(cookie_val))
         
         # API endpoint for joining a group
         url = f"https://groups.roblox.com/v1/groups/{group_id}/users"
@@ -465,7 +667,7 @@ async def join_group(group_id):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
         
-        logger.info(f"Attempting to join group {group_id}")
+        logger.info("Attempting to join group %s", group_id)
         
         # First make a request to get the X-CSRF-TOKEN
         async with aiohttp.ClientSession() as session:
@@ -473,7 +675,7 @@ async def join_group(group_id):
             auth_check_url = "https://users.roblox.com/v1/users/authenticated"
             async with session.get(auth_check_url, headers=headers) as auth_response:
                 auth_status = await auth_response.text()
-                logger.info(f"Authentication check response: {auth_status[:100]}")
+                logger.info("Authentication check response: %s", auth_status[:100])
                 
                 if auth_response.status != 200:
                     logger.error(f"Failed to authenticate with Roblox: Status {auth_response.status}")
@@ -485,7 +687,7 @@ async def join_group(group_id):
                 if response.status == 403:
                     csrf_token = response.headers.get("x-csrf-token")
                     if csrf_token:
-                        logger.info(f"Got CSRF token: {csrf_token[:5]}...")
+                        logger.info("Got CSRF token: %s...", csrf_token[:5])
                         headers["x-csrf-token"] = csrf_token
                     else:
                         logger.error("Failed to get CSRF token")
@@ -497,11 +699,11 @@ async def join_group(group_id):
             # Now make the actual join request with the CSRF token
             async with session.post(url, headers=headers, json={}) as response:
                 response_text = await response.text()
-                logger.info(f"Join group response status: {response.status}")
-                logger.info(f"Join group response: {response_text[:100]}")
+                logger.info("Join group response status: %s", response.status)
+                logger.info("Join group response: %s", response_text[:100])
                 
                 if response.status == 200:
-                    logger.info(f"Successfully joined group {group_id}")
+                    logger.info("Successfully joined group %s", group_id)
                     return True, "Successfully joined group"
                 else:
                     try:
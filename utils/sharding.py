@@ -0,0 +1,164 @@
+import os
+import time
+from collections import defaultdict, deque
+
+# Rolling window used for the per-shard event rate
+EVENT_RATE_WINDOW = 60  # seconds
+
+def parse_shard_ids(value):
+    """
+    Parse a shard range specification
+
+    Args:
+        value (str): Shard IDs such as "0-3", "0,2,4" or "0-1,4-5"
+
+    Returns:
+        list: Sorted shard IDs, None if the value is empty
+    """
+    if not value:
+        return None
+
+    shard_ids = set()
+    for part in value.replace(" ", "").split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            shard_ids.update(range(int(start), int(end) + 1))
+        else:
+            shard_ids.add(int(part))
+
+    return sorted(shard_ids)
+
+def split_shards(shard_count, cluster_count):
+    """
+    Split shards into contiguous ranges, one per cluster process
+
+    Args:
+        shard_count (int): Total number of shards
+        cluster_count (int): Number of processes to spread them over
+
+    Returns:
+        list: One list of shard IDs per cluster
+    """
+    cluster_count = max(1, min(cluster_count, shard_count))
+    base, extra = divmod(shard_count, cluster_count)
+
+    clusters = []
+    start = 0
+    for cluster_id in range(cluster_count):
+        size = base + (1 if cluster_id < extra else 0)
+        clusters.append(list(range(start, start + size)))
+        start += size
+    return clusters
+
+def format_shard_ids(shard_ids):
+    """Format shard IDs as a compact range string, the inverse of parse_shard_ids"""
+    if not shard_ids:
+        return ""
+    if shard_ids == list(range(shard_ids[0], shard_ids[-1] + 1)):
+        return f"{shard_ids[0]}-{shard_ids[-1]}"
+    return ",".join(str(shard_id) for shard_id in shard_ids)
+
+def get_shard_config():
+    """
+    Read the sharding configuration for this process from the environment
+
+    Returns:
+        tuple: (shard_count, shard_ids, cluster_id), shard_count is None when sharding is disabled
+    """
+    shard_count = os.getenv("SHARD_COUNT")
+    shard_count = int(shard_count) if shard_count and shard_count.isdigit() else None
+    shard_ids = parse_shard_ids(os.getenv("SHARD_IDS", ""))
+    cluster_id = int(os.getenv("CLUSTER_ID", "0"))
+    return shard_count, shard_ids, cluster_id
+
+class EventRateTracker:
+    """Counts gateway events per shard over a rolling window"""
+
+    def __init__(self, window=EVENT_RATE_WINDOW):
+        self.window = window
+        self.buckets = defaultdict(deque)  # shard_id -> deque of [second, count]
+        self.totals = defaultdict(int)
+
+    def record(self, shard_id):
+        """Record one event for a shard"""
+        now = int(time.monotonic())
+        buckets = self.buckets[shard_id]
+        if buckets and buckets[-1][0] == now:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([now, 1])
+            self._prune(buckets, now)
+        self.totals[shard_id] += 1
+
+    def _prune(self, buckets, now):
+        while buckets and buckets[0][0] <= now - self.window:
+            buckets.popleft()
+
+    def rate(self, shard_id):
+        """Events per minute for a shard over the rolling window"""
+        buckets = self.buckets.get(shard_id)
+        if not buckets:
+            return 0.0
+        self._prune(buckets, int(time.monotonic()))
+        return sum(count for _, count in buckets) * 60 / self.window
+
+def shard_for_event(args, shard_count):
+    """
+    Work out which shard an event belongs to from its first argument
+
+    Args:
+        args (tuple): The arguments the event was dispatched with
+        shard_count (int): Total number of shards
+
+    Returns:
+        int: The shard ID, 0 for events without a guild
+    """
+    if not args:
+        return 0
+
+    obj = args[0]
+    shard_id = getattr(obj, "shard_id", None)
+    if isinstance(shard_id, int):
+        return shard_id
+
+    guild = getattr(obj, "guild", None)
+    if guild is not None:
+        shard_id = getattr(guild, "shard_id", None)
+        if isinstance(shard_id, int):
+            return shard_id
+
+    guild_id = getattr(obj, "guild_id", None)
+    if isinstance(guild_id, int) and shard_count:
+        return (guild_id >> 22) % shard_count
+
+    return 0
+
+def shard_report(bot, tracker):
+    """
+    Build a per-shard latency and event-rate report
+
+    Args:
+        bot (commands.Bot): The running bot
+        tracker (EventRateTracker): The bot's event tracker
+
+    Returns:
+        list: One dict per shard with shard_id, latency_ms, guilds, events_per_minute and total_events
+    """
+    latencies = getattr(bot, "latencies", None) or [(0, bot.latency)]
+
+    guild_counts = defaultdict(int)
+    for guild in bot.guilds:
+        guild_counts[guild.shard_id] += 1
+
+    report = []
+    for shard_id, latency in latencies:
+        report.append({
+            "shard_id": shard_id,
+            "latency_ms": round(latency * 1000, 1) if latency == latency and latency != float("inf") else None,
+            "guilds": guild_counts.get(shard_id, 0),
+            "events_per_minute": round(tracker.rate(shard_id), 1),
+            "total_events": tracker.totals.get(shard_id, 0)
+        })
+    return report
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+
+import discord
+
+from database import with_db_session
+from models import TicketRole
+
+logger = logging.getLogger(__name__)
+
+# Discord allows 50 channels per category
+MAX_CATEGORY_CHANNELS = 50
+
+# Seconds a guild's staff roles are cached before the roles and ticket_roles are read again
+STAFF_ROLE_CACHE_SECONDS = int(os.getenv("STAFF_ROLE_CACHE_SECONDS", "300"))
+
+# Closed ticket channels wait here until they are deleted; it is never used for new tickets
+ARCHIVE_CATEGORY_NAME = "Closed Tickets"
+
+# Names the allocator gives overflow categories; only these are ever deleted
+OVERFLOW_CATEGORY_NAME = re.compile(r"Tickets \d+")
+
+# Roles with these words in their name can see every ticket
+STAFF_ROLE_KEYWORDS = ("admin", "mod", "staff", "support")
+
+@with_db_session
+def load_ticket_role_ids(guild_id):
+    return [role.role_id for role in TicketRole.query.filter_by(guild_id=str(guild_id)).all()]
+
+class StaffRoleCache:
+    """
+    The roles that can see tickets in each guild
+
+    Configured ticket roles come from the database and staff roles from a scan
+    of the guild's roles. Both are cached by ID for a few minutes, so opening a
+    ticket doesn't query the database or walk every role.
+    """
+
+    def __init__(self, ttl=STAFF_ROLE_CACHE_SECONDS):
+        self.ttl = ttl
+        self.entries = {}  # guild_id -> (expires_at, configured role IDs, staff role IDs)
+
+    def invalidate(self, guild_id):
+        self.entries.pop(guild_id, None)
+
+    async def get(self, guild):
+        """
+        Returns:
+            tuple: (configured ticket roles, every role that should see tickets)
+        """
+        entry = self.entries.get(guild.id)
+        if entry is None or entry[0] < time.monotonic():
+            loop = asyncio.get_running_loop()
+            configured_ids = []
+            for role_id in await loop.run_in_executor(None, load_ticket_role_ids, guild.id):
+                try:
+                    configured_ids.append(int(role_id))
+                except ValueError:
+                    continue
+            staff_ids = list(configured_ids)
+            for role in guild.roles:
+                if (
+                    role.permissions.administrator or
+                    role.permissions.manage_guild or
+                    any(name in role.name.lower() for name in STAFF_ROLE_KEYWORDS)
+                ) and role.id not in staff_ids:
+                    staff_ids.append(role.id)
+            entry = self.entries[guild.id] = (time.monotonic() + self.ttl, configured_ids, staff_ids)
+
+        _, configured_ids, staff_ids = entry
+        configured = [role for role in map(guild.get_role, configured_ids) if role is not None]
+        staff = [role for role in map(guild.get_role, staff_ids) if role is not None]
+        return configured, staff
+
+staff_role_cache = StaffRoleCache()
+
+def ticket_overwrites(guild, staff_roles, member=None):
+    """Overwrites that hide a ticket from everyone except the bot, staff and (optionally) the member"""
+    overwrites = {
+        guild.default_role: discord.PermissionOverwrite(read_messages=False),
+        guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_channels=True)
+    }
+    for role in staff_roles:
+        overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    if member is not None:
+        overwrites[member] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+    return overwrites
+
+class CategoryAllocator:
+    """
+    Picks a ticket category with room for another channel
+
+    Ticket categories are any whose name contains "ticket", apart from the
+    closed ticket category. When they are all full, an overflow category
+    ("Tickets 2", "Tickets 3", ...) is created with the ticket overwrites, and
+    overflow categories are deleted again once they are empty. Other ticket
+    categories, e.g. "Ticket Logs", are never deleted. Child counts come from
+    the cache plus channels still being created, and each guild allocates
+    under its own lock so concurrent tickets can't overfill a category.
+    """
+
+    def __init__(self):
+        self.categories = {}  # guild_id -> ticket category IDs, first is the original
+        self.pending = defaultdict(int)  # category_id -> channels being created in it
+        self.archives = {}  # guild_id -> closed ticket category ID
+        self.overflow = set()  # IDs of overflow categories created by this process
+        self.locks = defaultdict(asyncio.Lock)
+
+    def ticket_categories(self, guild):
+        category_ids = self.categories.get(guild.id)
+        if category_ids is not None:
+            categories = [guild.get_channel(category_id) for category_id in category_ids]
+            if all(isinstance(category, discord.CategoryChannel) for category in categories):
+                return categories
+        categories = sorted(
+            (
+                category for category in guild.categories
+                if "ticket" in category.name.lower() and category.name != ARCHIVE_CATEGORY_NAME
+            ),
+            key=lambda category: category.position
+        )
+        self.categories[guild.id] = [category.id for category in categories]
+        return categories
+
+    def child_count(self, category, ignore=None):
+        return sum(1 for channel in category.channels if channel.id != ignore) + self.pending[category.id]
+
+    async def reserve(self, guild, staff_roles):
+        """
+        Reserve a slot for a new ticket channel, call release() once the channel exists or creation failed
+
+        Returns:
+            discord.CategoryChannel: The category to create the channel in, None if the guild has no ticket category
+        """
+        async with self.locks[guild.id]:
+            categories = self.ticket_categories(guild)
+            if not categories:
+                return None
+            for category in categories:
+                if self.child_count(category) < MAX_CATEGORY_CHANNELS:
+                    self.pending[category.id] += 1
+                    return category
+
+            category = await guild.create_category(
+                f"Tickets {len(categories) + 1}",
+                overwrites=ticket_overwrites(guild, staff_roles),
+                position=categories[-1].position + 1,
+                reason="All ticket categories are full"
+            )
+            logger.info(f"Created overflow ticket category {category.name} in guild {guild.id}")
+            self.categories[guild.id].append(category.id)
+            self.overflow.add(category.id)
+            self.pending[category.id] += 1
+            return category
+
+    def release(self, category):
+        if category is not None and self.pending[category.id] > 0:
+            self.pending[category.id] -= 1
+
+    async def archive_category(self, guild, staff_roles):
+        """
+        The category closed tickets are moved to, created on first use
+
+        Returns:
+            discord.CategoryChannel: The category, None if it is full
+        """
+        async with self.locks[guild.id]:
+            category = guild.get_channel(self.archives.get(guild.id, 0))
+            if not isinstance(category, discord.CategoryChannel):
+                category = discord.utils.get(guild.categories, name=ARCHIVE_CATEGORY_NAME)
+                if category is None:
+                    category = await guild.create_category(
+                        ARCHIVE_CATEGORY_NAME,
+                        overwrites=ticket_overwrites(guild, staff_roles),
+                        reason="Category for closed tickets"
+                    )
+                self.archives[guild.id] = category.id
+            if self.child_count(category) >= MAX_CATEGORY_CHANNELS:
+                return None
+            return category
+
+    def is_overflow(self, category):
+        # Overflow categories created before a restart are recognised by their exact name
+        return category.id in self.overflow or OVERFLOW_CATEGORY_NAME.fullmatch(category.name) is not None
+
+    async def collapse(self, guild, deleted_channel_id=None):
+        """Delete empty overflow categories, e.g. after a ticket channel was deleted or moved out"""
+        async with self.locks[guild.id]:
+            categories = self.ticket_categories(guild)
+            for category in categories[1:]:
+                if self.is_overflow(category) and self.child_count(category, ignore=deleted_channel_id) == 0:
+                    try:
+                        await category.delete(reason="Empty overflow ticket category")
+                    except discord.NotFound:
+                        pass
+                    except discord.HTTPException as e:
+                        logger.error(f"Error deleting empty ticket category {category.id}: {e}")
+                        continue
+                    self.categories[guild.id].remove(category.id)
+                    self.overflow.discard(category.id)
+                    self.pending.pop(category.id, None)
+
+category_allocator = CategoryAllocator()
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import defaultdict, deque
+
+import discord
+
+from database import with_db_session
+from models import ServerConfig
+from utils.metrics import Counter, registry
+from utils.ticket_categories import category_allocator, ticket_overwrites
+from utils.work_queue import PRIORITY_LOW, WorkQueueFull, task_system
+
+logger = logging.getLogger(__name__)
+
+# Name of hidden channels waiting in the pool, so they are found again after a restart
+POOL_CHANNEL_NAME = "ticket-standby"
+
+# Bounds on how many standby channels each guild keeps
+TICKET_POOL_MIN = int(os.getenv("TICKET_POOL_MIN", "1"))
+TICKET_POOL_MAX = int(os.getenv("TICKET_POOL_MAX", "10"))
+
+# The pool holds enough channels for this many seconds of tickets at the rate seen over the last hour
+TICKET_POOL_HORIZON = int(os.getenv("TICKET_POOL_HORIZON", "900"))
+TICKET_POOL_RATE_WINDOW = 3600  # seconds
+
+# Seconds between sweeps that trim idle pools and drain guilds that left pool mode
+TICKET_POOL_SWEEP_INTERVAL = int(os.getenv("TICKET_POOL_SWEEP_INTERVAL", "300"))
+
+TICKET_POOL_CLAIMS = registry.register(Counter(
+    "ticket_pool_claims",
+    "Pool mode ticket opens by whether a standby channel was ready",
+    ["outcome"]
+))
+
+class TicketPool:
+    """
+    Pre-created, hidden ticket channels for guilds in pool mode
+
+    Opening a ticket claims a standby channel by renaming it and replacing its
+    overwrites in a single edit, instead of creating a channel. Refills run as
+    low priority jobs on the tickets queue, one channel per job, so they never
+    hold up tickets being opened. The pool grows and shrinks with the number
+    of tickets opened recently, between TICKET_POOL_MIN and TICKET_POOL_MAX.
+    A periodic sweep applies that even when no tickets are being opened, and
+    deletes the standby channels of guilds that are no longer in pool mode.
+    """
+
+    def __init__(self):
+        self.channels = {}  # guild_id -> standby channel IDs
+        self.claims = defaultdict(deque)  # guild_id -> monotonic times of recent claims
+        self.refilling = set()  # guilds with a refill job queued
+        self.draining = set()  # guilds whose standby channels are deleted, they left pool mode
+
+    def standby(self, guild):
+        channel_ids = self.channels.get(guild.id)
+        if channel_ids is None:
+            # Standby channels left by an earlier run are picked up on first use
+            channel_ids = self.channels[guild.id] = deque(
+                channel.id for channel in guild.text_channels if channel.name == POOL_CHANNEL_NAME
+            )
+        return channel_ids
+
+    def target(self, guild_id):
+        """Standby channels the guild should have, from the recent ticket rate"""
+        if guild_id in self.draining:
+            return 0
+        claims = self.claims[guild_id]
+        cutoff = time.monotonic() - TICKET_POOL_RATE_WINDOW
+        while claims and claims[0] < cutoff:
+            claims.popleft()
+        expected = math.ceil(len(claims) * TICKET_POOL_HORIZON / TICKET_POOL_RATE_WINDOW)
+        return max(TICKET_POOL_MIN, min(TICKET_POOL_MAX, expected))
+
+    async def claim(self, guild, name, topic, overwrites):
+        """
+        Turn a standby channel into a ticket with one channel edit
+
+        Returns:
+            discord.TextChannel: The ticket channel, None if the pool was empty
+        """
+        self.claims[guild.id].append(time.monotonic())
+        self.draining.discard(guild.id)
+        channel_ids = self.standby(guild)
+        channel = None
+        while channel_ids and channel is None:
+            channel = guild.get_channel(channel_ids.popleft())
+            if not isinstance(channel, discord.TextChannel):
+                channel = None
+        self.refill(guild)
+
+        if channel is None:
+            TICKET_POOL_CLAIMS.inc("miss")
+            return None
+        try:
+            await channel.edit(name=name, topic=topic, overwrites=overwrites, reason="Claimed for a support ticket")
+        except discord.NotFound:
+            TICKET_POOL_CLAIMS.inc("miss")
+            return None
+        except discord.HTTPException:
+            # The channel is still hidden, leave it for the next ticket
+            channel_ids.appendleft(channel.id)
+            raise
+        TICKET_POOL_CLAIMS.inc("hit")
+        return channel
+
+    def refill(self, guild):
+        """Queue a job that moves the pool one channel towards its target size"""
+        if guild.id in self.refilling:
+            return
+        self.refilling.add(guild.id)
+        try:
+            task_system.enqueue(
+                "tickets",
+                self.refill_one,
+                guild,
+                priority=PRIORITY_LOW,
+                max_retries=0,
+                name="ticket_pool_refill"
+            )
+        except WorkQueueFull:
+            self.refilling.discard(guild.id)
+
+    async def refill_one(self, guild):
+        channel_ids = self.standby(guild)
+        target = self.target(guild.id)
+        try:
+            if len(channel_ids) < target:
+                category = await category_allocator.reserve(guild, [])
+                try:
+                    channel = await guild.create_text_channel(
+                        name=POOL_CHANNEL_NAME,
+                        overwrites=ticket_overwrites(guild, []),
+                        category=category,
+                        reason="Standby ticket channel"
+                    )
+                finally:
+                    category_allocator.release(category)
+                channel_ids.append(channel.id)
+            elif len(channel_ids) > target:
+                channel = guild.get_channel(channel_ids.pop())
+                if channel is not None:
+                    await channel.delete(reason="Fewer standby ticket channels needed")
+                    await category_allocator.collapse(guild, channel.id)
+            else:
+                return
+        except Exception as e:
+            logger.error(f"Error refilling the ticket pool for guild {guild.id}: {e}")
+            return
+        finally:
+            self.refilling.discard(guild.id)
+        if len(channel_ids) != target:
+            self.refill(guild)
+
+    def sweep(self, guilds, pool_guild_ids):
+        """Queue refills for every guild whose pool is off target, draining those not in pool mode"""
+        for guild in guilds:
+            if guild.id in pool_guild_ids:
+                self.draining.discard(guild.id)
+            elif self.standby(guild):
+                self.draining.add(guild.id)
+            else:
+                continue
+            if len(self.standby(guild)) != self.target(guild.id):
+                self.refill(guild)
+
+@with_db_session
+def load_pool_guild_ids():
+    rows = ServerConfig.query.with_entities(ServerConfig.guild_id).filter_by(ticket_mode="pool")
+    return {int(guild_id) for guild_id, in rows}
+
+ticket_pool = TicketPool()
+
+async def keep_ticket_pools_reconciled(bot, interval=TICKET_POOL_SWEEP_INTERVAL):
+    """Background task that moves every guild's pool towards its target periodically"""
+    await bot.wait_until_ready()
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            pool_guild_ids = await loop.run_in_executor(None, load_pool_guild_ids)
+            ticket_pool.sweep(bot.guilds, pool_guild_ids)
+        except Exception as e:
+            logger.error(f"Failed to sweep the ticket pools: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,242 @@
+import asyncio
+import bisect
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import db, with_db_session
+from models import Ticket, TicketCloseTimeBucket, TicketDailyStats, TicketOpenCount
+from utils.delayed_jobs import delayed_jobs
+
+logger = logging.getLogger(__name__)
+
+# Delayed job kind that rebuilds the rollups from the tickets table
+BACKFILL_TICKET_STATS_JOB = "backfill_ticket_stats"
+
+# Upper bounds in seconds of the time-to-close buckets the median is estimated from
+CLOSE_TIME_BUCKETS = (
+    300, 900, 1800, 3600, 7200, 14400, 28800, 43200,
+    86400, 172800, 345600, 604800, 1209600, 2592000
+)
+OVERFLOW_BUCKET = 0
+
+# Longest period /ticket-stats reports on
+MAX_STATS_DAYS = 90
+
+# Rows inserted per statement by the backfill
+BACKFILL_BATCH_SIZE = 500
+
+def close_time_bucket(seconds):
+    index = bisect.bisect_left(CLOSE_TIME_BUCKETS, seconds)
+    return CLOSE_TIME_BUCKETS[index] if index < len(CLOSE_TIME_BUCKETS) else OVERFLOW_BUCKET
+
+def increment(model, keys, amounts):
+    """
+    Add to counters in the row identified by `keys`, creating it if needed
+
+    PostgreSQL and SQLite do this in one atomic INSERT ... ON CONFLICT DO
+    UPDATE. Other databases update and insert when nothing was updated.
+    """
+    table = model.__table__
+    dialect = db.engine.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).values(**keys, **amounts).on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + amount for column, amount in amounts.items()}
+        )
+        db.session.execute(statement)
+        return
+    updated = db.session.execute(
+        update(table)
+        .where(*(table.c[column] == value for column, value in keys.items()))
+        .values({column: table.c[column] + amount for column, amount in amounts.items()})
+    ).rowcount
+    if not updated:
+        db.session.execute(insert(table).values(**keys, **amounts))
+
+@with_db_session
+def record_ticket_opened(guild_id, opened_at):
+    try:
+        increment(TicketDailyStats, {"guild_id": str(guild_id), "day": opened_at.date()}, {"opened": 1})
+        increment(TicketOpenCount, {"guild_id": str(guild_id)}, {"open_tickets": 1})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording opened ticket in stats for guild {guild_id}: {e}")
+
+@with_db_session
+def record_ticket_closed(guild_id, opened_at, closed_at):
+    try:
+        day = closed_at.date()
+        seconds = max(0, int((closed_at - opened_at).total_seconds())) if opened_at else 0
+        increment(TicketDailyStats, {"guild_id": str(guild_id), "day": day}, {"closed": 1, "close_seconds": seconds})
+        increment(
+            TicketCloseTimeBucket,
+            {"guild_id": str(guild_id), "day": day, "bucket": close_time_bucket(seconds)},
+            {"count": 1}
+        )
+        increment(TicketOpenCount, {"guild_id": str(guild_id)}, {"open_tickets": -1})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording closed ticket in stats for guild {guild_id}: {e}")
+
+@with_db_session
+def record_ticket_reopened(guild_id, reopened_at):
+    try:
+        increment(TicketDailyStats, {"guild_id": str(guild_id), "day": reopened_at.date()}, {"reopened": 1})
+        increment(TicketOpenCount, {"guild_id": str(guild_id)}, {"open_tickets": 1})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording reopened ticket in stats for guild {guild_id}: {e}")
+
+def estimate_median(bucket_counts):
+    """Median time to close from bucket counts, interpolated within the bucket it falls in"""
+    total = sum(bucket_counts.values())
+    if not total:
+        return None
+    target = total / 2
+    seen = 0
+    lower = 0
+    for upper in CLOSE_TIME_BUCKETS:
+        count = bucket_counts.get(upper, 0)
+        if count and seen + count >= target:
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+        lower = upper
+    # Over half took longer than the last bound
+    return CLOSE_TIME_BUCKETS[-1]
+
+@with_db_session
+def get_ticket_stats(guild_id, days=30):
+    """
+    Ticket statistics for a guild from the rollup tables
+
+    Reads one row per day of the period plus the open count, so the cost
+    doesn't grow with the size of the tickets table.
+
+    Args:
+        guild_id (str): The guild
+        days (int): Number of days up to and including today (UTC)
+
+    Returns:
+        dict: open_tickets, opened, closed, reopened, tickets_per_day,
+        average_close_seconds and median_close_seconds (None without closes),
+        and per_day as a list of (date, opened, closed)
+    """
+    days = max(1, min(days, MAX_STATS_DAYS))
+    first_day = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    open_count = db.session.get(TicketOpenCount, str(guild_id))
+    rows = TicketDailyStats.query.filter(
+        TicketDailyStats.guild_id == str(guild_id),
+        TicketDailyStats.day >= first_day
+    ).order_by(TicketDailyStats.day).all()
+    buckets = defaultdict(int)
+    for bucket, count in TicketCloseTimeBucket.query.with_entities(
+        TicketCloseTimeBucket.bucket, TicketCloseTimeBucket.count
+    ).filter(
+        TicketCloseTimeBucket.guild_id == str(guild_id),
+        TicketCloseTimeBucket.day >= first_day
+    ):
+        buckets[bucket] += count
+
+    opened = sum(row.opened for row in rows)
+    closed = sum(row.closed for row in rows)
+    close_seconds = sum(row.close_seconds for row in rows)
+    return {
+        "days": days,
+        "open_tickets": max(0, open_count.open_tickets) if open_count else 0,
+        "opened": opened,
+        "closed": closed,
+        "reopened": sum(row.reopened for row in rows),
+        "tickets_per_day": opened / days,
+        "average_close_seconds": close_seconds / closed if closed else None,
+        "median_close_seconds": estimate_median(buckets),
+        "per_day": [(row.day, row.opened, row.closed) for row in rows]
+    }
+
+@with_db_session
+def rebuild_ticket_stats(guild_id=None):
+    """
+    Recompute the rollups from the tickets table, for one guild or all of them
+
+    Tickets are streamed in batches and aggregated in memory per guild and
+    day, then the rollup rows are replaced in one transaction. Reopens aren't
+    recorded on tickets, so rebuilt days count them as zero.
+
+    Returns:
+        int: Tickets read
+    """
+    daily = defaultdict(lambda: [0, 0, 0])  # (guild, day) -> [opened, closed, close_seconds]
+    buckets = defaultdict(int)  # (guild, day, bucket) -> count
+    open_counts = defaultdict(int)
+    read = 0
+
+    query = Ticket.query.with_entities(Ticket.guild_id, Ticket.status, Ticket.created_at, Ticket.closed_at)
+    if guild_id is not None:
+        query = query.filter(Ticket.guild_id == str(guild_id))
+    for ticket_guild, status, created_at, closed_at in query.yield_per(BACKFILL_BATCH_SIZE):
+        read += 1
+        if created_at:
+            daily[(ticket_guild, created_at.date())][0] += 1
+        if status == "open":
+            open_counts[ticket_guild] += 1
+        elif closed_at:
+            seconds = max(0, int((closed_at - created_at).total_seconds())) if created_at else 0
+            day = daily[(ticket_guild, closed_at.date())]
+            day[1] += 1
+            day[2] += seconds
+            buckets[(ticket_guild, closed_at.date(), close_time_bucket(seconds))] += 1
+        open_counts.setdefault(ticket_guild, 0)
+
+    for model in (TicketDailyStats, TicketCloseTimeBucket, TicketOpenCount):
+        query = model.query
+        if guild_id is not None:
+            query = query.filter(model.guild_id == str(guild_id))
+        query.delete(synchronize_session=False)
+
+    def insert_rows(model, rows):
+        for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+            db.session.execute(insert(model), rows[start:start + BACKFILL_BATCH_SIZE])
+
+    insert_rows(TicketDailyStats, [
+        {"guild_id": key[0], "day": key[1], "opened": values[0], "closed": values[1], "close_seconds": values[2]}
+        for key, values in daily.items()
+    ])
+    insert_rows(TicketCloseTimeBucket, [
+        {"guild_id": key[0], "day": key[1], "bucket": key[2], "count": count}
+        for key, count in buckets.items()
+    ])
+    insert_rows(TicketOpenCount, [
+        {"guild_id": key, "open_tickets": count} for key, count in open_counts.items()
+    ])
+    db.session.commit()
+    logger.info(f"Rebuilt ticket stats from {read} tickets" + (f" for guild {guild_id}" if guild_id else ""))
+    return read
+
+@with_db_session
+def stats_need_backfill():
+    """Tickets exist but the rollups have never been filled, e.g. right after the tables were added"""
+    return Ticket.query.first() is not None and TicketOpenCount.query.first() is None
+
+@delayed_jobs.handler(BACKFILL_TICKET_STATS_JOB)
+async def backfill_ticket_stats(bot, payload):
+    """Delayed job that rebuilds the ticket rollups from historical rows"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, rebuild_ticket_stats, payload.get("guild_id"))
+
+async def schedule_stats_backfill():
+    """Queue a backfill at startup when the rollups are empty; the job runs once for the whole cluster"""
+    loop = asyncio.get_running_loop()
+    try:
+        if await loop.run_in_executor(None, stats_need_backfill):
+            await delayed_jobs.schedule(BACKFILL_TICKET_STATS_JOB, 0, {}, key="all", replace=True)
+            logger.info("Scheduled a backfill of the ticket stats rollups")
+    except Exception as e:
+        logger.error(f"Failed to check whether ticket stats need a backfill: {e}")
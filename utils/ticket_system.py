@@ -2,29 +2,108 @@ import discord
 import logging
 from datetime import datetime
 import asyncio
+import contextlib
+import time
 
-from app import db, with_app_context
-from models import Ticket
+from sqlalchemy.exc import IntegrityError
+
+from database import db, with_db_session
+from models import ServerConfig, Ticket
 from utils.embed_builder import create_embed
+from utils.admission import BUSY_MESSAGE, Cooldown
+from utils.instrumentation import InstrumentedView
+from utils.work_queue import PRIORITY_HIGH, WorkQueueFull, task_system
+from utils.rest_budget import channel_edit_bucket, followup_bucket, run_bulk, thread_member_bucket
+from utils.delayed_jobs import delayed_jobs
+from utils.transcripts import export_transcript, transcript_url
+from utils.transcript_search import index_ticket_transcript
+from utils.ticket_categories import ARCHIVE_CATEGORY_NAME, category_allocator, staff_role_cache, ticket_overwrites
+from utils.ticket_pool import ticket_pool
+from utils.ticket_stats import record_ticket_closed, record_ticket_opened, record_ticket_reopened
+from utils.metrics import Histogram, registry
 
 logger = logging.getLogger(__name__)
 
-class TicketView(discord.ui.View):
+# Delayed job kind that deletes a closed ticket's channel
+DELETE_TICKET_JOB = "delete_ticket_channel"
+
+# Seconds between closing a ticket and deleting its channel
+TICKET_DELETE_DELAY = 300
+
+# Members of roles the bot can't mention that are added to a thread ticket one by one
+THREAD_STAFF_ADD_LIMIT = 50
+
+# (guild ID, user ID) -> [lock, holders and waiters] while a ticket is being opened for that user
+opening_locks = {}
+
+# (guild ID, user ID) -> channel ID of their open ticket, so repeat clicks don't touch the database
+open_ticket_channels = {}
+
+TICKET_OPEN_SECONDS = registry.register(Histogram(
+    "ticket_open_seconds",
+    "Time from picking up a ticket request until the user can see their ticket",
+    ["mode"]
+))
+TICKET_OVERWRITE_SECONDS = registry.register(Histogram(
+    "ticket_overwrite_edit_seconds",
+    "Time to apply a ticket's overwrites and category when it is closed or reopened",
+    ["action"]
+))
+
+class TicketView(InstrumentedView):
+    # Loose enough that clicks while the first one is still opening reach the lock and get the ticket back
+    cooldowns = {"create_ticket": Cooldown(3, 30)}
+
     def __init__(self, bot):
         super().__init__(timeout=None)
         self.bot = bot
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        # Runs before admission, so a member who already has a ticket is pointed to it instead of hitting the cooldown
+        if interaction.data.get("custom_id") == "create_ticket" and interaction.guild is not None:
+            channel = known_open_ticket(interaction.guild, interaction.user.id)
+            if channel is not None:
+                await interaction.response.send_message(f"You already have an open ticket: {channel.mention}", ephemeral=True)
+                return False
+        return True
 
     @discord.ui.button(label="Create Ticket", custom_id="create_ticket", style=discord.ButtonStyle.green, emoji="🎫")
     async def create_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Button to create a support ticket"""
-        await interaction.response.defer(ephemeral=True)
+        # Think ephemerally so the background job can edit this response with the result
+        await interaction.response.defer(ephemeral=True, thinking=True)
         
         try:
-            # Import app context function
-            from app import with_app_context
+            task_system.enqueue_for_interaction(
+                interaction,
+                "tickets",
+                self.open_ticket,
+                interaction,
+                priority=PRIORITY_HIGH,
+                max_retries=0,
+                error_message="An error occurred while creating your ticket. Please try again later."
+            )
+        except WorkQueueFull:
+            await interaction.edit_original_response(content=BUSY_MESSAGE)
+    
+    async def open_ticket(self, interaction: discord.Interaction):
+        """Open a ticket unless the user already has one, returns the message shown to the user"""
+        # Clicks from the same user wait here, then find the ticket the first click opened
+        async with opening_lock(interaction.guild.id, interaction.user.id):
+            channel = known_open_ticket(interaction.guild, interaction.user.id)
+            if channel is not None:
+                return f"You already have an open ticket: {channel.mention}"
+            return await self.create_ticket_channel(interaction)
+    
+    async def create_ticket_channel(self, interaction: discord.Interaction):
+        """Create the ticket channel and record, returns the message shown to the user"""
+        try:
+            start = time.perf_counter()
+            # Import database session helper
+            from database import with_db_session
             
             # Check if the user already has an open ticket
-            @with_app_context
+            @with_db_session
             def check_existing_ticket():
                 try:
                     from models import Ticket
@@ -39,7 +118,7 @@ class TicketView(discord.ui.View):
                     return None
             
             # Update ticket status if channel was deleted
-            @with_app_context
+            @with_db_session
             def close_existing_ticket(ticket_id):
                 try:
                     from models import Ticket
@@ -48,84 +127,15 @@ class TicketView(discord.ui.View):
                         existing_ticket.status = "closed"
                         existing_ticket.closed_at = datetime.utcnow()
                         db.session.commit()
+                        record_ticket_closed(existing_ticket.guild_id, existing_ticket.created_at, existing_ticket.closed_at)
                         logger.info(f"Closed ticket {ticket_id} because channel was deleted")
                     return True
                 except Exception as e:
                     logger.error(f"Error closing existing ticket: {e}")
                     return False
             
-            # Check for existing open ticket
-            existing_ticket = check_existing_ticket()
-            if existing_ticket:
-                # Try to get the channel
-                channel = interaction.guild.get_channel(int(existing_ticket.channel_id))
-                
-                if channel:
-                    return await interaction.followup.send(
-                        f"You already have an open ticket: {channel.mention}",
-                        ephemeral=True
-                    )
-                else:
-                    # Channel was deleted, update the ticket status
-                    close_existing_ticket(existing_ticket.id)
-            
-            # Create a new ticket channel
-            overwrites = {
-                interaction.guild.default_role: discord.PermissionOverwrite(read_messages=False),
-                interaction.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, manage_channels=True),
-                interaction.user: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            }
-            
-            # Add configured ticket roles and admin roles to the channel overwrites
-            @with_app_context
-            def get_ticket_roles():
-                try:
-                    from models import TicketRole
-                    ticket_roles = TicketRole.query.filter_by(guild_id=str(interaction.guild.id)).all()
-                    return ticket_roles
-                except Exception as e:
-                    logger.error(f"Error getting ticket roles: {e}")
-                    return []
-            
-            # Get configured ticket roles
-            ticket_roles = get_ticket_roles()
-            ticket_role_ids = [role.role_id for role in ticket_roles]
-            
-            try:
-                # First add explicitly configured roles
-                for role_id in ticket_role_ids:
-                    try:
-                        role = interaction.guild.get_role(int(role_id))
-                        if role:
-                            overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-                    except ValueError:
-                        continue
-                
-                # Then add admin/mod roles as fallback
-                for role in interaction.guild.roles:
-                    # Check for admin or moderator roles by name or permissions
-                    if (
-                        role.permissions.administrator or
-                        role.permissions.manage_guild or
-                        any(name in role.name.lower() for name in ["admin", "mod", "staff", "support"])
-                    ):
-                        overwrites[role] = discord.PermissionOverwrite(read_messages=True, send_messages=True)
-            except Exception as e:
-                logger.error(f"Error adding roles to ticket channel overwrites: {e}")
-            
-            # Create the channel in a ticket category if it exists, otherwise in the guild
-            category = None
-            try:
-                # Look for a category with "ticket" in the name
-                for cat in interaction.guild.categories:
-                    if "ticket" in cat.name.lower():
-                        category = cat
-                        break
-            except Exception as e:
-                logger.error(f"Error finding ticket category: {e}")
-            
             # Get the latest ticket number
-            @with_app_context
+            @with_db_session
             def get_latest_ticket_number():
                 try:
                     from models import Ticket
@@ -140,32 +150,78 @@ class TicketView(discord.ui.View):
                     logger.error(f"Error getting latest ticket number: {e}")
                     return 1
             
-            # Get the ticket number
-            ticket_number = get_latest_ticket_number()
+            # Read everything the ticket needs at once, off the event loop
+            loop = asyncio.get_running_loop()
+            existing_ticket, ticket_number, mode = await asyncio.gather(
+                loop.run_in_executor(None, check_existing_ticket),
+                loop.run_in_executor(None, get_latest_ticket_number),
+                loop.run_in_executor(None, get_ticket_mode, interaction.guild.id)
+            )
             
-            # Create the ticket channel
-            channel_name = f"ticket-{interaction.user.name}-{ticket_number}"
+            # Check for existing open ticket
+            if existing_ticket:
+                # Try to get the channel, or the thread in thread mode
+                channel = interaction.guild.get_channel_or_thread(int(existing_ticket.channel_id))
+                
+                if channel:
+                    remember_open_ticket(interaction.guild.id, interaction.user.id, channel.id)
+                    return f"You already have an open ticket: {channel.mention}"
+                else:
+                    # Channel was deleted, update the ticket status
+                    await loop.run_in_executor(None, close_existing_ticket, existing_ticket.id)
+                    forget_open_ticket(interaction.guild.id, interaction.user.id)
+            
+            # Staff roles are cached per guild, so this doesn't query ticket_roles or walk guild.roles each time
             try:
-                ticket_channel = await interaction.guild.create_text_channel(
-                    name=channel_name,
-                    overwrites=overwrites,
-                    category=category,
-                    topic=f"Support ticket for {interaction.user.name} ({interaction.user.id})"
-                )
-            except discord.Forbidden:
-                return await interaction.followup.send(
-                    "I don't have permission to create channels. Please contact an administrator.",
-                    ephemeral=True
-                )
+                staff_roles, visible_roles = await staff_role_cache.get(interaction.guild)
             except Exception as e:
-                logger.error(f"Error creating ticket channel: {e}")
-                return await interaction.followup.send(
-                    "An error occurred while creating your ticket. Please try again later.",
-                    ephemeral=True
-                )
+                logger.error(f"Error getting ticket roles: {e}")
+                staff_roles, visible_roles = [], []
+            overwrites = ticket_overwrites(interaction.guild, visible_roles, interaction.user)
+            
+            # Create the ticket channel
+            channel_name = f"ticket-{interaction.user.name}-{ticket_number}"
+            topic = f"Support ticket for {interaction.user.name} ({interaction.user.id})"
+            ticket_channel = None
+            if mode == "thread":
+                try:
+                    ticket_channel = await create_ticket_thread(interaction, channel_name)
+                except discord.Forbidden:
+                    return "I don't have permission to create private threads here. Please contact an administrator."
+                except Exception as e:
+                    logger.error(f"Error creating ticket thread: {e}")
+                    return "An error occurred while creating your ticket. Please try again later."
+            elif mode == "pool":
+                # Claiming a standby channel is a single edit, creation is only the fallback for an empty pool
+                try:
+                    ticket_channel = await ticket_pool.claim(interaction.guild, channel_name, topic, overwrites)
+                except Exception as e:
+                    logger.error(f"Error claiming a pooled ticket channel: {e}")
+            
+            if ticket_channel is None:
+                # A ticket category with room, an overflow category is created when they're all full
+                category = None
+                try:
+                    category = await category_allocator.reserve(interaction.guild, visible_roles)
+                except Exception as e:
+                    logger.error(f"Error finding ticket category: {e}")
+                try:
+                    ticket_channel = await interaction.guild.create_text_channel(
+                        name=channel_name,
+                        overwrites=overwrites,
+                        category=category,
+                        topic=topic
+                    )
+                except discord.Forbidden:
+                    return "I don't have permission to create channels. Please contact an administrator."
+                except Exception as e:
+                    logger.error(f"Error creating ticket channel: {e}")
+                    return "An error occurred while creating your ticket. Please try again later."
+                finally:
+                    category_allocator.release(category)
             
             # Create and save the ticket in the database
-            @with_app_context
+            @with_db_session
             def create_ticket_in_db():
                 try:
                     from models import Ticket
@@ -179,50 +235,93 @@ class TicketView(discord.ui.View):
                     
                     db.session.add(new_ticket)
                     db.session.commit()
+                    record_ticket_opened(new_ticket.guild_id, new_ticket.created_at)
                     logger.info(f"Created new ticket in database for channel: {ticket_channel.id}")
                     return True
+                except IntegrityError:
+                    # The unique index on open tickets: another ticket for this user got in first
+                    db.session.rollback()
+                    return None
                 except Exception as e:
                     logger.error(f"Error creating ticket in database: {e}")
                     return False
             
             # Save the ticket
-            create_ticket_in_db()
-            
-            # Create close ticket button
-            close_view = CloseTicketView(self.bot)
-            
-            # Send initial message in the ticket channel
-            embed = create_embed(
-                title="Support Ticket",
-                description=f"Ticket created by {interaction.user.mention}",
-                color=discord.Color.green()
-            )
-            
-            embed.add_field(
-                name="Instructions",
-                value="Please describe your issue and a staff member will assist you soon.",
-                inline=False
-            )
-            
-            await ticket_channel.send(embed=embed, view=close_view)
-            
-            # Ping the user in the channel
-            await ticket_channel.send(f"{interaction.user.mention}")
-            
-            # Send confirmation to the user
-            await interaction.followup.send(
-                f"Your ticket has been created: {ticket_channel.mention}",
-                ephemeral=True
-            )
+            saved = await loop.run_in_executor(None, create_ticket_in_db)
+            if saved is None:
+                logger.warning(f"Discarding duplicate ticket channel {ticket_channel.id} for user {interaction.user.id}")
+                try:
+                    await ticket_channel.delete(reason="Duplicate ticket")
+                except discord.HTTPException:
+                    pass
+                existing_ticket = await loop.run_in_executor(None, check_existing_ticket)
+                channel = existing_ticket and interaction.guild.get_channel_or_thread(int(existing_ticket.channel_id))
+                if channel:
+                    remember_open_ticket(interaction.guild.id, interaction.user.id, channel.id)
+                    return f"You already have an open ticket: {channel.mention}"
+                return "You already have an open ticket."
+            if saved:
+                remember_open_ticket(interaction.guild.id, interaction.user.id, ticket_channel.id)
+            
+            if mode == "pool":
+                # The user can see their ticket already, post the welcome afterwards
+                try:
+                    task_system.enqueue(
+                        "tickets",
+                        self.send_welcome,
+                        ticket_channel,
+                        interaction.user,
+                        visible_roles,
+                        name="ticket_welcome"
+                    )
+                except WorkQueueFull:
+                    await self.send_welcome(ticket_channel, interaction.user, visible_roles)
+            else:
+                await self.send_welcome(ticket_channel, interaction.user, visible_roles)
+            
+            TICKET_OPEN_SECONDS.observe(mode, value=time.perf_counter() - start)
+            # Confirmation shown to the user
+            return f"Your ticket has been created: {ticket_channel.mention}"
         
         except Exception as e:
             logger.error(f"Error in create_ticket button: {e}")
-            await interaction.followup.send(
-                "An error occurred while creating your ticket. Please try again later.",
-                ephemeral=True
+            return "An error occurred while creating your ticket. Please try again later."
+    
+    async def send_welcome(self, ticket_channel, user, visible_roles):
+        """Post the instructions and close button in a new ticket, ping the opener and add staff to thread tickets"""
+        # Create close ticket button
+        close_view = CloseTicketView(self.bot)
+        
+        # Send initial message in the ticket channel
+        embed = create_embed(
+            title="Support Ticket",
+            description=f"Ticket created by {user.mention}",
+            color=discord.Color.green()
+        )
+        
+        embed.add_field(
+            name="Instructions",
+            value="Please describe your issue and a staff member will assist you soon.",
+            inline=False
+        )
+        
+        await ticket_channel.send(embed=embed, view=close_view)
+        
+        # Ping the user in the channel
+        if isinstance(ticket_channel, discord.Thread):
+            mentionable, unmentionable = split_mentionable_roles(ticket_channel, thread_staff_roles(visible_roles))
+            # Mentioning a role adds all of its members to the private thread with one message
+            await ticket_channel.send(
+                " ".join([user.mention] + [role.mention for role in mentionable]),
+                allowed_mentions=discord.AllowedMentions(users=[user], roles=mentionable)
             )
+            await add_thread_members(ticket_channel, unmentionable)
+        else:
+            await ticket_channel.send(f"{user.mention}")
+
+class CloseTicketView(InstrumentedView):
+    cooldowns = {"close_ticket": Cooldown(2, 10)}
 
-class CloseTicketView(discord.ui.View):
     def __init__(self, bot):
         super().__init__(timeout=None)
         self.bot = bot
@@ -233,11 +332,11 @@ class CloseTicketView(discord.ui.View):
         await interaction.response.defer()
         
         try:
-            # Import app context function
-            from app import with_app_context
+            # Import database session helper
+            from database import with_db_session
             
             # Find and update the ticket
-            @with_app_context
+            @with_db_session
             def close_ticket_in_db():
                 try:
                     from models import Ticket
@@ -253,18 +352,21 @@ class CloseTicketView(discord.ui.View):
                     ticket.status = "closed"
                     ticket.closed_at = datetime.utcnow()
                     db.session.commit()
+                    record_ticket_closed(ticket.guild_id, ticket.created_at, ticket.closed_at)
                     logger.info(f"Closed ticket in database for channel: {interaction.channel.id}")
                     return ticket
                 except Exception as e:
                     logger.error(f"Error closing ticket in database: {e}")
                     return None
             
-            # Close the ticket
-            ticket = close_ticket_in_db()
+            # Close the ticket, off the event loop since it also updates the stats rollups
+            loop = asyncio.get_running_loop()
+            ticket = await loop.run_in_executor(None, close_ticket_in_db)
             if not ticket:
                 return await interaction.followup.send(
                     "This ticket is already closed or does not exist in the database."
                 )
+            forget_open_ticket(interaction.guild.id, ticket.user_id)
             
             # Send closure message
             embed = create_embed(
@@ -273,53 +375,63 @@ class CloseTicketView(discord.ui.View):
                 color=discord.Color.red()
             )
             
-            await interaction.followup.send(embed=embed)
-            
-            # Disable ticket for the user
-            user = interaction.guild.get_member(int(ticket.user_id))
-            if user:
+            # Thread tickets are kept: save the transcript, then lock and archive the thread
+            if isinstance(interaction.channel, discord.Thread):
+                await interaction.followup.send(embed=embed)
                 try:
-                    await interaction.channel.set_permissions(user, read_messages=True, send_messages=False)
+                    await archive_ticket(self.bot, interaction.channel, ticket)
                 except Exception as e:
-                    logger.error(f"Error updating permissions for user in closed ticket: {e}")
+                    logger.error(f"Error exporting transcript for ticket {ticket.id}: {e}")
+                await interaction.channel.edit(archived=True, locked=True, reason=f"Ticket closed by {interaction.user}")
+                return
+            
+            # Lock the ticket for its members and move it to the closed category in one edit
+            category = None
+            try:
+                _, visible_roles = await staff_role_cache.get(interaction.guild)
+                category = await category_allocator.archive_category(interaction.guild, visible_roles)
+            except Exception as e:
+                logger.error(f"Error finding the closed ticket category: {e}")
+            
+            # Post the closure message and apply the edit together, they use different rate limit buckets
+            results = await run_bulk([
+                (followup_bucket(interaction), lambda: interaction.followup.send(embed=embed)),
+                (
+                    channel_edit_bucket(interaction.channel),
+                    lambda: apply_ticket_overwrites(
+                        interaction.channel,
+                        "close",
+                        ticket.user_id,
+                        can_send=False,
+                        category=category,
+                        reason=f"Ticket closed by {interaction.user}"
+                    )
+                )
+            ])
+            if isinstance(results[0], Exception):
+                raise results[0]
+            if isinstance(results[1], Exception):
+                logger.error(f"Error updating permissions for closed ticket: {results[1]}")
+            elif category is not None:
+                await category_allocator.collapse(interaction.guild, interaction.channel.id)
             
             # Send deletion warning
             await interaction.followup.send(
-                "This channel will be deleted in 5 minutes. React with ❌ to cancel."
+                "This channel will be deleted in 5 minutes. Press Reopen to keep it."
             )
             
             # Add delete confirmation button
             delete_view = DeleteTicketView(self.bot)
-            delete_message = await interaction.followup.send("Delete ticket now?", view=delete_view)
-            
-            # Set up delayed deletion
-            await asyncio.sleep(300)  # 5 minutes
-            
-            # Check if the channel still exists and the ticket is still closed
-            channel = interaction.guild.get_channel(int(ticket.channel_id))
-            if channel:
-                # Check the ticket status with app context
-                @with_app_context
-                def check_ticket_status():
-                    try:
-                        from models import Ticket
-                        current_ticket = Ticket.query.filter_by(
-                            channel_id=str(interaction.channel.id)
-                        ).first()
-                        
-                        if current_ticket and current_ticket.status == "closed":
-                            return True
-                        return False
-                    except Exception as e:
-                        logger.error(f"Error checking ticket status for auto-deletion: {e}")
-                        return False
-                
-                # Delete the channel if the ticket is still closed
-                if check_ticket_status():
-                    try:
-                        await channel.delete(reason="Ticket closed and auto-deleted after 5 minutes")
-                    except Exception as e:
-                        logger.error(f"Error auto-deleting ticket channel: {e}")
+            await interaction.followup.send("Delete ticket now?", view=delete_view)
+            
+            # Delete the channel later from the delayed job table, so the deletion survives restarts
+            await delayed_jobs.schedule(
+                DELETE_TICKET_JOB,
+                TICKET_DELETE_DELAY,
+                {"ticket_id": ticket.id, "channel_id": ticket.channel_id},
+                guild=interaction.guild,
+                key=f"ticket:{ticket.id}"
+            )
         
         except Exception as e:
             logger.error(f"Error in close_ticket button: {e}")
@@ -327,22 +439,66 @@ class CloseTicketView(discord.ui.View):
                 "An error occurred while closing the ticket."
             )
 
-class DeleteTicketView(discord.ui.View):
+class DeleteTicketView(InstrumentedView):
     def __init__(self, bot):
         super().__init__(timeout=None)
         self.bot = bot
 
+    @discord.ui.button(label="Reopen", custom_id="reopen_ticket", style=discord.ButtonStyle.green, emoji="🔓")
+    async def reopen_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Button to reopen a closed ticket and cancel its deletion"""
+        await interaction.response.defer()
+        
+        try:
+            loop = asyncio.get_running_loop()
+            ticket, error = await loop.run_in_executor(None, reopen_ticket_in_db, interaction.channel.id)
+            if ticket is None:
+                return await interaction.followup.send(error)
+            
+            await delayed_jobs.cancel(DELETE_TICKET_JOB, f"ticket:{ticket.id}")
+            remember_open_ticket(interaction.guild.id, ticket.user_id, interaction.channel.id)
+            
+            # Give the members their send permission back and move the channel to a ticket category in one edit
+            category = None
+            if interaction.channel.category is not None and interaction.channel.category.name == ARCHIVE_CATEGORY_NAME:
+                _, visible_roles = await staff_role_cache.get(interaction.guild)
+                category = await category_allocator.reserve(interaction.guild, visible_roles)
+            try:
+                await apply_ticket_overwrites(
+                    interaction.channel,
+                    "reopen",
+                    ticket.user_id,
+                    can_send=True,
+                    category=category,
+                    reason=f"Ticket reopened by {interaction.user}"
+                )
+            finally:
+                category_allocator.release(category)
+            
+            embed = create_embed(
+                title="Ticket Reopened",
+                description=f"This ticket has been reopened by {interaction.user.mention}.",
+                color=discord.Color.green()
+            )
+            await interaction.followup.send(embed=embed, view=CloseTicketView(self.bot))
+        
+        except Exception as e:
+            logger.error(f"Error in reopen_ticket button: {e}")
+            await interaction.followup.send(
+                "An error occurred while reopening the ticket."
+            )
+    
     @discord.ui.button(label="Delete Now", custom_id="delete_ticket", style=discord.ButtonStyle.red, emoji="⚠️")
     async def delete_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         """Button to immediately delete a ticket channel"""
         await interaction.response.defer()
         
         try:
-            # Import app context function
-            from app import with_app_context
+            # Import database session helper
+            from database import with_db_session
             
             # Find the ticket
-            @with_app_context
+            @with_db_session
             def get_ticket():
                 try:
                     from models import Ticket
@@ -355,18 +511,33 @@ class DeleteTicketView(discord.ui.View):
                     return None
             
             # Get the ticket
-            ticket = get_ticket()
+            loop = asyncio.get_running_loop()
+            ticket = await loop.run_in_executor(None, get_ticket)
             if not ticket:
                 return await interaction.followup.send(
                     "This ticket does not exist in the database."
                 )
             
+            # Save the conversation before the channel is gone
+            await interaction.followup.send("Saving transcript...")
+            try:
+                await archive_ticket(self.bot, interaction.channel, ticket)
+            except Exception as e:
+                logger.error(f"Error exporting transcript for ticket {ticket.id}: {e}")
+                return await interaction.followup.send(
+                    "Could not save the ticket transcript, so the channel was not deleted. Please try again later."
+                )
+            
             # Send deletion message
             await interaction.followup.send("Deleting ticket channel...")
             
+            # The channel is going now, drop any scheduled auto-deletion
+            await delayed_jobs.cancel(DELETE_TICKET_JOB, f"ticket:{ticket.id}")
+            
             # Delete the channel
             await asyncio.sleep(3)  # Brief delay to show the message
             await interaction.channel.delete(reason=f"Ticket deleted by {interaction.user}")
+            await category_allocator.collapse(interaction.guild, interaction.channel.id)
         
         except Exception as e:
             logger.error(f"Error in delete_ticket button: {e}")
@@ -374,6 +545,193 @@ class DeleteTicketView(discord.ui.View):
                 "An error occurred while deleting the ticket channel."
             )
 
+@contextlib.asynccontextmanager
+async def opening_lock(guild_id, user_id):
+    """Hold the lock for one user's ticket creation in a guild, dropped once nobody is waiting on it"""
+    key = (guild_id, int(user_id))
+    entry = opening_locks.get(key)
+    if entry is None:
+        entry = opening_locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del opening_locks[key]
+
+def remember_open_ticket(guild_id, user_id, channel_id):
+    open_ticket_channels[(guild_id, int(user_id))] = channel_id
+
+def forget_open_ticket(guild_id, user_id):
+    open_ticket_channels.pop((guild_id, int(user_id)), None)
+
+def known_open_ticket(guild, user_id):
+    """The user's open ticket channel if this process opened or saw it, from the cache only"""
+    channel_id = open_ticket_channels.get((guild.id, int(user_id)))
+    if channel_id is None:
+        return None
+    channel = guild.get_channel_or_thread(channel_id)
+    if channel is None:
+        forget_open_ticket(guild.id, user_id)
+    return channel
+
+async def apply_ticket_overwrites(channel, action, opener_id, can_send, category=None, reason=None):
+    """
+    Replace a ticket channel's overwrites, and optionally its category, with one edit
+
+    Every member with an overwrite, the opener and anyone added to the ticket,
+    keeps read access and gets send access only if `can_send`. Role overwrites
+    are left as they are.
+
+    Args:
+        channel (discord.TextChannel): The ticket channel
+        action (str): "close" or "reopen", for the timing metric
+        opener_id (str): The ticket opener's user ID
+        can_send (bool): Whether members may send messages
+        category (discord.CategoryChannel, optional): Category to move the channel to
+        reason (str, optional): Audit log reason
+    """
+    overwrites = dict(channel.overwrites)
+    opener = channel.guild.get_member(int(opener_id))
+    if opener is not None and opener not in overwrites:
+        overwrites[opener] = discord.PermissionOverwrite()
+    for target, overwrite in overwrites.items():
+        if isinstance(target, discord.Member) and target != channel.guild.me:
+            updated = discord.PermissionOverwrite(**dict(overwrite))
+            updated.update(read_messages=True, send_messages=can_send)
+            overwrites[target] = updated
+    
+    changes = {"overwrites": overwrites}
+    if category is not None and category != channel.category:
+        changes["category"] = category
+    start = time.perf_counter()
+    await channel.edit(reason=reason, **changes)
+    TICKET_OVERWRITE_SECONDS.observe(action, value=time.perf_counter() - start)
+
+@with_db_session
+def reopen_ticket_in_db(channel_id):
+    """
+    Mark a closed ticket open again
+
+    Returns:
+        tuple: (ticket, None), or (None, message for the user) if it can't be reopened
+    """
+    ticket = Ticket.query.filter_by(channel_id=str(channel_id)).first()
+    if ticket is None:
+        return None, "This ticket does not exist in the database."
+    if ticket.status != "closed":
+        return None, "This ticket is not closed."
+    ticket.status = "open"
+    ticket.closed_at = None
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None, "The ticket's opener already has another open ticket."
+    record_ticket_reopened(ticket.guild_id, datetime.utcnow())
+    logger.info(f"Reopened ticket {ticket.id} for channel: {channel_id}")
+    return ticket, None
+
+@with_db_session
+def get_ticket_mode(guild_id):
+    config = ServerConfig.query.filter_by(guild_id=str(guild_id)).first()
+    return (config.ticket_mode if config else None) or "channel"
+
+def thread_staff_roles(roles):
+    """The roles that have to be added to a private thread ticket; roles that manage threads see it already"""
+    return [role for role in roles if not (role.permissions.administrator or role.permissions.manage_threads)]
+
+def split_mentionable_roles(channel, roles):
+    """
+    Split roles into those whose members a mention adds to a private thread and the rest
+
+    A mention only adds members if the role is mentionable or the bot may mention everyone.
+
+    Returns:
+        tuple: (mentionable roles, roles the bot can't mention)
+    """
+    if channel.permissions_for(channel.guild.me).mention_everyone:
+        return list(roles), []
+    mentionable = [role for role in roles if role.mentionable]
+    return mentionable, [role for role in roles if not role.mentionable]
+
+async def add_thread_members(thread, roles):
+    """Add the cached members of roles the bot can't mention to a private thread, up to THREAD_STAFF_ADD_LIMIT"""
+    members = {}
+    for role in roles:
+        for member in role.members:
+            if not member.bot:
+                members.setdefault(member.id, member)
+    if not members:
+        return
+    if len(members) > THREAD_STAFF_ADD_LIMIT:
+        logger.warning(
+            f"Adding only {THREAD_STAFF_ADD_LIMIT} of {len(members)} staff to ticket thread {thread.id}, "
+            "make the ticket roles mentionable so they are all added"
+        )
+    results = await run_bulk([
+        (thread_member_bucket(thread), lambda member=member: thread.add_user(member))
+        for member in list(members.values())[:THREAD_STAFF_ADD_LIMIT]
+    ])
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        logger.error(f"Failed to add {len(failed)} staff member(s) to ticket thread {thread.id}: {failed[0]}")
+
+async def create_ticket_thread(interaction, name):
+    """Open a ticket as a private thread under the channel the ticket button is in"""
+    thread = await interaction.channel.create_thread(
+        name=name,
+        type=discord.ChannelType.private_thread,
+        invitable=False,
+        auto_archive_duration=10080,
+        reason=f"Support ticket for {interaction.user} ({interaction.user.id})"
+    )
+    await thread.add_user(interaction.user)
+    return thread
+
+@with_db_session
+def get_ticket(ticket_id):
+    return db.session.get(Ticket, ticket_id)
+
+async def archive_ticket(bot, channel, ticket):
+    """Export the ticket's transcript and send the opener a link to it"""
+    transcript = await export_transcript(channel, ticket)
+    try:
+        await index_ticket_transcript(transcript)
+    except Exception as e:
+        # The archive is safe; the catch-up pass at startup indexes it later
+        logger.error(f"Error indexing transcript for ticket {ticket.id}: {e}")
+    opener = bot.get_user(int(ticket.user_id))
+    if opener is not None:
+        try:
+            await opener.send(
+                f"Your ticket in {channel.guild.name} was closed. Transcript: {transcript_url(transcript.access_token)}"
+            )
+        except discord.HTTPException:
+            pass
+    return transcript
+
+@delayed_jobs.handler(DELETE_TICKET_JOB)
+async def delete_closed_ticket(bot, payload):
+    """Delayed job that deletes a closed ticket's channel, unless the ticket was reopened or already deleted"""
+    loop = asyncio.get_running_loop()
+    ticket = await loop.run_in_executor(None, get_ticket, payload["ticket_id"])
+    if ticket is None or ticket.status != "closed":
+        return
+    
+    channel = bot.get_channel(int(payload["channel_id"]))
+    if channel is None:
+        return
+    # An export failure raises, so the job is retried rather than deleting the conversation
+    await archive_ticket(bot, channel, ticket)
+    try:
+        await channel.delete(reason="Ticket closed and auto-deleted after 5 minutes")
+    except discord.NotFound:
+        pass
+    await category_allocator.collapse(channel.guild, channel.id)
+
 def create_ticket_button(bot):
     """Create a ticket button view"""
     return TicketView(bot)
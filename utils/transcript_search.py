@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, text
+
+from database import db, with_db_session
+from models import Ticket, TicketSearchEntry, TicketTranscript
+from utils.metrics import Histogram, registry
+from utils.transcripts import read_records
+
+logger = logging.getLogger(__name__)
+
+# Results per page for /ticket-search and the web endpoint
+SEARCH_PAGE_SIZE = 10
+
+# Messages inserted per statement while indexing
+INDEX_BATCH_SIZE = 500
+
+# Transcripts indexed per catch-up pass at startup
+INDEX_CATCH_UP_LIMIT = 200
+
+# Text search configuration for Postgres
+TS_CONFIG = "english"
+
+SEARCH_SECONDS = registry.register(Histogram(
+    "ticket_search_seconds",
+    "Time to answer a transcript search",
+    ["backend"]
+))
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def search_backend():
+    """
+    The full-text backend for this database, creating its index on first use
+
+    Postgres gets a GIN index on to_tsvector(content), SQLite an FTS5 table
+    keyed by entry ID. Anything else (or SQLite built without FTS5) falls back
+    to LIKE, which is fine for small local databases.
+
+    Returns:
+        str: "postgresql", "fts5" or "like"
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is not None:
+            return _backend
+        dialect = db.engine.dialect.name
+        backend = "like"
+        try:
+            with db.engine.begin() as connection:
+                if dialect == "postgresql":
+                    connection.execute(text(
+                        "CREATE INDEX IF NOT EXISTS ix_ticket_search_entries_content_fts "
+                        f"ON ticket_search_entries USING gin (to_tsvector('{TS_CONFIG}', content))"
+                    ))
+                    backend = "postgresql"
+                elif dialect == "sqlite":
+                    connection.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS ticket_search_fts USING fts5(content)"))
+                    backend = "fts5"
+        except Exception as e:
+            logger.warning(f"Full-text index unavailable on {dialect}, falling back to LIKE search: {e}")
+        _backend = backend
+        logger.info(f"Transcript search backend: {backend}")
+        return backend
+
+def fts5_query(query):
+    """Quote each word so user input can't break FTS5 query syntax; all words must match"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+def entry_text(record):
+    parts = [record.get("content") or ""]
+    parts.extend(embed for embed in record.get("embeds", []) if embed)
+    return "\n".join(part for part in parts if part)
+
+def parse_timestamp(value):
+    # Discord timestamps are UTC; stored naive like the rest of the database
+    return datetime.fromisoformat(value).replace(tzinfo=None)
+
+@with_db_session
+def index_transcript(transcript_id):
+    """
+    Add a transcript's messages to the search index, replacing any earlier entries for the ticket
+
+    The archive is read a line at a time and inserted in batches, so memory
+    stays bounded for long tickets.
+
+    Returns:
+        int: Messages indexed
+    """
+    backend = search_backend()
+    transcript = db.session.get(TicketTranscript, transcript_id)
+    if transcript is None:
+        return 0
+    ticket = db.session.get(Ticket, transcript.ticket_id)
+    user_id = ticket.user_id if ticket else ""
+
+    if backend == "fts5":
+        db.session.execute(
+            text("DELETE FROM ticket_search_fts WHERE rowid IN (SELECT id FROM ticket_search_entries WHERE ticket_id = :ticket_id)"),
+            {"ticket_id": transcript.ticket_id}
+        )
+    TicketSearchEntry.query.filter_by(ticket_id=transcript.ticket_id).delete(synchronize_session=False)
+
+    records = read_records(transcript.path)
+    next(records, None)  # header
+    indexed = 0
+    batch = []
+    for record in records:
+        content = entry_text(record)
+        if not content:
+            continue
+        batch.append({
+            "ticket_id": transcript.ticket_id,
+            "guild_id": transcript.guild_id,
+            "user_id": user_id,
+            "author_id": record.get("author_id", ""),
+            "message_id": record.get("id", ""),
+            "created_at": parse_timestamp(record["created_at"]),
+            "content": content
+        })
+        if len(batch) >= INDEX_BATCH_SIZE:
+            db.session.execute(insert(TicketSearchEntry), batch)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(TicketSearchEntry), batch)
+        indexed += len(batch)
+
+    if backend == "fts5":
+        db.session.execute(
+            text("INSERT INTO ticket_search_fts (rowid, content) SELECT id, content FROM ticket_search_entries WHERE ticket_id = :ticket_id"),
+            {"ticket_id": transcript.ticket_id}
+        )
+    transcript.indexed_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f"Indexed {indexed} messages from ticket {transcript.ticket_id} for search")
+    return indexed
+
+@with_db_session
+def unindexed_transcripts(limit=INDEX_CATCH_UP_LIMIT):
+    rows = TicketTranscript.query.with_entities(TicketTranscript.id).filter(
+        TicketTranscript.indexed_at.is_(None)
+    ).order_by(TicketTranscript.id).limit(limit)
+    return [transcript_id for (transcript_id,) in rows]
+
+async def index_ticket_transcript(transcript):
+    """Index a freshly exported transcript off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, index_transcript, transcript.id)
+
+async def catch_up_search_index():
+    """Index transcripts saved before the search index existed or while indexing failed"""
+    loop = asyncio.get_running_loop()
+    try:
+        transcript_ids = await loop.run_in_executor(None, unindexed_transcripts)
+        for transcript_id in transcript_ids:
+            await loop.run_in_executor(None, index_transcript, transcript_id)
+        if transcript_ids:
+            logger.info(f"Caught up the search index with {len(transcript_ids)} transcript(s)")
+    except Exception as e:
+        logger.error(f"Failed to catch up the transcript search index: {e}")
+
+@with_db_session
+def search_transcripts(guild_id, query, user_id=None, after=None, before=None, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Find transcript messages in a guild matching all words of a query, newest first
+
+    Args:
+        guild_id (str): The guild to search
+        query (str): Words to match
+        user_id (str, optional): Only tickets opened by this member
+        after (datetime, optional): Only messages on or after this time
+        before (datetime, optional): Only messages before this time
+        page (int): 1-based page number
+        per_page (int): Results per page
+
+    Returns:
+        tuple: (list of result dicts, whether there is another page)
+    """
+    if not query.split():
+        return [], False
+    backend = search_backend()
+    start = time.perf_counter()
+    params = {
+        "guild_id": str(guild_id),
+        "limit": per_page + 1,
+        "offset": (max(page, 1) - 1) * per_page
+    }
+    filters = ["e.guild_id = :guild_id"]
+    if user_id:
+        filters.append("e.user_id = :user_id")
+        params["user_id"] = str(user_id)
+    if after:
+        filters.append("e.created_at >= :after")
+        params["after"] = after
+    if before:
+        filters.append("e.created_at < :before")
+        params["before"] = before
+
+    if backend == "postgresql":
+        params["query"] = query
+        sql = (
+            f"SELECT e.ticket_id, e.author_id, e.created_at, "
+            f"ts_headline('{TS_CONFIG}', e.content, q, 'StartSel=**,StopSel=**,MaxWords=25,MinWords=8') AS snippet, t.access_token "
+            f"FROM ticket_search_entries e "
+            f"CROSS JOIN websearch_to_tsquery('{TS_CONFIG}', :query) q "
+            f"LEFT JOIN ticket_transcripts t ON t.ticket_id = e.ticket_id "
+            f"WHERE to_tsvector('{TS_CONFIG}', e.content) @@ q AND {' AND '.join(filters)} "
+            f"ORDER BY e.created_at DESC LIMIT :limit OFFSET :offset"
+        )
+    elif backend == "fts5":
+        params["query"] = fts5_query(query)
+        sql = (
+            "SELECT e.ticket_id, e.author_id, e.created_at, "
+            "snippet(ticket_search_fts, 0, '**', '**', '…', 16) AS snippet, t.access_token "
+            "FROM ticket_search_fts "
+            "JOIN ticket_search_entries e ON e.id = ticket_search_fts.rowid "
+            "LEFT JOIN ticket_transcripts t ON t.ticket_id = e.ticket_id "
+            f"WHERE ticket_search_fts MATCH :query AND {' AND '.join(filters)} "
+            "ORDER BY e.created_at DESC LIMIT :limit OFFSET :offset"
+        )
+    else:
+        for index, word in enumerate(query.split()):
+            filters.append(f"lower(e.content) LIKE :word{index}")
+            params[f"word{index}"] = f"%{word.lower()}%"
+        sql = (
+            "SELECT e.ticket_id, e.author_id, e.created_at, substr(e.content, 1, 200) AS snippet, t.access_token "
+            "FROM ticket_search_entries e "
+            "LEFT JOIN ticket_transcripts t ON t.ticket_id = e.ticket_id "
+            f"WHERE {' AND '.join(filters)} "
+            "ORDER BY e.created_at DESC LIMIT :limit OFFSET :offset"
+        )
+
+    rows = db.session.execute(text(sql), params).fetchall()
+    SEARCH_SECONDS.observe(backend, value=time.perf_counter() - start)
+
+    results = [
+        {
+            "ticket_id": row.ticket_id,
+            "author_id": row.author_id,
+            "created_at": row.created_at if isinstance(row.created_at, datetime) else parse_timestamp(str(row.created_at)),
+            "snippet": row.snippet,
+            "access_token": row.access_token
+        }
+        for row in rows[:per_page]
+    ]
+    return results, len(rows) > per_page
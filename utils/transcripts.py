@@ -0,0 +1,166 @@
+import asyncio
+import gzip
+import html
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+
+from database import db, with_db_session
+from models import TicketTranscript
+from utils.metrics import Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+# Where transcript archives are written; the web app must be able to read it too
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", "transcripts")
+
+# Base URL of the web app for transcript links, e.g. https://bot.example.com
+PUBLIC_URL = (os.getenv("PUBLIC_URL") or os.getenv("RENDER_EXTERNAL_URL") or "").rstrip("/")
+
+# Messages written per chunk; channel.history fetches 100 per request
+TRANSCRIPT_CHUNK_SIZE = 100
+
+TRANSCRIPT_EXPORT_SECONDS = registry.register(Histogram(
+    "ticket_transcript_export_seconds",
+    "Time to stream a ticket channel into a transcript archive",
+    [],
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+))
+
+def message_record(message):
+    """One transcript line for a Discord message"""
+    return {
+        "id": str(message.id),
+        "author_id": str(message.author.id),
+        "author": str(message.author),
+        "bot": message.author.bot,
+        "created_at": message.created_at.isoformat(),
+        "edited_at": message.edited_at.isoformat() if message.edited_at else None,
+        "content": message.content,
+        "attachments": [attachment.url for attachment in message.attachments],
+        "embeds": [embed.title or embed.description or "" for embed in message.embeds]
+    }
+
+def transcript_url(access_token, view="html"):
+    path = f"/transcripts/{access_token}" + ("/html" if view == "html" else "")
+    return PUBLIC_URL + path if PUBLIC_URL else path
+
+@with_db_session
+def save_transcript(ticket_id, guild_id, path, message_count, size_bytes):
+    """Create or replace the transcript index row for a ticket"""
+    transcript = TicketTranscript.query.filter_by(ticket_id=ticket_id).first()
+    if transcript is None:
+        transcript = TicketTranscript(ticket_id=ticket_id, access_token=secrets.token_urlsafe(24))
+        db.session.add(transcript)
+    transcript.guild_id = str(guild_id)
+    transcript.path = path
+    transcript.message_count = message_count
+    transcript.size_bytes = size_bytes
+    transcript.created_at = datetime.utcnow()
+    db.session.commit()
+    return transcript
+
+@with_db_session
+def get_transcript(access_token):
+    return TicketTranscript.query.filter_by(access_token=access_token).first()
+
+async def export_transcript(channel, ticket):
+    """
+    Stream a ticket channel's history into a gzipped JSON lines archive
+
+    Messages are read oldest first one history page at a time and written in
+    chunks from a worker thread, so memory stays bounded by the chunk size no
+    matter how long the ticket is. The archive is written to a temporary file
+    and moved into place once complete.
+
+    Args:
+        channel (discord.TextChannel): The ticket channel
+        ticket (Ticket): The ticket's database row
+
+    Returns:
+        TicketTranscript: The index row for the archive
+    """
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    directory = os.path.join(TRANSCRIPT_DIR, str(ticket.guild_id))
+    await loop.run_in_executor(None, lambda: os.makedirs(directory, exist_ok=True))
+    path = os.path.join(directory, f"ticket-{ticket.id}.jsonl.gz")
+    temp_path = path + ".part"
+
+    archive = await loop.run_in_executor(None, lambda: gzip.open(temp_path, "wt", encoding="utf-8"))
+    message_count = 0
+    try:
+        header = {
+            "ticket_id": ticket.id,
+            "guild_id": str(ticket.guild_id),
+            "channel_id": str(channel.id),
+            "channel_name": channel.name,
+            "user_id": str(ticket.user_id),
+            "created_at": ticket.created_at.isoformat() if ticket.created_at else None,
+            "exported_at": datetime.utcnow().isoformat()
+        }
+        await loop.run_in_executor(None, archive.write, json.dumps(header) + "\n")
+
+        chunk = []
+        async for message in channel.history(limit=None, oldest_first=True):
+            chunk.append(json.dumps(message_record(message)))
+            if len(chunk) >= TRANSCRIPT_CHUNK_SIZE:
+                await loop.run_in_executor(None, archive.write, "\n".join(chunk) + "\n")
+                message_count += len(chunk)
+                chunk = []
+        if chunk:
+            await loop.run_in_executor(None, archive.write, "\n".join(chunk) + "\n")
+            message_count += len(chunk)
+    except BaseException:
+        await loop.run_in_executor(None, archive.close)
+        await loop.run_in_executor(None, os.remove, temp_path)
+        raise
+
+    await loop.run_in_executor(None, archive.close)
+    await loop.run_in_executor(None, os.replace, temp_path, path)
+    size_bytes = await loop.run_in_executor(None, os.path.getsize, path)
+
+    transcript = await loop.run_in_executor(
+        None, save_transcript, ticket.id, ticket.guild_id, path, message_count, size_bytes
+    )
+    seconds = time.perf_counter() - start
+    TRANSCRIPT_EXPORT_SECONDS.observe(value=seconds)
+    logger.info(f"Exported transcript for ticket {ticket.id}: {message_count} messages, {size_bytes} bytes in {seconds:.1f}s")
+    return transcript
+
+def read_records(path):
+    """Yield the header and then each message from an archive, one line at a time"""
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line.strip():
+                yield json.loads(line)
+
+def render_html(path):
+    """Yield an HTML page for an archive in pieces, for a streaming response"""
+    records = read_records(path)
+    header = next(records, {})
+    title = html.escape(f"Ticket {header.get('ticket_id', '')} - #{header.get('channel_name', '')}")
+    yield (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{title}</title>"
+        "<style>body{font-family:sans-serif;max-width:900px;margin:auto}"
+        ".message{border-bottom:1px solid #ddd;padding:6px 0}"
+        ".meta{color:#666;font-size:0.85em}.content{white-space:pre-wrap}</style>"
+        f"</head><body><h1>{title}</h1>"
+    )
+    for record in records:
+        attachments = "".join(
+            f"<div><a href='{html.escape(url, quote=True)}'>{html.escape(url.rsplit('/', 1)[-1])}</a></div>"
+            for url in record.get("attachments", [])
+        )
+        embeds = "".join(f"<div class='meta'>[embed] {html.escape(embed)}</div>" for embed in record.get("embeds", []) if embed)
+        yield (
+            "<div class='message'>"
+            f"<div class='meta'>{html.escape(record.get('author', ''))} · {html.escape(record.get('created_at', ''))}</div>"
+            f"<div class='content'>{html.escape(record.get('content', ''))}</div>"
+            f"{attachments}{embeds}</div>"
+        )
+    yield "</body></html>"
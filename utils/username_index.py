@@ -0,0 +1,102 @@
+import bisect
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Usernames kept in memory; names beyond this are ignored until restart
+USERNAME_INDEX_MAX = int(os.getenv("USERNAME_INDEX_MAX", "500000"))
+
+# Discord shows at most 25 autocomplete choices
+MAX_CHOICES = 25
+
+class UsernameIndex:
+    """
+    Sorted in-memory index of known Roblox usernames for prefix lookups
+
+    Keys are lowercased and kept in a sorted list, so a prefix search is a
+    bisect plus a short scan. The original casing is kept for display.
+    """
+
+    def __init__(self, max_size=USERNAME_INDEX_MAX):
+        self.max_size = max_size
+        self.keys = []
+        self.names = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, username):
+        return bool(username) and username.lower() in self.names
+
+    def add(self, username):
+        """Add one username, keeping the list sorted"""
+        if not username:
+            return
+        key = username.lower()
+        if key in self.names:
+            self.names[key] = username
+            return
+        if len(self.keys) >= self.max_size:
+            return
+        bisect.insort(self.keys, key)
+        self.names[key] = username
+
+    def add_many(self, usernames):
+        """Add a batch of usernames with a single sort"""
+        added = False
+        for username in usernames:
+            if not username:
+                continue
+            key = username.lower()
+            if key not in self.names:
+                if len(self.names) >= self.max_size:
+                    break
+                added = True
+            self.names[key] = username
+        if added:
+            self.keys = sorted(self.names)
+
+    def search(self, prefix, limit=MAX_CHOICES):
+        """Usernames starting with `prefix` (case-insensitive), alphabetically"""
+        prefix = (prefix or "").strip().lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        results = []
+        for key in self.keys[start:start + limit]:
+            if not key.startswith(prefix):
+                break
+            results.append(self.names[key])
+        return results
+
+username_index = UsernameIndex()
+
+def load_known_usernames():
+    """Every Roblox username in the users table"""
+    from database import with_db_session
+    from models import User
+
+    @with_db_session
+    def query():
+        rows = User.query.with_entities(User.roblox_username).filter(User.roblox_username.isnot(None))
+        return [username for (username,) in rows]
+
+    return query()
+
+async def warm_username_index():
+    """Fill the index from the database without blocking the event loop"""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    try:
+        usernames = await loop.run_in_executor(None, load_known_usernames)
+    except Exception as e:
+        logger.error(f"Failed to load usernames for autocomplete: {e}")
+        return
+    username_index.add_many(usernames)
+    logger.info(f"Loaded {len(username_index)} Roblox usernames for autocomplete")
+
+async def roblox_username_autocomplete(interaction, current: str):
+    """Autocomplete for roblox_username options, answered from memory only"""
+    from discord import app_commands
+
+    return [app_commands.Choice(name=username, value=username) for username in username_index.search(current)]
@@ -0,0 +1,276 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+from utils.metrics import Counter, Gauge, Histogram, current_command, registry
+
+logger = logging.getLogger(__name__)
+
+# Priorities, lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+# Queue name -> worker count, override with e.g. WORK_QUEUES="default=4,tickets=2,db=2"
+DEFAULT_WORK_QUEUES = "default=4,tickets=2,db=2"
+WORK_QUEUES = os.getenv("WORK_QUEUES", DEFAULT_WORK_QUEUES)
+
+# Jobs waiting per queue before enqueue is refused
+WORK_QUEUE_SIZE = int(os.getenv("WORK_QUEUE_SIZE", "200"))
+
+# Retries after the first attempt, with exponential backoff starting at the base delay
+WORK_MAX_RETRIES = int(os.getenv("WORK_MAX_RETRIES", "2"))
+WORK_RETRY_DELAY = float(os.getenv("WORK_RETRY_DELAY", "1.0"))  # seconds
+
+# Failed jobs kept per queue for inspection
+MAX_DEAD_LETTERS = 50
+
+WORK_QUEUE_DEPTH = registry.register(Gauge(
+    "work_queue_depth",
+    "Jobs waiting in each background work queue",
+    ["queue"]
+))
+WORK_JOB_WAIT_SECONDS = registry.register(Histogram(
+    "work_job_wait_seconds",
+    "Time jobs spent queued before a worker picked them up",
+    ["queue"]
+))
+WORK_JOB_SECONDS = registry.register(Histogram(
+    "work_job_seconds",
+    "Time from enqueue until a job finished, including retries",
+    ["queue", "job", "outcome"]
+))
+WORK_JOB_RETRIES = registry.register(Counter(
+    "work_job_retries",
+    "Job attempts that failed and were retried",
+    ["queue", "job"]
+))
+WORK_JOBS_DEAD_LETTERED = registry.register(Counter(
+    "work_jobs_dead_lettered",
+    "Jobs that failed every attempt",
+    ["queue", "job"]
+))
+
+class WorkQueueFull(Exception):
+    """Raised when a job is enqueued on a queue that is already full"""
+
+class Job:
+    """A unit of background work with its retry state and result future"""
+
+    def __init__(self, func, args, kwargs, name=None, priority=PRIORITY_NORMAL, max_retries=WORK_MAX_RETRIES):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name or getattr(func, "__name__", "job")
+        self.priority = priority
+        self.max_retries = max_retries
+        self.attempts = 0
+        self.enqueued_at = time.monotonic()
+        self.last_error = None
+        # Attribute the job's Roblox and DB spans to the command that enqueued it
+        self.command = current_command.get()
+        self.future = asyncio.get_running_loop().create_future()
+        # Failures are logged when dead-lettered, so unawaited futures shouldn't warn again
+        self.future.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+    async def run(self):
+        current_command.set(self.command)
+        if inspect.iscoroutinefunction(self.func):
+            return await self.func(*self.args, **self.kwargs)
+        # Blocking functions (database work) run in a thread so they don't stall the loop
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, functools.partial(context.run, self.func, *self.args, **self.kwargs))
+
+    def to_dict(self):
+        return {
+            "job": self.name,
+            "attempts": self.attempts,
+            "error": repr(self.last_error),
+            "failed_at": datetime.utcnow().isoformat() + "Z"
+        }
+
+class WorkQueue:
+    """
+    A named priority queue drained by a fixed number of worker tasks
+
+    Failed jobs are retried with exponential backoff. Jobs that fail every
+    attempt are dead-lettered: kept in `dead_letters` and their future gets
+    the last exception.
+    """
+
+    def __init__(self, name, workers, maxsize=WORK_QUEUE_SIZE):
+        self.name = name
+        self.worker_count = workers
+        self.queue = asyncio.PriorityQueue(maxsize=maxsize)
+        self.sequence = itertools.count()
+        self.dead_letters = deque(maxlen=MAX_DEAD_LETTERS)
+        self.workers = []
+        self.running = 0
+
+    def start(self):
+        if self.workers:
+            return
+        for index in range(self.worker_count):
+            self.workers.append(asyncio.create_task(self._worker(), name=f"work-{self.name}-{index}"))
+        logger.info(f"Started work queue {self.name} with {self.worker_count} worker(s)")
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def put(self, job):
+        try:
+            self.queue.put_nowait((job.priority, next(self.sequence), job))
+        except asyncio.QueueFull:
+            raise WorkQueueFull(f"Work queue {self.name} is full")
+        WORK_QUEUE_DEPTH.set(self.name, value=self.queue.qsize())
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            WORK_QUEUE_DEPTH.set(self.name, value=self.queue.qsize())
+            if job.attempts == 0:
+                WORK_JOB_WAIT_SECONDS.observe(self.name, value=time.monotonic() - job.enqueued_at)
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+                self.queue.task_done()
+
+    async def _run(self, job):
+        job.attempts += 1
+        try:
+            result = await job.run()
+        except asyncio.CancelledError:
+            job.future.cancel()
+            raise
+        except Exception as e:
+            job.last_error = e
+            if job.attempts <= job.max_retries:
+                WORK_JOB_RETRIES.inc(self.name, job.name)
+                delay = WORK_RETRY_DELAY * 2 ** (job.attempts - 1)
+                logger.warning(f"Job {job.name} on {self.name} failed (attempt {job.attempts}), retrying in {delay:.1f}s: {e}")
+                asyncio.get_running_loop().call_later(delay, self._requeue, job)
+                return
+            self._dead_letter(job)
+            return
+
+        WORK_JOB_SECONDS.observe(self.name, job.name, "success", value=time.monotonic() - job.enqueued_at)
+        if not job.future.done():
+            job.future.set_result(result)
+
+    def _requeue(self, job):
+        try:
+            self.put(job)
+        except WorkQueueFull:
+            self._dead_letter(job)
+
+    def _dead_letter(self, job):
+        logger.error(f"Job {job.name} on {self.name} failed after {job.attempts} attempt(s): {job.last_error}")
+        WORK_JOBS_DEAD_LETTERED.inc(self.name, job.name)
+        WORK_JOB_SECONDS.observe(self.name, job.name, "dead_letter", value=time.monotonic() - job.enqueued_at)
+        self.dead_letters.append(job.to_dict())
+        if not job.future.done():
+            job.future.set_exception(job.last_error)
+
+    def to_dict(self):
+        return {
+            "queue": self.name,
+            "workers": self.worker_count,
+            "depth": self.queue.qsize(),
+            "running": self.running,
+            "dead_letters": list(self.dead_letters)
+        }
+
+def parse_queue_config(value):
+    """Parse "name=workers,name=workers" into a dict"""
+    config = {}
+    for part in (value or "").replace(" ", "").split(","):
+        if "=" not in part:
+            continue
+        name, workers = part.split("=", 1)
+        try:
+            config[name] = max(1, int(workers))
+        except ValueError:
+            continue
+    return config
+
+class TaskSystem:
+    """All work queues in the bot process"""
+
+    def __init__(self, config=WORK_QUEUES):
+        self.config = parse_queue_config(config) or parse_queue_config(DEFAULT_WORK_QUEUES)
+        self.queues = {}
+
+    def get_queue(self, name):
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = WorkQueue(name, self.config.get(name, 1))
+            queue.start()
+        return queue
+
+    def start(self):
+        for name in self.config:
+            self.get_queue(name)
+
+    async def stop(self):
+        for queue in self.queues.values():
+            await queue.stop()
+
+    def enqueue(self, queue_name, func, *args, priority=PRIORITY_NORMAL, max_retries=WORK_MAX_RETRIES, name=None, **kwargs):
+        """
+        Add a job to a queue
+
+        Returns:
+            asyncio.Future: Resolves to the job's return value, or its last error once dead-lettered
+
+        Raises:
+            WorkQueueFull: The queue is full
+        """
+        job = Job(func, args, kwargs, name=name, priority=priority, max_retries=max_retries)
+        self.get_queue(queue_name).put(job)
+        return job.future
+
+    def enqueue_for_interaction(self, interaction, queue_name, func, *args, error_message=None, **kwargs):
+        """
+        Run a job for an interaction that has already been deferred and edit the original response with its result
+
+        The job should return the message content as a string or a dict of
+        `edit_original_response` keyword arguments.
+        """
+        future = self.enqueue(queue_name, func, *args, **kwargs)
+        future.add_done_callback(
+            lambda done: asyncio.ensure_future(_edit_response(interaction, done, error_message))
+        )
+        return future
+
+    def report(self):
+        return [queue.to_dict() for queue in self.queues.values()]
+
+async def _edit_response(interaction, future, error_message):
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        result = error_message or "Something went wrong while processing your request. Please try again later."
+    else:
+        result = future.result()
+    if result is None:
+        return
+    kwargs = result if isinstance(result, dict) else {"content": result}
+    try:
+        await interaction.edit_original_response(**kwargs)
+    except Exception as e:
+        logger.error(f"Failed to edit response for {interaction.id} after background job: {e}")
+
+task_system = TaskSystem()